@@ -1,6 +1,12 @@
 import os
 import re
+import sys
 import json
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import tkinter.font as tkfont
@@ -9,6 +15,10 @@ from ttkbootstrap.constants import *
 import sqlite3
 from datetime import datetime  # NUEVO
 
+# Motor de filtrado compartido con el CLI y la app web (filtros.py en la raíz del repositorio)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from filtros import FiltroRutas
+
 # Soporte opcional para MySQL (pip install pymysql)
 try:
     import pymysql
@@ -41,6 +51,7 @@ CARPETAS_EXCLUIDAS_DEF = [
 # Estas variables se sobreescriben al cargar config.json
 EXTENSIONES_PERMITIDAS = tuple(EXTENSIONES_PERMITIDAS_DEF)
 CARPETAS_EXCLUIDAS = set(CARPETAS_EXCLUIDAS_DEF)
+FILTRO = FiltroRutas(EXTENSIONES_PERMITIDAS, CARPETAS_EXCLUIDAS)
 
 # =========================
 # Utilidades de persistencia
@@ -63,6 +74,7 @@ def cargar_config():
     cfg.setdefault("mysql", {"server": "", "user": "", "password": "", "database": ""})
     cfg.setdefault("extensiones_permitidas", EXTENSIONES_PERMITIDAS_DEF)
     cfg.setdefault("carpetas_excluidas", CARPETAS_EXCLUIDAS_DEF)
+    cfg.setdefault("usar_gitignore", True)
     cfg.setdefault("mostrar_bienvenida", True)
     return cfg
 
@@ -77,7 +89,7 @@ def guardar_config(**kwargs):
 
 def _aplicar_config_a_variables(cfg):
     """Sincroniza variables globales desde cfg."""
-    global EXTENSIONES_PERMITIDAS, CARPETAS_EXCLUIDAS
+    global EXTENSIONES_PERMITIDAS, CARPETAS_EXCLUIDAS, FILTRO
     exts = cfg.get("extensiones_permitidas", EXTENSIONES_PERMITIDAS_DEF)
     # Normalizar: asegurar que empiecen por punto
     exts_norm = []
@@ -92,6 +104,8 @@ def _aplicar_config_a_variables(cfg):
 
     excl = cfg.get("carpetas_excluidas", CARPETAS_EXCLUIDAS_DEF)
     CARPETAS_EXCLUIDAS = set([c.strip() for c in excl if c.strip()])
+    # Las carpetas excluidas admiten también patrones .gitignore ('dist/**', '*.min.js')
+    FILTRO = FiltroRutas(EXTENSIONES_PERMITIDAS, sorted(CARPETAS_EXCLUIDAS), bool(cfg.get("usar_gitignore", True)))
 
 # Cargar configuración al inicio y aplicarla
 cfg = cargar_config()
@@ -100,35 +114,49 @@ _aplicar_config_a_variables(cfg)
 # =========================
 # Generadores de reportes
 # =========================
-def construir_mapa_directorios(ruta_raiz):
-    """Construye un árbol de directorios en texto."""
+def construir_mapa_directorios(ruta_raiz, recuento=None):
+    """
+    Construye un árbol de directorios en texto. Con `recuento` (dict) cuenta
+    de paso los archivos permitidos en recuento["archivos"].
+    """
     lineas = []
     raiz_abs = os.path.abspath(ruta_raiz)
     lineas.append(raiz_abs)
 
-    def interno(dir_path, prefijo=""):
+    def interno(dir_path, prefijo="", ruta_rel="", pila=()):
         try:
-            entradas = sorted(os.listdir(dir_path))
+            entradas, pila = FILTRO.listar(dir_path, ruta_rel, pila)
         except Exception:
             return
-        entradas = [
-            e for e in entradas
-            if not (os.path.isdir(os.path.join(dir_path, e)) and e in CARPETAS_EXCLUIDAS)
-        ]
         for i, entrada in enumerate(entradas):
-            ruta_completa = os.path.join(dir_path, entrada)
             conector = "└── " if i == len(entradas) - 1 else "├── "
-            lineas.append(prefijo + conector + entrada)
-            if os.path.isdir(ruta_completa):
+            lineas.append(prefijo + conector + entrada.name)
+            if recuento is not None and _es_fichero(entrada) and FILTRO.extension_permitida(entrada.name):
+                recuento["archivos"] = recuento.get("archivos", 0) + 1
+            if _es_carpeta(entrada):
                 extension = "    " if i == len(entradas) - 1 else "│   "
-                interno(ruta_completa, prefijo + extension)
+                hijo_rel = f"{ruta_rel}/{entrada.name}" if ruta_rel else entrada.name
+                interno(entrada.path, prefijo + extension, hijo_rel, pila)
     interno(ruta_raiz)
     return "\n".join(lineas)
 
-def generar_reporte_intercalado(ruta_raiz, nivel=1):
+def _es_carpeta(entrada):
+    try:
+        return entrada.is_dir()
+    except OSError:
+        return False
+
+def _es_fichero(entrada):
+    try:
+        return entrada.is_file()
+    except OSError:
+        return False
+
+def generar_reporte_intercalado(ruta_raiz, nivel=1, _ruta_rel="", _pila=(), progreso=None):
     """
     Reporte Markdown intercalado por carpetas, con encabezados por nivel y
     bloques de código por archivo permitido.
+    `progreso()` se llama tras leer cada archivo (puede lanzar GeneracionCancelada).
     """
     lang_map = {
         '.html': 'html',
@@ -151,17 +179,18 @@ def generar_reporte_intercalado(ruta_raiz, nivel=1):
     encabezado = "#" * nivel
     lineas.append(f"{encabezado} {nombre_carpeta}")
 
-    # Listado de entradas
+    # Listado de entradas (sin lo excluido ni lo que ignoran los .gitignore)
     try:
-        entradas = sorted(os.listdir(ruta_raiz))
+        entradas, pila = FILTRO.listar(ruta_raiz, _ruta_rel, _pila)
     except Exception as e:
         lineas.append(f"Error listando la carpeta: {e}")
         return "\n".join(lineas)
 
     # Archivos permitidos en carpeta actual
-    for entrada in entradas:
-        ruta_completa = os.path.join(ruta_raiz, entrada)
-        if os.path.isfile(ruta_completa) and entrada.lower().endswith(EXTENSIONES_PERMITIDAS):
+    for item in entradas:
+        entrada = item.name
+        ruta_completa = item.path
+        if _es_fichero(item) and FILTRO.extension_permitida(entrada):
             extension = os.path.splitext(entrada)[1].lower()
             lenguaje = lang_map.get(extension, '')
             lineas.append(f"**{entrada}**")
@@ -170,15 +199,17 @@ def generar_reporte_intercalado(ruta_raiz, nivel=1):
                     contenido = f.read()
             except Exception as e:
                 contenido = f"Error al leer el archivo: {e}"
+            if progreso is not None:
+                progreso()
             lineas.append(f"```{lenguaje}")
             lineas.append(contenido)
             lineas.append("```")
 
-    # Subdirectorios (excluyendo los filtrados)
-    for entrada in entradas:
-        ruta_completa = os.path.join(ruta_raiz, entrada)
-        if os.path.isdir(ruta_completa) and entrada not in CARPETAS_EXCLUIDAS:
-            lineas.append(generar_reporte_intercalado(ruta_completa, nivel + 1))
+    # Subdirectorios (los filtrados ya no están en la lista: no se entra en ellos)
+    for item in entradas:
+        if _es_carpeta(item):
+            hijo_rel = f"{_ruta_rel}/{item.name}" if _ruta_rel else item.name
+            lineas.append(generar_reporte_intercalado(item.path, nivel + 1, hijo_rel, pila, progreso))
 
     return "\n".join(lineas)
 
@@ -430,130 +461,316 @@ def guardar_datos_mysql_si_cambian(*_):
     guardar_config(mysql={"server": servidor, "user": usuario,
                           "password": contrasena, "database": bd})
 
-def generar_prompt():
+class GeneracionCancelada(Exception):
+    pass
+
+def _leer_parametros():
+    """Valores del formulario para construir_prompt (solo desde el hilo de Tk)."""
+    return {
+        "contexto": txt_contexto.get("1.0", tk.END).strip(),
+        "objetivo": txt_objetivo.get("1.0", tk.END).strip(),
+        "restricciones": txt_restricciones.get("1.0", tk.END).strip(),
+        "formato": txt_formato.get("1.0", tk.END).strip(),
+        "db_mode": var_bd.get(),
+        "sqlite_path": sqlite_path,
+        "mysql": (ent_mysql_servidor.get().strip(), ent_mysql_usuario.get().strip(),
+                  ent_mysql_contrasena.get().strip(), ent_mysql_bd.get().strip()),
+    }
+
+def informe_base_datos(parametros):
+    """Informe de la BD seleccionada ("" si no hay una BD válida)."""
+    informe_bd = ""
+    if parametros["db_mode"] == "sqlite":
+        ruta_bd = parametros["sqlite_path"]
+        if ruta_bd and os.path.isfile(ruta_bd):
+            rep = analizar_sqlite(ruta_bd)
+            if rep:
+                informe_bd = rep
+    else:
+        servidor, usuario, contrasena, bd = parametros["mysql"]
+        if servidor and usuario and contrasena and bd:
+            rep = analizar_mysql(servidor, usuario, contrasena, bd)
+            if rep:
+                informe_bd = rep
+    return informe_bd
+
+def construir_prompt(parametros, carpeta, progreso=None, informe_bd=None):
     """
     Genera el prompt final en base a:
       - Contexto, Objetivo, Restricciones, Formato de salida
       - Estructura del proyecto
       - Reporte intercalado de código
       - Informe de base de datos SOLO si hay una BD válida seleccionada
+    No toca la interfaz, así que puede ejecutarse en un hilo aparte.
+    `progreso(fase, hechos, total)` informa del avance (total 0 = desconocido).
+    `informe_bd` permite reutilizar un informe de BD ya calculado.
     """
+    def avisar(fase, hechos=0, total=0):
+        if progreso is not None:
+            progreso(fase, hechos, total)
+
     prompt = ""
 
-    # Datos del formulario
-    contexto = txt_contexto.get("1.0", tk.END).strip()
-    objetivo = txt_objetivo.get("1.0", tk.END).strip()
-    restricciones = txt_restricciones.get("1.0", tk.END).strip()
-    formato = txt_formato.get("1.0", tk.END).strip()
-
-    if contexto:
-        prompt += f"Contexto: {contexto}\n\n"
-    if objetivo:
-        prompt += f"Objetivo: {objetivo}\n\n"
-    if restricciones:
-        prompt += f"Restricciones: {restricciones}\n\n"
-    if formato:
-        prompt += f"Formato de salida: {formato}\n\n"
+    if parametros["contexto"]:
+        prompt += f"Contexto: {parametros['contexto']}\n\n"
+    if parametros["objetivo"]:
+        prompt += f"Objetivo: {parametros['objetivo']}\n\n"
+    if parametros["restricciones"]:
+        prompt += f"Restricciones: {parametros['restricciones']}\n\n"
+    if parametros["formato"]:
+        prompt += f"Formato de salida: {parametros['formato']}\n\n"
 
     # Estructura + código intercalado
-    if carpeta_proyecto:
-        arbol = construir_mapa_directorios(carpeta_proyecto)
+    if carpeta:
+        avisar("Listando archivos")
+        # El total de la barra de progreso se cuenta al construir el árbol
+        recuento = {}
+        arbol = construir_mapa_directorios(carpeta, recuento)
+        total = recuento.get("archivos", 0)
         prompt += "\n===== Estructura del proyecto =====\n"
         prompt += "```\n" + arbol + "\n```\n\n"
 
-        intercalado = generar_reporte_intercalado(carpeta_proyecto)
+        leidos = [0]
+        def archivo_leido():
+            leidos[0] += 1
+            avisar("Leyendo archivos", leidos[0], total)
+        avisar("Leyendo archivos", 0, total)
+        intercalado = generar_reporte_intercalado(carpeta, progreso=archivo_leido)
         prompt += "\n===== Reporte de código (Intercalado) =====\n" + intercalado + "\n\n"
     else:
         prompt += "\n(No se ha seleccionado carpeta de proyecto para analizar código)\n\n"
 
     # Informe de base de datos SOLO si procede
-    informe_bd = ""
-    if var_bd.get() == "sqlite":
-        if sqlite_path and os.path.isfile(sqlite_path):
-            rep = analizar_sqlite(sqlite_path)
-            if rep:
-                informe_bd = rep
-    else:
-        servidor = ent_mysql_servidor.get().strip()
-        usuario = ent_mysql_usuario.get().strip()
-        contrasena = ent_mysql_contrasena.get().strip()
-        bd = ent_mysql_bd.get().strip()
-        if servidor and usuario and contrasena and bd:
-            rep = analizar_mysql(servidor, usuario, contrasena, bd)
-            if rep:
-                informe_bd = rep
-
+    if informe_bd is None:
+        avisar("Analizando base de datos")
+        informe_bd = informe_base_datos(parametros)
     if informe_bd:
         prompt += "\n===== Informe de base de datos =====\n" + informe_bd
+    return prompt
+
+# =========================
+# Exportación por lotes (multiproceso)
+# =========================
+MAX_PROCESOS_LOTE = max(1, min(8, os.cpu_count() or 1))
+# "spawn": un fork copiaría el intérprete de Tk y los hilos de la interfaz
+CONTEXTO_PROCESOS = multiprocessing.get_context("spawn")
+
+def _trabajo_prompt_lote(tarea):
+    # Se ejecuta en un proceso hijo: genera y escribe un prompt, devuelve su tiempo
+    parametros, ruta, destino, informe_bd = tarea
+    inicio = time.perf_counter()
+    texto_prompt = construir_prompt(parametros, ruta, informe_bd=informe_bd)
+    with open(destino, "w", encoding="utf-8") as f:
+        f.write(texto_prompt)
+    return time.perf_counter() - inicio
+
+def exportar_prompts_lote(parametros, raiz, proyectos, carpeta_destino, progreso=None,
+                          max_procesos=MAX_PROCESOS_LOTE):
+    """
+    Genera y guarda el prompt de cada proyecto de `proyectos` (subcarpetas de
+    `raiz`) repartiéndolos en un pool de procesos; cada uno escribe su archivo
+    en cuanto termina. La BD se analiza una sola vez para todo el lote.
+    Devuelve (guardados, errores, segundos totales).
+    """
+    def avisar(fase, hechos=0, total=0):
+        if progreso is not None:
+            progreso(fase, hechos, total)
+
+    inicio = time.perf_counter()
+    avisar("Analizando base de datos")
+    informe_bd = informe_base_datos(parametros)
+    tareas = {
+        nombre: (parametros, os.path.join(raiz, nombre), os.path.join(carpeta_destino, nombre + ".txt"), informe_bd)
+        for nombre in proyectos
+    }
+    avisar("Generando prompts", 0, len(tareas))
+
+    guardados = 0
+    errores = []
+    procesos = max(1, min(max_procesos, len(tareas)))
+    pool = ProcessPoolExecutor(max_workers=procesos, mp_context=CONTEXTO_PROCESOS)
+    try:
+        futuros = {pool.submit(_trabajo_prompt_lote, tarea): nombre for nombre, tarea in tareas.items()}
+        for hechos, futuro in enumerate(as_completed(futuros), 1):
+            nombre = futuros[futuro]
+            try:
+                segundos = futuro.result()
+            except Exception as e:
+                print(f"Error al guardar prompt en {nombre}: {e}")
+                errores.append(f"{nombre}: {e}")
+                avisar(f"{nombre} con error", hechos, len(tareas))
+                continue
+            guardados += 1
+            avisar(f"{nombre} guardado en {segundos:.1f} s", hechos, len(tareas))
+    finally:
+        # Al cancelar no se empiezan los proyectos pendientes
+        pool.shutdown(cancel_futures=True)
+    return guardados, errores, time.perf_counter() - inicio
+
+# El Markdown completo vive en reporte_actual (copiar y guardar lo usan
+# tal cual); txt_salida_raw solo muestra una página de líneas, porque Tk se
+# vuelve muy lento con textos de varios MB o con líneas larguísimas.
+LINEAS_POR_PAGINA = 2000
+MAX_CARACTERES_LINEA = 5000  # más allá, la línea se recorta (solo en pantalla)
+
+reporte_actual = ""
+_paginas = {"lineas": [""], "pagina": 0}
+
+def mostrar_prompt(prompt):
+    global reporte_actual
+    reporte_actual = prompt
+    _paginas.update(lineas=prompt.split("\n"), pagina=0)
+    mostrar_pagina(0)
+
+    # Actualizar la vista según el modo
+    actualizar_vista_salida()
 
-    # Volcado a la UI (siempre almacenamos el Markdown crudo en txt_salida_raw)
+def _total_paginas():
+    return max(1, -(-len(_paginas["lineas"]) // LINEAS_POR_PAGINA))
+
+def mostrar_pagina(pagina):
+    """Vuelca en txt_salida_raw solo la página `pagina` del reporte."""
+    total = _total_paginas()
+    pagina = max(0, min(pagina, total - 1))
+    _paginas["pagina"] = pagina
+    inicio = pagina * LINEAS_POR_PAGINA
+    lineas = _paginas["lineas"][inicio:inicio + LINEAS_POR_PAGINA]
+    visibles = [
+        linea if len(linea) <= MAX_CARACTERES_LINEA
+        else f"{linea[:MAX_CARACTERES_LINEA]} … [{len(linea) - MAX_CARACTERES_LINEA} caracteres más]"
+        for linea in lineas
+    ]
     txt_salida_raw.config(state=tk.NORMAL)
     txt_salida_raw.delete("1.0", tk.END)
-    txt_salida_raw.insert(tk.END, prompt)
+    txt_salida_raw.insert(tk.END, "\n".join(visibles))
     txt_salida_raw.config(state=tk.DISABLED)
+    txt_salida_raw.yview_moveto(0)
 
-    # Actualizar la vista según el modo
-    actualizar_vista_salida()
-    set_status("Prompt generado correctamente.")
+    if total > 1:
+        var_pagina.set(f"Líneas {inicio + 1}–{inicio + len(lineas)} de {len(_paginas['lineas'])} "
+                       f"(página {pagina + 1}/{total})")
+        barra_paginas.pack(side=tk.BOTTOM, fill=tk.X, before=txt_salida_raw)
+    else:
+        barra_paginas.pack_forget()
 
-def generar_prompt_para_carpeta(carpeta):
-    """Igual que generar_prompt() pero para una subcarpeta concreta (jocarsa-...)."""
-    prompt = ""
+# =========================
+# Generación en segundo plano
+# =========================
+# El recorrido, la lectura y la BD van en un hilo; la interfaz solo recibe
+# mensajes por una cola que se vacía con root.after, así nunca se congela.
+INTERVALO_COLA_MS = 50
 
-    contexto = txt_contexto.get("1.0", tk.END).strip()
-    objetivo = txt_objetivo.get("1.0", tk.END).strip()
-    restricciones = txt_restricciones.get("1.0", tk.END).strip()
-    formato = txt_formato.get("1.0", tk.END).strip()
+_generacion = None  # (evento de cancelación, cola, al_terminar) del trabajo en curso
 
-    if contexto:
-        prompt += f"Contexto: {contexto}\n\n"
-    if objetivo:
-        prompt += f"Objetivo: {objetivo}\n\n"
-    if restricciones:
-        prompt += f"Restricciones: {restricciones}\n\n"
-    if formato:
-        prompt += f"Formato de salida: {formato}\n\n"
+def _lanzar_en_segundo_plano(tarea, al_terminar):
+    """
+    Ejecuta tarea(progreso) en un hilo de trabajo; al_terminar(resultado) se
+    llama después en el hilo de Tk. Solo hay un trabajo a la vez.
+    """
+    global _generacion
+    if _generacion is not None:
+        set_status("Ya hay una generación en curso.")
+        return
+    cancelar = threading.Event()
+    cola = queue.Queue()
 
-    arbol = construir_mapa_directorios(carpeta)
-    prompt += "\n===== Estructura del proyecto =====\n"
-    prompt += "```\n" + arbol + "\n```\n\n"
+    def progreso(fase, hechos, total):
+        if cancelar.is_set():
+            raise GeneracionCancelada()
+        cola.put(("progreso", fase, hechos, total))
 
-    intercalado = generar_reporte_intercalado(carpeta)
-    prompt += "\n===== Reporte de código (Intercalado) =====\n" + intercalado + "\n\n"
+    def trabajo():
+        try:
+            cola.put(("fin", tarea(progreso)))
+        except GeneracionCancelada:
+            cola.put(("cancelado",))
+        except Exception as e:
+            cola.put(("error", str(e)))
 
-    # Informe de BD (solo si válido)
-    informe_bd = ""
-    if var_bd.get() == "sqlite":
-        if sqlite_path and os.path.isfile(sqlite_path):
-            rep = analizar_sqlite(sqlite_path)
-            if rep:
-                informe_bd = rep
-    else:
-        servidor = ent_mysql_servidor.get().strip()
-        usuario = ent_mysql_usuario.get().strip()
-        contrasena = ent_mysql_contrasena.get().strip()
-        bd = ent_mysql_bd.get().strip()
-        if servidor and usuario and contrasena and bd:
-            rep = analizar_mysql(servidor, usuario, contrasena, bd)
-            if rep:
-                informe_bd = rep
-    if informe_bd:
-        prompt += "\n===== Informe de base de datos =====\n" + informe_bd
+    _generacion = (cancelar, cola, al_terminar)
+    _mostrar_progreso(True)
+    threading.Thread(target=trabajo, name="generar-prompt", daemon=True).start()
+    root.after(INTERVALO_COLA_MS, _drenar_cola)
 
-    return prompt
+def generar_prompt():
+    """Lanza la generación del prompt en un hilo de trabajo."""
+    parametros = _leer_parametros()
+    carpeta = carpeta_proyecto
+
+    def al_terminar(prompt):
+        mostrar_prompt(prompt)
+        set_status("Prompt generado correctamente.")
+
+    _lanzar_en_segundo_plano(lambda progreso: construir_prompt(parametros, carpeta, progreso), al_terminar)
+
+def cancelar_generacion():
+    if _generacion is not None:
+        _generacion[0].set()
+        set_status("Cancelando…")
+
+def _drenar_cola():
+    global _generacion
+    _, cola, al_terminar = _generacion
+    ultimo_progreso = None
+    while True:
+        try:
+            mensaje = cola.get_nowait()
+        except queue.Empty:
+            break
+        if mensaje[0] == "progreso":
+            # De varios avisos seguidos solo interesa el último
+            ultimo_progreso = mensaje
+            continue
+        _generacion = None
+        _mostrar_progreso(False)
+        if mensaje[0] == "fin":
+            al_terminar(mensaje[1])
+        elif mensaje[0] == "cancelado":
+            set_status("Generación cancelada.")
+        else:
+            set_status("Error al generar el prompt.")
+            messagebox.showerror("Error al generar", f"Ocurrió un error al generar el reporte:\n{mensaje[1]}")
+        return
+    if ultimo_progreso is not None:
+        _actualizar_progreso(*ultimo_progreso[1:])
+    root.after(INTERVALO_COLA_MS, _drenar_cola)
+
+def _mostrar_progreso(visible):
+    if visible:
+        prog.config(mode="indeterminate", value=0)
+        prog.pack(side=tk.RIGHT, padx=6)
+        prog.start(12)
+        btn_cancelar.pack(side=tk.RIGHT, padx=6)
+        set_status("Generando…")
+    else:
+        prog.stop()
+        prog.pack_forget()
+        btn_cancelar.pack_forget()
+
+def _actualizar_progreso(fase, hechos, total):
+    if total:
+        if str(prog.cget("mode")) != "determinate":
+            prog.stop()
+            prog.config(mode="determinate", maximum=total)
+        prog.config(value=min(hechos, total))
+        set_status(f"{fase}: {hechos}/{total}…")
+    else:
+        if str(prog.cget("mode")) != "indeterminate":
+            prog.config(mode="indeterminate", value=0)
+            prog.start(12)
+        set_status(f"{fase}…")
 
 def copiar_reporte():
-    # Copia del Markdown crudo (modo fuente)
-    texto = txt_salida_raw.get("1.0", tk.END)
+    # Copia del Markdown crudo completo (no solo la página visible)
     root.clipboard_clear()
-    root.clipboard_append(texto)
+    root.clipboard_append(reporte_actual)
     toast("Copiado", "El reporte (Markdown) se ha copiado al portapapeles.")
     set_status("Reporte copiado al portapapeles.")
 
 def guardar_reporte():
     cfg_local = cargar_config()
     inicial = cfg_local.get("ultima_carpeta_guardar") or (carpeta_proyecto or os.getcwd())
-    texto = txt_salida_raw.get("1.0", tk.END)
+    texto = reporte_actual
 
     # Nombre por defecto = nombre_carpeta + _YYYYMMDDHHMMSS.txt
     base_name = "reporte"
@@ -588,24 +805,29 @@ def guardar_prompts_para_jocarsa():
     carpeta_prompts = os.path.join(script_dir, "prompts")
     os.makedirs(carpeta_prompts, exist_ok=True)
 
-    guardados = 0
-    for entrada in os.listdir(carpeta_proyecto):
-        ruta = os.path.join(carpeta_proyecto, entrada)
-        if os.path.isdir(ruta) and entrada.startswith("jocarsa-"):
-            texto_prompt = generar_prompt_para_carpeta(ruta)
-            destino = os.path.join(carpeta_prompts, entrada + ".txt")
-            try:
-                with open(destino, "w", encoding="utf-8") as f:
-                    f.write(texto_prompt)
-                guardados += 1
-            except Exception as e:
-                print(f"Error al guardar prompt en {entrada}: {e}")
-
-    if guardados > 0:
-        toast("Prompts guardados", f"Se han guardado {guardados} prompt(s) en 'prompts'.")
-        set_status(f"{guardados} prompts guardados en /prompts.")
-    else:
+    raiz = carpeta_proyecto
+    proyectos = sorted(
+        entrada for entrada in os.listdir(raiz)
+        if entrada.startswith("jocarsa-") and os.path.isdir(os.path.join(raiz, entrada))
+    )
+    if not proyectos:
         messagebox.showinfo("Sin proyectos", "No se encontraron carpetas que comiencen por 'jocarsa-'.")
+        return
+    parametros = _leer_parametros()
+
+    def al_terminar(resultado):
+        guardados, errores, segundos = resultado
+        if guardados > 0:
+            toast("Prompts guardados", f"Se han guardado {guardados} prompt(s) en 'prompts'.")
+        set_status(f"{guardados} prompts guardados en /prompts en {segundos:.1f} s.")
+        if errores:
+            messagebox.showwarning("Prompts con errores",
+                                   "No se pudieron guardar algunos prompts:\n" + "\n".join(errores[:20]))
+
+    _lanzar_en_segundo_plano(
+        lambda progreso: exportar_prompts_lote(parametros, raiz, proyectos, carpeta_prompts, progreso),
+        al_terminar,
+    )
 
 # =========================
 # Ventana de configuración (extensiones y carpetas excluidas)
@@ -667,365 +889,414 @@ def abrir_config_ext_y_excluidas():
     ttk.Button(barra, text="Guardar", bootstyle=SUCCESS, command=guardar_cambios).pack(side=tk.RIGHT, padx=4)
     ttk.Button(barra, text="Cancelar", command=top.destroy).pack(side=tk.RIGHT, padx=4)
 
-# =========================
-# UI Mejorada (ttkbootstrap) + raíz compatible con DnD
-# =========================
-# RAÍZ compatible con DnD si está disponible
-if _TKDND_OK:
-    root = TkinterDnD.Tk()  # raíz con soporte de arrastrar y soltar
-else:
-    root = tk.Tk()
-
-# Aplica ttkbootstrap sobre esa raíz
-style = ttk.Style('flatly')  # p.ej. 'darkly', 'superhero', etc.
-root.title("Generador de Prompt para IA")
+# La interfaz solo se construye al ejecutar el script: los procesos del pool
+# de exportación por lotes importan este módulo sin abrir otra ventana.
+if __name__ == "__main__":
+    # =========================
+    # UI Mejorada (ttkbootstrap) + raíz compatible con DnD
+    # =========================
+    # RAÍZ compatible con DnD si está disponible
+    if _TKDND_OK:
+        root = TkinterDnD.Tk()  # raíz con soporte de arrastrar y soltar
+    else:
+        root = tk.Tk()
 
-# Icono opcional
-try:
-    icono = tk.PhotoImage(file="lightgoldenrodyellow.png")
-    root.iconphoto(True, icono)
-except Exception:
-    pass
+    # Aplica ttkbootstrap sobre esa raíz
+    style = ttk.Style('flatly')  # p.ej. 'darkly', 'superhero', etc.
+    root.title("Generador de Prompt para IA")
 
-# Maximizar/ajustar
-try:
-    root.state("zoomed")
-except Exception:
-    root.geometry(f"{root.winfo_screenwidth()}x{root.winfo_screenheight()}")
-
-# ======= Menú de aplicación =======
-menubar = tk.Menu(root)
-menu_archivo = tk.Menu(menubar, tearoff=0)
-menu_archivo.add_command(label="Seleccionar carpeta de proyecto…", command=seleccionar_carpeta_proyecto)
-menu_archivo.add_command(label="Seleccionar archivo SQLite…", command=seleccionar_sqlite)
-menu_archivo.add_separator()
-menu_archivo.add_command(label="Guardar reporte…", command=guardar_reporte)
-menu_archivo.add_separator()
-menu_archivo.add_command(label="Salir", command=root.destroy)
-menubar.add_cascade(label="Archivo", menu=menu_archivo)
-
-menu_config = tk.Menu(menubar, tearoff=0)
-menu_config.add_command(label="Extensiones y carpetas excluidas…", command=abrir_config_ext_y_excluidas)
-menubar.add_cascade(label="Configuración", menu=menu_config)
-
-root.config(menu=menubar)
-
-# ======= Barra superior =======
-header = ttk.Frame(root, padding=(16, 10))
-header.pack(fill=tk.X)
-lbl_titulo = ttk.Label(header, text="Generador de Prompt", font=("Helvetica", 18, "bold"))
-lbl_titulo.pack(side=tk.LEFT)
-
-# Barra de herramientas
-toolbar = ttk.Frame(root, padding=(12, 6))
-toolbar.pack(fill=tk.X)
-ttk.Button(toolbar, text="Seleccionar carpeta del proyecto", bootstyle=SECONDARY, command=seleccionar_carpeta_proyecto).pack(side=tk.LEFT, padx=4)
-ttk.Button(toolbar, text="Generar", bootstyle=SUCCESS, command=generar_prompt).pack(side=tk.LEFT, padx=4)
-ttk.Button(toolbar, text="Copiar", command=copiar_reporte).pack(side=tk.LEFT, padx=4)
-ttk.Button(toolbar, text="Guardar", command=guardar_reporte).pack(side=tk.LEFT, padx=4)
-ttk.Button(toolbar, text="Guardar prompts 'jocarsa-*'", bootstyle=INFO, command=guardar_prompts_para_jocarsa).pack(side=tk.LEFT, padx=4)
-
-# Pista/área de drop en el header
-drop_hint = ttk.Label(header, text="Arrastra aquí tu CARPETA de proyecto ↓", bootstyle=INFO)
-drop_hint.pack(side=tk.RIGHT, padx=8)
-
-if _TKDND_OK:
-    # Registrar destinos de drop para mejor UX
-    root.drop_target_register(DND_FILES)
-    root.dnd_bind("<<Drop>>", _on_drop_files)
-
-    header.drop_target_register(DND_FILES)
-    header.dnd_bind("<<Drop>>", _on_drop_files)
-else:
-    # Aviso ligero al pasar el ratón si no hay DnD
-    def _avisar_sin_dnd():
-        toast("Drag & Drop no disponible", "Instala 'tkinterdnd2' para activar arrastrar y soltar:\n\npip install tkinterdnd2")
-    drop_hint.bind("<Enter>", lambda e: _avisar_sin_dnd())
-
-# Separador
-ttk.Separator(root, orient=tk.HORIZONTAL).pack(fill=tk.X, pady=2)
-
-# Paned principal
-paned = ttk.PanedWindow(root, orient=tk.HORIZONTAL)
-paned.pack(fill=tk.BOTH, expand=True)
-
-# -------- ScrollableFrame reutilizable (para recuperar scroll en la izquierda) --------
-class ScrollableFrame(ttk.Frame):
-    def __init__(self, master, *args, **kwargs):
-        super().__init__(master, *args, **kwargs)
-        self.canvas = tk.Canvas(self, borderwidth=0, highlightthickness=0)
-        self.vscroll = ttk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=self.vscroll.set)
-
-        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.vscroll.pack(side=tk.RIGHT, fill=tk.Y)
-
-        self.inner = ttk.Frame(self.canvas)
-        self.window_id = self.canvas.create_window((0, 0), window=self.inner, anchor="nw")
-
-        self.inner.bind("<Configure>", self._on_configure)
-        self.canvas.bind("<Configure>", self._on_canvas_configure)
-
-        # Scroll con rueda del ratón (Windows/Linux/Mac)
-        self._bind_mousewheel(self.canvas)
-        self._bind_mousewheel(self.inner)
-
-    def _on_configure(self, event):
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-
-    def _on_canvas_configure(self, event):
-        self.canvas.itemconfig(self.window_id, width=event.width)
-
-    def _bind_mousewheel(self, widget):
-        widget.bind("<Enter>", lambda e: widget.bind_all("<MouseWheel>", self._on_mousewheel))
-        widget.bind("<Leave>", lambda e: widget.unbind_all("<MouseWheel>"))
-        widget.bind("<Enter>", lambda e: (widget.bind_all("<Button-4>", self._on_mousewheel_linux),
-                                          widget.bind_all("<Button-5>", self._on_mousewheel_linux)), add="+")
-        widget.bind("<Leave>", lambda e: (widget.unbind_all("<Button-4>"),
-                                          widget.unbind_all("<Button-5>")), add="+")
-
-    def _on_mousewheel(self, event):
-        delta = int(-1*(event.delta/120))
-        self.canvas.yview_scroll(delta, "units")
-
-    def _on_mousewheel_linux(self, event):
-        if event.num == 4:
-            self.canvas.yview_scroll(-3, "units")
-        elif event.num == 5:
-            self.canvas.yview_scroll(3, "units")
-
-# -------- Panel Izquierdo (Formulario con scroll recuperado) --------
-left_scroll = ScrollableFrame(paned)
-paned.add(left_scroll, weight=1)
-frame_izq = left_scroll.inner  # Usamos el frame interior
-
-# Grupo: Parámetros del prompt
-grp_param = ttk.Labelframe(frame_izq, text="Parámetros del prompt", padding=12)
-grp_param.pack(fill=tk.X, pady=6)
-
-def crear_campo(master, titulo, ayuda, alto=3):
-    frm = ttk.Frame(master)
-    frm.pack(fill=tk.X, pady=6)
-    ttk.Label(frm, text=titulo, font=("Helvetica", 10, "bold")).pack(anchor="w")
-    ttk.Label(frm, text=ayuda, font=("Helvetica", 8)).pack(anchor="w")
-    txt = tk.Text(frm, height=alto, wrap="word")
-    txt.pack(fill=tk.X, pady=4)
-    return txt
-
-txt_contexto = crear_campo(grp_param, "Contexto", "Describe la situación o el problema.", alto=3)
-txt_objetivo = crear_campo(grp_param, "Objetivo", "Expón claramente lo que quieres lograr.", alto=3)
-txt_restricciones = crear_campo(grp_param, "Restricciones", "Tecnologías, versiones y limitaciones.", alto=3)
-txt_formato = crear_campo(grp_param, "Formato de salida", "Código, explicación, JSON, etc.", alto=3)
-
-# Grupo: Proyecto
-grp_proy = ttk.Labelframe(frame_izq, text="Proyecto", padding=12)
-grp_proy.pack(fill=tk.X, pady=6)
-
-fila_proy = ttk.Frame(grp_proy)
-fila_proy.pack(fill=tk.X)
-ttk.Button(fila_proy, text="Seleccionar carpeta…", command=seleccionar_carpeta_proyecto).pack(side=tk.LEFT)
-lbl_carpeta = ttk.Label(fila_proy, text=cfg.get("ultima_carpeta_codigo") or "(sin carpeta seleccionada)")
-lbl_carpeta.pack(side=tk.LEFT, padx=8)
-
-# Grupo: Base de datos
-grp_bd = ttk.Labelframe(frame_izq, text="Base de datos", padding=12)
-grp_bd.pack(fill=tk.X, pady=6)
-
-var_bd = tk.StringVar(value="sqlite")
-fila_bd_opts = ttk.Frame(grp_bd)
-fila_bd_opts.pack(fill=tk.X, pady=4)
-ttk.Radiobutton(fila_bd_opts, text="SQLite", variable=var_bd, value="sqlite",
-                command=alternar_opciones_bd).pack(side=tk.LEFT, padx=6)
-ttk.Radiobutton(fila_bd_opts, text="MySQL", variable=var_bd, value="mysql",
-                command=alternar_opciones_bd).pack(side=tk.LEFT, padx=6)
-
-# SQLite
-marco_sqlite = ttk.Frame(grp_bd)
-fila_sqlite = ttk.Frame(marco_sqlite)
-fila_sqlite.pack(fill=tk.X, pady=4)
-ttk.Button(fila_sqlite, text="Seleccionar archivo SQLite…", command=seleccionar_sqlite).pack(side=tk.LEFT)
-lbl_sqlite = ttk.Label(fila_sqlite, text=os.path.basename(cfg.get("sqlite_file")) if cfg.get("sqlite_file") else "(ningún archivo seleccionado)")
-lbl_sqlite.pack(side=tk.LEFT, padx=8)
-
-# MySQL
-marco_mysql = ttk.Frame(grp_bd)
-ttk.Label(marco_mysql, text="Servidor:").pack(anchor="w", padx=4, pady=2)
-ent_mysql_servidor = ttk.Entry(marco_mysql)
-ent_mysql_servidor.pack(fill=tk.X, padx=4, pady=2)
-ent_mysql_servidor.bind("<FocusOut>", guardar_datos_mysql_si_cambian)
-
-ttk.Label(marco_mysql, text="Usuario:").pack(anchor="w", padx=4, pady=2)
-ent_mysql_usuario = ttk.Entry(marco_mysql)
-ent_mysql_usuario.pack(fill=tk.X, padx=4, pady=2)
-ent_mysql_usuario.bind("<FocusOut>", guardar_datos_mysql_si_cambian)
-
-ttk.Label(marco_mysql, text="Contraseña:").pack(anchor="w", padx=4, pady=2)
-ent_mysql_contrasena = ttk.Entry(marco_mysql, show="*")
-ent_mysql_contrasena.pack(fill=tk.X, padx=4, pady=2)
-ent_mysql_contrasena.bind("<FocusOut>", guardar_datos_mysql_si_cambian)
-
-ttk.Label(marco_mysql, text="Base de datos:").pack(anchor="w", padx=4, pady=2)
-ent_mysql_bd = ttk.Entry(marco_mysql)
-ent_mysql_bd.pack(fill=tk.X, padx=4, pady=2)
-ent_mysql_bd.bind("<FocusOut>", guardar_datos_mysql_si_cambian)
-
-# Botones de BD y generación
-fila_acciones = ttk.Frame(frame_izq)
-fila_acciones.pack(fill=tk.X, pady=8)
-ttk.Button(fila_acciones, text="Probar conexión BD", command=probar_conexion_bd).pack(side=tk.LEFT, padx=4)
-ttk.Button(fila_acciones, text="Generar Prompt", bootstyle=SUCCESS, command=generar_prompt).pack(side=tk.LEFT, padx=4)
-ttk.Button(fila_acciones, text="Guardar prompts para 'jocarsa-*'", bootstyle=INFO, command=guardar_prompts_para_jocarsa).pack(side=tk.LEFT, padx=4)
-
-# -------- Panel Derecho (Salida con conmutador Markdown/WYSIWYG y barra de scroll) --------
-frame_der = ttk.Frame(paned, padding=10)
-paned.add(frame_der, weight=1)
-
-header_der = ttk.Frame(frame_der)
-header_der.pack(fill=tk.X)
-ttk.Label(header_der, text="Salida", font=("Helvetica", 14, "bold")).pack(side=tk.LEFT)
-
-vista_modo = tk.StringVar(value="markdown")  # 'markdown' o 'vista'
-def on_toggle_vista():
-    actualizar_vista_salida()
+    # Icono opcional
+    try:
+        icono = tk.PhotoImage(file="lightgoldenrodyellow.png")
+        root.iconphoto(True, icono)
+    except Exception:
+        pass
 
-ttk.Label(header_der, text="Vista:").pack(side=tk.RIGHT, padx=(0, 6))
-ttk.Radiobutton(header_der, text="WYSIWYG", variable=vista_modo, value="vista", command=on_toggle_vista).pack(side=tk.RIGHT)
-ttk.Radiobutton(header_der, text="Markdown", variable=vista_modo, value="markdown", command=on_toggle_vista).pack(side=tk.RIGHT)
-
-# 1) CONTENEDOR de Markdown crudo con SCROLLBAR VERTICAL visible
-frame_markdown = ttk.Frame(frame_der)
-frame_markdown.pack(fill=tk.BOTH, expand=True)
-scroll_md = ttk.Scrollbar(frame_markdown, orient="vertical")
-txt_salida_raw = tk.Text(frame_markdown, wrap="word", state=tk.DISABLED, yscrollcommand=scroll_md.set)
-scroll_md.config(command=txt_salida_raw.yview)
-txt_salida_raw.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-scroll_md.pack(side=tk.RIGHT, fill=tk.Y)
-
-# 2) Vista “WYSIWYG” (Text con estilos + su propia barra de scroll)
-frame_vista = ttk.Frame(frame_der)
-txt_vista = tk.Text(frame_vista, wrap="word", state=tk.DISABLED)
-scroll_vista = ttk.Scrollbar(frame_vista, orient="vertical", command=txt_vista.yview)
-txt_vista.configure(yscrollcommand=scroll_vista.set)
-txt_vista.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-scroll_vista.pack(side=tk.RIGHT, fill=tk.Y)
-
-# Fuentes para vista
-font_base = tkfont.Font(family="Helvetica", size=11)
-font_h1 = tkfont.Font(family="Helvetica", size=18, weight="bold")
-font_h2 = tkfont.Font(family="Helvetica", size=16, weight="bold")
-font_h3 = tkfont.Font(family="Helvetica", size=14, weight="bold")
-font_bold = tkfont.Font(family="Helvetica", size=11, weight="bold")
-font_code = tkfont.Font(family="Courier", size=10)
-
-# Tags
-txt_vista.tag_configure("h1", font=font_h1, spacing3=6)
-txt_vista.tag_configure("h2", font=font_h2, spacing3=4)
-txt_vista.tag_configure("h3", font=font_h3, spacing3=2)
-txt_vista.tag_configure("bold", font=font_bold)
-txt_vista.tag_configure("codeblock", font=font_code, background="#f5f5f5", spacing1=2, spacing3=6, lmargin1=8, lmargin2=8)
-txt_vista.tag_configure("mono", font=font_code)
-txt_vista.tag_configure("p", font=font_base, spacing3=6)
-
-def renderizar_vista(markdown_text: str):
-    """
-    Render sencillo de Markdown a Text con estilos:
-    - #, ##, ### como headers
-    - **negrita**
-    - ``` bloques de código ```
-    - `inline code`
-    - resto como párrafos
-    """
-    txt_vista.config(state=tk.NORMAL)
-    txt_vista.delete("1.0", tk.END)
-
-    in_code = False
-    code_buffer = []
-    for raw_line in markdown_text.splitlines():
-        line = raw_line.rstrip("\n")
-
-        # Bloques de código ```lang
-        if line.strip().startswith("```"):
-            if not in_code:
-                in_code = True
-                code_buffer = []
+    # Maximizar/ajustar
+    try:
+        root.state("zoomed")
+    except Exception:
+        root.geometry(f"{root.winfo_screenwidth()}x{root.winfo_screenheight()}")
+
+    # ======= Menú de aplicación =======
+    menubar = tk.Menu(root)
+    menu_archivo = tk.Menu(menubar, tearoff=0)
+    menu_archivo.add_command(label="Seleccionar carpeta de proyecto…", command=seleccionar_carpeta_proyecto)
+    menu_archivo.add_command(label="Seleccionar archivo SQLite…", command=seleccionar_sqlite)
+    menu_archivo.add_separator()
+    menu_archivo.add_command(label="Guardar reporte…", command=guardar_reporte)
+    menu_archivo.add_separator()
+    menu_archivo.add_command(label="Salir", command=root.destroy)
+    menubar.add_cascade(label="Archivo", menu=menu_archivo)
+
+    menu_config = tk.Menu(menubar, tearoff=0)
+    menu_config.add_command(label="Extensiones y carpetas excluidas…", command=abrir_config_ext_y_excluidas)
+    menubar.add_cascade(label="Configuración", menu=menu_config)
+
+    root.config(menu=menubar)
+
+    # ======= Barra superior =======
+    header = ttk.Frame(root, padding=(16, 10))
+    header.pack(fill=tk.X)
+    lbl_titulo = ttk.Label(header, text="Generador de Prompt", font=("Helvetica", 18, "bold"))
+    lbl_titulo.pack(side=tk.LEFT)
+
+    # Barra de herramientas
+    toolbar = ttk.Frame(root, padding=(12, 6))
+    toolbar.pack(fill=tk.X)
+    ttk.Button(toolbar, text="Seleccionar carpeta del proyecto", bootstyle=SECONDARY, command=seleccionar_carpeta_proyecto).pack(side=tk.LEFT, padx=4)
+    ttk.Button(toolbar, text="Generar", bootstyle=SUCCESS, command=generar_prompt).pack(side=tk.LEFT, padx=4)
+    ttk.Button(toolbar, text="Copiar", command=copiar_reporte).pack(side=tk.LEFT, padx=4)
+    ttk.Button(toolbar, text="Guardar", command=guardar_reporte).pack(side=tk.LEFT, padx=4)
+    ttk.Button(toolbar, text="Guardar prompts 'jocarsa-*'", bootstyle=INFO, command=guardar_prompts_para_jocarsa).pack(side=tk.LEFT, padx=4)
+
+    # Pista/área de drop en el header
+    drop_hint = ttk.Label(header, text="Arrastra aquí tu CARPETA de proyecto ↓", bootstyle=INFO)
+    drop_hint.pack(side=tk.RIGHT, padx=8)
+
+    if _TKDND_OK:
+        # Registrar destinos de drop para mejor UX
+        root.drop_target_register(DND_FILES)
+        root.dnd_bind("<<Drop>>", _on_drop_files)
+
+        header.drop_target_register(DND_FILES)
+        header.dnd_bind("<<Drop>>", _on_drop_files)
+    else:
+        # Aviso ligero al pasar el ratón si no hay DnD
+        def _avisar_sin_dnd():
+            toast("Drag & Drop no disponible", "Instala 'tkinterdnd2' para activar arrastrar y soltar:\n\npip install tkinterdnd2")
+        drop_hint.bind("<Enter>", lambda e: _avisar_sin_dnd())
+
+    # Separador
+    ttk.Separator(root, orient=tk.HORIZONTAL).pack(fill=tk.X, pady=2)
+
+    # Paned principal
+    paned = ttk.PanedWindow(root, orient=tk.HORIZONTAL)
+    paned.pack(fill=tk.BOTH, expand=True)
+
+    # -------- ScrollableFrame reutilizable (para recuperar scroll en la izquierda) --------
+    class ScrollableFrame(ttk.Frame):
+        def __init__(self, master, *args, **kwargs):
+            super().__init__(master, *args, **kwargs)
+            self.canvas = tk.Canvas(self, borderwidth=0, highlightthickness=0)
+            self.vscroll = ttk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
+            self.canvas.configure(yscrollcommand=self.vscroll.set)
+
+            self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            self.vscroll.pack(side=tk.RIGHT, fill=tk.Y)
+
+            self.inner = ttk.Frame(self.canvas)
+            self.window_id = self.canvas.create_window((0, 0), window=self.inner, anchor="nw")
+
+            self.inner.bind("<Configure>", self._on_configure)
+            self.canvas.bind("<Configure>", self._on_canvas_configure)
+
+            # Scroll con rueda del ratón (Windows/Linux/Mac)
+            self._bind_mousewheel(self.canvas)
+            self._bind_mousewheel(self.inner)
+
+        def _on_configure(self, event):
+            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+
+        def _on_canvas_configure(self, event):
+            self.canvas.itemconfig(self.window_id, width=event.width)
+
+        def _bind_mousewheel(self, widget):
+            widget.bind("<Enter>", lambda e: widget.bind_all("<MouseWheel>", self._on_mousewheel))
+            widget.bind("<Leave>", lambda e: widget.unbind_all("<MouseWheel>"))
+            widget.bind("<Enter>", lambda e: (widget.bind_all("<Button-4>", self._on_mousewheel_linux),
+                                              widget.bind_all("<Button-5>", self._on_mousewheel_linux)), add="+")
+            widget.bind("<Leave>", lambda e: (widget.unbind_all("<Button-4>"),
+                                              widget.unbind_all("<Button-5>")), add="+")
+
+        def _on_mousewheel(self, event):
+            delta = int(-1*(event.delta/120))
+            self.canvas.yview_scroll(delta, "units")
+
+        def _on_mousewheel_linux(self, event):
+            if event.num == 4:
+                self.canvas.yview_scroll(-3, "units")
+            elif event.num == 5:
+                self.canvas.yview_scroll(3, "units")
+
+    # -------- Panel Izquierdo (Formulario con scroll recuperado) --------
+    left_scroll = ScrollableFrame(paned)
+    paned.add(left_scroll, weight=1)
+    frame_izq = left_scroll.inner  # Usamos el frame interior
+
+    # Grupo: Parámetros del prompt
+    grp_param = ttk.Labelframe(frame_izq, text="Parámetros del prompt", padding=12)
+    grp_param.pack(fill=tk.X, pady=6)
+
+    def crear_campo(master, titulo, ayuda, alto=3):
+        frm = ttk.Frame(master)
+        frm.pack(fill=tk.X, pady=6)
+        ttk.Label(frm, text=titulo, font=("Helvetica", 10, "bold")).pack(anchor="w")
+        ttk.Label(frm, text=ayuda, font=("Helvetica", 8)).pack(anchor="w")
+        txt = tk.Text(frm, height=alto, wrap="word")
+        txt.pack(fill=tk.X, pady=4)
+        return txt
+
+    txt_contexto = crear_campo(grp_param, "Contexto", "Describe la situación o el problema.", alto=3)
+    txt_objetivo = crear_campo(grp_param, "Objetivo", "Expón claramente lo que quieres lograr.", alto=3)
+    txt_restricciones = crear_campo(grp_param, "Restricciones", "Tecnologías, versiones y limitaciones.", alto=3)
+    txt_formato = crear_campo(grp_param, "Formato de salida", "Código, explicación, JSON, etc.", alto=3)
+
+    # Grupo: Proyecto
+    grp_proy = ttk.Labelframe(frame_izq, text="Proyecto", padding=12)
+    grp_proy.pack(fill=tk.X, pady=6)
+
+    fila_proy = ttk.Frame(grp_proy)
+    fila_proy.pack(fill=tk.X)
+    ttk.Button(fila_proy, text="Seleccionar carpeta…", command=seleccionar_carpeta_proyecto).pack(side=tk.LEFT)
+    lbl_carpeta = ttk.Label(fila_proy, text=cfg.get("ultima_carpeta_codigo") or "(sin carpeta seleccionada)")
+    lbl_carpeta.pack(side=tk.LEFT, padx=8)
+
+    # Grupo: Base de datos
+    grp_bd = ttk.Labelframe(frame_izq, text="Base de datos", padding=12)
+    grp_bd.pack(fill=tk.X, pady=6)
+
+    var_bd = tk.StringVar(value="sqlite")
+    fila_bd_opts = ttk.Frame(grp_bd)
+    fila_bd_opts.pack(fill=tk.X, pady=4)
+    ttk.Radiobutton(fila_bd_opts, text="SQLite", variable=var_bd, value="sqlite",
+                    command=alternar_opciones_bd).pack(side=tk.LEFT, padx=6)
+    ttk.Radiobutton(fila_bd_opts, text="MySQL", variable=var_bd, value="mysql",
+                    command=alternar_opciones_bd).pack(side=tk.LEFT, padx=6)
+
+    # SQLite
+    marco_sqlite = ttk.Frame(grp_bd)
+    fila_sqlite = ttk.Frame(marco_sqlite)
+    fila_sqlite.pack(fill=tk.X, pady=4)
+    ttk.Button(fila_sqlite, text="Seleccionar archivo SQLite…", command=seleccionar_sqlite).pack(side=tk.LEFT)
+    lbl_sqlite = ttk.Label(fila_sqlite, text=os.path.basename(cfg.get("sqlite_file")) if cfg.get("sqlite_file") else "(ningún archivo seleccionado)")
+    lbl_sqlite.pack(side=tk.LEFT, padx=8)
+
+    # MySQL
+    marco_mysql = ttk.Frame(grp_bd)
+    ttk.Label(marco_mysql, text="Servidor:").pack(anchor="w", padx=4, pady=2)
+    ent_mysql_servidor = ttk.Entry(marco_mysql)
+    ent_mysql_servidor.pack(fill=tk.X, padx=4, pady=2)
+    ent_mysql_servidor.bind("<FocusOut>", guardar_datos_mysql_si_cambian)
+
+    ttk.Label(marco_mysql, text="Usuario:").pack(anchor="w", padx=4, pady=2)
+    ent_mysql_usuario = ttk.Entry(marco_mysql)
+    ent_mysql_usuario.pack(fill=tk.X, padx=4, pady=2)
+    ent_mysql_usuario.bind("<FocusOut>", guardar_datos_mysql_si_cambian)
+
+    ttk.Label(marco_mysql, text="Contraseña:").pack(anchor="w", padx=4, pady=2)
+    ent_mysql_contrasena = ttk.Entry(marco_mysql, show="*")
+    ent_mysql_contrasena.pack(fill=tk.X, padx=4, pady=2)
+    ent_mysql_contrasena.bind("<FocusOut>", guardar_datos_mysql_si_cambian)
+
+    ttk.Label(marco_mysql, text="Base de datos:").pack(anchor="w", padx=4, pady=2)
+    ent_mysql_bd = ttk.Entry(marco_mysql)
+    ent_mysql_bd.pack(fill=tk.X, padx=4, pady=2)
+    ent_mysql_bd.bind("<FocusOut>", guardar_datos_mysql_si_cambian)
+
+    # Botones de BD y generación
+    fila_acciones = ttk.Frame(frame_izq)
+    fila_acciones.pack(fill=tk.X, pady=8)
+    ttk.Button(fila_acciones, text="Probar conexión BD", command=probar_conexion_bd).pack(side=tk.LEFT, padx=4)
+    ttk.Button(fila_acciones, text="Generar Prompt", bootstyle=SUCCESS, command=generar_prompt).pack(side=tk.LEFT, padx=4)
+    ttk.Button(fila_acciones, text="Guardar prompts para 'jocarsa-*'", bootstyle=INFO, command=guardar_prompts_para_jocarsa).pack(side=tk.LEFT, padx=4)
+
+    # -------- Panel Derecho (Salida con conmutador Markdown/WYSIWYG y barra de scroll) --------
+    frame_der = ttk.Frame(paned, padding=10)
+    paned.add(frame_der, weight=1)
+
+    header_der = ttk.Frame(frame_der)
+    header_der.pack(fill=tk.X)
+    ttk.Label(header_der, text="Salida", font=("Helvetica", 14, "bold")).pack(side=tk.LEFT)
+
+    vista_modo = tk.StringVar(value="markdown")  # 'markdown' o 'vista'
+    def on_toggle_vista():
+        actualizar_vista_salida()
+
+    ttk.Label(header_der, text="Vista:").pack(side=tk.RIGHT, padx=(0, 6))
+    ttk.Radiobutton(header_der, text="WYSIWYG", variable=vista_modo, value="vista", command=on_toggle_vista).pack(side=tk.RIGHT)
+    ttk.Radiobutton(header_der, text="Markdown", variable=vista_modo, value="markdown", command=on_toggle_vista).pack(side=tk.RIGHT)
+
+    # 1) CONTENEDOR de Markdown crudo con SCROLLBAR VERTICAL visible
+    frame_markdown = ttk.Frame(frame_der)
+    frame_markdown.pack(fill=tk.BOTH, expand=True)
+    scroll_md = ttk.Scrollbar(frame_markdown, orient="vertical")
+    txt_salida_raw = tk.Text(frame_markdown, wrap="word", state=tk.DISABLED, yscrollcommand=scroll_md.set)
+    scroll_md.config(command=txt_salida_raw.yview)
+    txt_salida_raw.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    scroll_md.pack(side=tk.RIGHT, fill=tk.Y)
+
+    # Paginador (solo visible cuando el reporte ocupa más de una página)
+    barra_paginas = ttk.Frame(frame_markdown, padding=(0, 6, 0, 0))
+    var_pagina = tk.StringVar(value="")
+    ttk.Button(barra_paginas, text="◀ Anterior", bootstyle=SECONDARY,
+               command=lambda: mostrar_pagina(_paginas["pagina"] - 1)).pack(side=tk.LEFT)
+    ttk.Label(barra_paginas, textvariable=var_pagina).pack(side=tk.LEFT, padx=8)
+    ttk.Button(barra_paginas, text="Siguiente ▶", bootstyle=SECONDARY,
+               command=lambda: mostrar_pagina(_paginas["pagina"] + 1)).pack(side=tk.LEFT)
+
+    # 2) Vista “WYSIWYG” (Text con estilos + su propia barra de scroll)
+    frame_vista = ttk.Frame(frame_der)
+    txt_vista = tk.Text(frame_vista, wrap="word", state=tk.DISABLED)
+    scroll_vista = ttk.Scrollbar(frame_vista, orient="vertical", command=txt_vista.yview)
+    txt_vista.configure(yscrollcommand=scroll_vista.set)
+    txt_vista.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    scroll_vista.pack(side=tk.RIGHT, fill=tk.Y)
+
+    # Fuentes para vista
+    font_base = tkfont.Font(family="Helvetica", size=11)
+    font_h1 = tkfont.Font(family="Helvetica", size=18, weight="bold")
+    font_h2 = tkfont.Font(family="Helvetica", size=16, weight="bold")
+    font_h3 = tkfont.Font(family="Helvetica", size=14, weight="bold")
+    font_bold = tkfont.Font(family="Helvetica", size=11, weight="bold")
+    font_code = tkfont.Font(family="Courier", size=10)
+
+    # Tags
+    txt_vista.tag_configure("h1", font=font_h1, spacing3=6)
+    txt_vista.tag_configure("h2", font=font_h2, spacing3=4)
+    txt_vista.tag_configure("h3", font=font_h3, spacing3=2)
+    txt_vista.tag_configure("bold", font=font_bold)
+    txt_vista.tag_configure("codeblock", font=font_code, background="#f5f5f5", spacing1=2, spacing3=6, lmargin1=8, lmargin2=8)
+    txt_vista.tag_configure("mono", font=font_code)
+    txt_vista.tag_configure("p", font=font_base, spacing3=6)
+
+    RE_NEGRITA = re.compile(r"\*\*(.+?)\*\*")
+    RE_MONO = re.compile(r"\`(.+?)\`")
+
+    CARACTERES_POR_TROZO = 200000  # texto insertado en cada llamada a txt_vista.insert
+    PRESUPUESTO_TROZO_MS = 15     # tiempo máximo por tanda antes de devolver el control a Tk
+
+    def _tramos_parrafo(line):
+        """Tramos (texto, tags) de una línea normal con sus **negritas** y `código`."""
+        rangos = []
+        if "**" in line:
+            rangos += [(m.start(1), m.end(1), "bold") for m in RE_NEGRITA.finditer(line)]
+        if "`" in line:
+            rangos += [(m.start(1), m.end(1), "mono") for m in RE_MONO.finditer(line)]
+        if not rangos:
+            return [(line + "\n", ("p",))]
+        cortes = sorted({0, len(line)} | {c for r in rangos for c in r[:2]})
+        tramos = []
+        for ini, fin in zip(cortes, cortes[1:]):
+            tags = ("p",) + tuple(t for r_ini, r_fin, t in rangos if r_ini <= ini and fin <= r_fin)
+            tramos.append((line[ini:fin], tags))
+        tramos.append(("\n", ("p",)))
+        return tramos
+
+    def tokenizar_markdown(markdown_text):
+        """
+        Convierte el Markdown en tramos (texto, tags) listos para txt_vista:
+        - #, ##, ### como headers
+        - **negrita**
+        - ``` bloques de código ```
+        - `inline code`
+        - resto como párrafos
+        Los tramos contiguos con los mismos tags se fusionan.
+        """
+        tramos = []
+        def anadir(texto, tags):
+            if tramos and tramos[-1][1] == tags:
+                tramos[-1][0].append(texto)
             else:
-                # Fin de bloque
-                if code_buffer:
-                    start = txt_vista.index(tk.INSERT)
-                    txt_vista.insert(tk.END, "\n".join(code_buffer) + "\n")
-                    end = txt_vista.index(tk.INSERT)
-                    txt_vista.tag_add("codeblock", start, end)
-                in_code = False
-            continue
-
-        if in_code:
-            code_buffer.append(line)
-            continue
-
-        # Encabezados
-        if line.startswith("### "):
-            start = txt_vista.index(tk.INSERT)
-            txt_vista.insert(tk.END, line[4:] + "\n")
-            end = txt_vista.index(tk.INSERT)
-            txt_vista.tag_add("h3", start, end)
-            continue
-        if line.startswith("## "):
-            start = txt_vista.index(tk.INSERT)
-            txt_vista.insert(tk.END, line[3:] + "\n")
-            end = txt_vista.index(tk.INSERT)
-            txt_vista.tag_add("h2", start, end)
-            continue
-        if line.startswith("# "):
-            start = txt_vista.index(tk.INSERT)
-            txt_vista.insert(tk.END, line[2:] + "\n")
-            end = txt_vista.index(tk.INSERT)
-            txt_vista.tag_add("h1", start, end)
-            continue
-
-        # Negrita **texto**
-        start_para = txt_vista.index(tk.INSERT)
-        txt_vista.insert(tk.END, line + "\n")
-        end_para = txt_vista.index(tk.INSERT)
-
-        for m in re.finditer(r"\*\*(.+?)\*\*", line):
-            s = f"{start_para}+{m.start(1)}c"
-            e = f"{start_para}+{m.end(1)}c"
-            txt_vista.tag_add("bold", s, e)
+                tramos.append(([texto], tags))
+
+        in_code = False
+        code_buffer = []
+        for line in markdown_text.splitlines():
+            # Bloques de código ```lang
+            if line.strip().startswith("```"):
+                if not in_code:
+                    in_code = True
+                    code_buffer = []
+                else:
+                    if code_buffer:
+                        anadir("\n".join(code_buffer) + "\n", ("codeblock",))
+                    in_code = False
+                continue
+
+            if in_code:
+                code_buffer.append(line)
+                continue
+
+            # Encabezados
+            if line.startswith("### "):
+                anadir(line[4:] + "\n", ("h3",))
+            elif line.startswith("## "):
+                anadir(line[3:] + "\n", ("h2",))
+            elif line.startswith("# "):
+                anadir(line[2:] + "\n", ("h1",))
+            else:
+                for texto, tags in _tramos_parrafo(line):
+                    anadir(texto, tags)
 
-        # `inline code`
-        for m in re.finditer(r"\`(.+?)\`", line):
-            s = f"{start_para}+{m.start(1)}c"
-            e = f"{start_para}+{m.end(1)}c"
-            txt_vista.tag_add("mono", s, e)
+        return [("".join(partes), tags) for partes, tags in tramos]
 
-        txt_vista.tag_add("p", start_para, end_para)
+    # Último Markdown tokenizado y estado del render por tandas
+    _vista = {"texto": None, "tramos": [], "siguiente": 0, "tarea": None}
 
-    txt_vista.config(state=tk.DISABLED)
+    def renderizar_vista(markdown_text: str):
+        """
+        Render de Markdown a Text con estilos. El texto se tokeniza una sola vez
+        (si no ha cambiado, alternar de vista no vuelve a pintar nada) y se inserta
+        en tandas grandes con root.after, para no bloquear la interfaz.
+        """
+        if markdown_text == _vista["texto"]:
+            return
+        if _vista["tarea"] is not None:
+            root.after_cancel(_vista["tarea"])
+        _vista.update(texto=markdown_text, tramos=tokenizar_markdown(markdown_text),
+                      siguiente=0, tarea=None)
+        txt_vista.config(state=tk.NORMAL)
+        txt_vista.delete("1.0", tk.END)
+        txt_vista.config(state=tk.DISABLED)
+        _renderizar_tanda()
+
+    def _renderizar_tanda():
+        tramos = _vista["tramos"]
+        limite = time.perf_counter() + PRESUPUESTO_TROZO_MS / 1000
+        txt_vista.config(state=tk.NORMAL)
+        i = _vista["siguiente"]
+        while i < len(tramos) and time.perf_counter() < limite:
+            # Una sola llamada insert(texto, tags, texto, tags, ...) por tanda
+            argumentos = []
+            caracteres = 0
+            while i < len(tramos) and caracteres < CARACTERES_POR_TROZO:
+                texto, tags = tramos[i]
+                argumentos += [texto, tags]
+                caracteres += len(texto)
+                i += 1
+            txt_vista.insert(tk.END, *argumentos)
+        txt_vista.config(state=tk.DISABLED)
+        _vista["siguiente"] = i
+        if i < len(tramos):
+            _vista["tarea"] = root.after(1, _renderizar_tanda)
+        else:
+            _vista["tarea"] = None
 
-def actualizar_vista_salida():
-    modo = vista_modo.get()
-    if modo == "markdown":
-        frame_vista.pack_forget()
-        frame_markdown.pack(fill=tk.BOTH, expand=True)
-    else:
-        contenido = txt_salida_raw.get("1.0", tk.END)
-        renderizar_vista(contenido)
-        frame_markdown.pack_forget()
-        frame_vista.pack(fill=tk.BOTH, expand=True)
-
-# ======= Barra de estado =======
-statusbar = ttk.Frame(root, padding=(10, 6))
-statusbar.pack(fill=tk.X)
-var_status = tk.StringVar(value="Listo.")
-ttk.Label(statusbar, textvariable=var_status).pack(side=tk.LEFT)
-prog = ttk.Progressbar(statusbar, mode="indeterminate", bootstyle=INFO)
-
-# Mostrar el panel correcto según la BD seleccionada
-alternar_opciones_bd()
-
-# Splash de bienvenida
-root.after(250, mostrar_bienvenida)
-
-set_status("Listo. Configura los parámetros y genera el prompt.")
-root.mainloop()
+    def actualizar_vista_salida():
+        modo = vista_modo.get()
+        if modo == "markdown":
+            frame_vista.pack_forget()
+            frame_markdown.pack(fill=tk.BOTH, expand=True)
+        else:
+            renderizar_vista(reporte_actual)
+            frame_markdown.pack_forget()
+            frame_vista.pack(fill=tk.BOTH, expand=True)
+
+    # ======= Barra de estado =======
+    statusbar = ttk.Frame(root, padding=(10, 6))
+    statusbar.pack(fill=tk.X)
+    var_status = tk.StringVar(value="Listo.")
+    ttk.Label(statusbar, textvariable=var_status).pack(side=tk.LEFT)
+    prog = ttk.Progressbar(statusbar, mode="indeterminate", bootstyle=INFO, length=220)
+    btn_cancelar = ttk.Button(statusbar, text="Cancelar", bootstyle=DANGER, command=cancelar_generacion)
+
+    # Mostrar el panel correcto según la BD seleccionada
+    alternar_opciones_bd()
+
+    # Splash de bienvenida
+    root.after(250, mostrar_bienvenida)
+
+    set_status("Listo. Configura los parámetros y genera el prompt.")
+    root.mainloop()
 
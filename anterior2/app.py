@@ -1,17 +1,45 @@
 import os
+import asyncio
 import re
+import sys
 import json
+import logging
+import bisect
+import functools
+import math
+import hashlib
+import time
+import uuid
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from urllib.request import pathname2url
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory, stream_with_context
 import sqlite3
 
+# Motor de filtrado compartido con el CLI y la app Tk (filtros.py en la raíz del repositorio)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cambios import calcular_cambios
+from filtros import FiltroRutas
+from perfil import NULO, Perfil
+
 # Optional MySQL
 try:
     import pymysql
 except Exception:
     pymysql = None
 
+# Optional tokenizador exacto para el presupuesto de tokens
+try:
+    import tiktoken
+except Exception:
+    tiktoken = None
+
 app = Flask(__name__, template_folder="templates", static_folder="static")
+_log = logging.getLogger(__name__)
 
 # =========================
 # Configuración / Constantes
@@ -29,6 +57,21 @@ CARPETAS_EXCLUIDAS_DEF = [
 
 EXTENSIONES_PERMITIDAS = tuple(EXTENSIONES_PERMITIDAS_DEF)
 CARPETAS_EXCLUIDAS = set(CARPETAS_EXCLUIDAS_DEF)
+FILTRO = FiltroRutas(EXTENSIONES_PERMITIDAS, CARPETAS_EXCLUIDAS)
+
+LANG_MAP = {
+    ".html": "html", ".css": "css", ".js": "js", ".php": "php",
+    ".py": "python", ".java": "java", ".sql": "sql", ".c": "c",
+    ".cpp": "cpp", ".cu": "cuda", ".h": "c", ".json": "json",
+    ".xml": "xml", ".md": "markdown",
+}
+
+# Archivos que suelen ser punto de entrada: se priorizan al empaquetar por tokens
+NOMBRES_ENTRADA = {
+    "app.py", "main.py", "manage.py", "server.py", "wsgi.py", "__main__.py",
+    "index.php", "index.html", "index.js", "main.js", "server.js", "app.js",
+    "main.c", "main.cpp", "main.cu", "Main.java",
+}
 
 # =========================
 # Persistencia de config
@@ -48,6 +91,7 @@ def cargar_config():
     cfg.setdefault("mysql", {"server": "", "user": "", "password": "", "database": ""})
     cfg.setdefault("extensiones_permitidas", EXTENSIONES_PERMITIDAS_DEF)
     cfg.setdefault("carpetas_excluidas", CARPETAS_EXCLUIDAS_DEF)
+    cfg.setdefault("usar_gitignore", True)
     cfg.setdefault("mostrar_bienvenida", True)
     return cfg
 
@@ -60,7 +104,7 @@ def guardar_config(new_values: dict):
     return cfg
 
 def _aplicar_config_a_variables(cfg):
-    global EXTENSIONES_PERMITIDAS, CARPETAS_EXCLUIDAS
+    global EXTENSIONES_PERMITIDAS, CARPETAS_EXCLUIDAS, FILTRO
     exts = cfg.get("extensiones_permitidas", EXTENSIONES_PERMITIDAS_DEF)
     exts_norm = []
     for e in exts:
@@ -73,6 +117,8 @@ def _aplicar_config_a_variables(cfg):
     EXTENSIONES_PERMITIDAS = tuple(sorted(set(exts_norm)))
     excl = cfg.get("carpetas_excluidas", CARPETAS_EXCLUIDAS_DEF)
     CARPETAS_EXCLUIDAS = set([c.strip() for c in excl if c.strip()])
+    # Las carpetas excluidas admiten también patrones .gitignore ('dist/**', '*.min.js')
+    FILTRO = FiltroRutas(EXTENSIONES_PERMITIDAS, sorted(CARPETAS_EXCLUIDAS), bool(cfg.get("usar_gitignore", True)))
 
 cfg = cargar_config()
 _aplicar_config_a_variables(cfg)
@@ -80,107 +126,511 @@ _aplicar_config_a_variables(cfg)
 # =========================
 # Núcleo de análisis
 # =========================
-def construir_mapa_directorios(ruta_raiz):
+class LectorDisco:
+    """Listado (con FILTRO) y lectura de archivos de texto, medidos en `perfil`."""
+
+    def __init__(self, perfil=NULO):
+        self.perfil = perfil
+
+    def listar(self, ruta_abs, ruta_rel, pila):
+        self.perfil.contar("carpetas_visitadas")
+        with self.perfil.fase("listado"):
+            return FILTRO.listar(ruta_abs, ruta_rel, pila)
+
+    def leer(self, ruta):
+        with self.perfil.fase("lectura"), open(ruta, "r", encoding="utf-8", errors="ignore") as f:
+            contenido = f.read()
+        self.perfil.contar("archivos_leidos")
+        self.perfil.contar("bytes_leidos", len(contenido))
+        return contenido
+
+def construir_mapa_directorios(ruta_raiz, perfil=NULO, lector=None, recuento=None):
+    # Con `recuento` (dict) se cuentan de paso los archivos permitidos en recuento["archivos"]
+    lector = lector or LectorDisco(perfil)
     lineas = []
     raiz_abs = os.path.abspath(ruta_raiz)
     lineas.append(raiz_abs)
 
-    def interno(dir_path, prefijo=""):
+    def interno(dir_path, prefijo="", ruta_rel="", pila=()):
         try:
-            entradas = sorted(os.listdir(dir_path))
+            entradas, pila = lector.listar(dir_path, ruta_rel, pila)
         except Exception:
             return
-        entradas = [
-            e for e in entradas
-            if not (os.path.isdir(os.path.join(dir_path, e)) and e in CARPETAS_EXCLUIDAS)
-        ]
         for i, entrada in enumerate(entradas):
-            ruta_completa = os.path.join(dir_path, entrada)
             conector = "└── " if i == len(entradas) - 1 else "├── "
-            lineas.append(prefijo + conector + entrada)
-            if os.path.isdir(ruta_completa):
+            lineas.append(prefijo + conector + entrada.name)
+            if recuento is not None and _es_fichero(entrada) and FILTRO.extension_permitida(entrada.name):
+                recuento["archivos"] = recuento.get("archivos", 0) + 1
+            if _es_carpeta(entrada):
                 extension = "    " if i == len(entradas) - 1 else "│   "
-                interno(ruta_completa, prefijo + extension)
+                hijo_rel = f"{ruta_rel}/{entrada.name}" if ruta_rel else entrada.name
+                interno(entrada.path, prefijo + extension, hijo_rel, pila)
     interno(ruta_raiz)
     return "\n".join(lineas)
 
-def generar_reporte_intercalado(ruta_raiz, nivel=1):
-    lang_map = {
-        ".html": "html", ".css": "css", ".js": "js", ".php": "php",
-        ".py": "python", ".java": "java", ".sql": "sql", ".c": "c",
-        ".cpp": "cpp", ".cu": "cuda", ".h": "c", ".json": "json",
-        ".xml": "xml", ".md": "markdown",
-    }
-    lineas = []
+def _es_carpeta(entrada):
+    try:
+        return entrada.is_dir()
+    except OSError:
+        return False
+
+def _es_fichero(entrada):
+    try:
+        return entrada.is_file()
+    except OSError:
+        return False
+
+# Deduplicación: por debajo de este tamaño la referencia ocuparía casi lo mismo que el archivo
+DEDUP_MIN_BYTES = 64
+
+def iterar_reporte_intercalado(ruta_raiz, nivel=1, trabajo=None, _ruta_rel="", _pila=(), cambios=None, _vistos=None,
+                               perfil=NULO, lector=None):
+    # Por secciones completas (encabezado de carpeta o archivo con su bloque cerrado).
+    # Con `cambios` (ver cambios.py) solo salen los archivos cambiados y sus carpetas.
+    # Un archivo con el mismo contenido que otro ya volcado solo se referencia.
+    # `lector` (LectorDisco o PrecargaProyecto) da los listados y los contenidos
+    lector = lector or LectorDisco(perfil)
+    if cambios is not None and not isinstance(cambios, tuple):
+        cambios = (cambios.cambiados, cambios.carpetas_con_cambios())
+    if _vistos is None:
+        _vistos = {}
     nombre_carpeta = os.path.basename(ruta_raiz) if os.path.basename(ruta_raiz) else ruta_raiz
     encabezado = "#" * nivel
-    lineas.append(f"{encabezado} {nombre_carpeta}")
+    yield f"{encabezado} {nombre_carpeta}"
 
     try:
-        entradas = sorted(os.listdir(ruta_raiz))
+        entradas, pila = lector.listar(ruta_raiz, _ruta_rel, _pila)
     except Exception as e:
-        lineas.append(f"Error listando la carpeta: {e}")
-        return "\n".join(lineas)
+        yield f"Error listando la carpeta: {e}"
+        return
 
-    for entrada in entradas:
-        ruta_completa = os.path.join(ruta_raiz, entrada)
-        if os.path.isfile(ruta_completa) and entrada.lower().endswith(EXTENSIONES_PERMITIDAS):
+    for item in entradas:
+        entrada = item.name
+        ruta_completa = item.path
+        if _es_fichero(item) and FILTRO.extension_permitida(entrada):
+            if cambios is not None and (f"{_ruta_rel}/{entrada}" if _ruta_rel else entrada) not in cambios[0]:
+                perfil.contar("omitidos:sin_cambios")
+                continue
             extension = os.path.splitext(entrada)[1].lower()
-            lenguaje = lang_map.get(extension, "")
-            lineas.append(f"**{entrada}**")
+            lenguaje = LANG_MAP.get(extension, "")
             try:
-                with open(ruta_completa, "r", encoding="utf-8", errors="ignore") as f:
-                    contenido = f.read()
+                contenido = lector.leer(ruta_completa)
             except Exception as e:
+                perfil.contar("errores_lectura")
                 contenido = f"Error al leer el archivo: {e}"
-            lineas.append(f"```{lenguaje}")
-            lineas.append(contenido)
-            lineas.append("```")
+            if trabajo is not None:
+                trabajo.avanzar(bytes_leidos=len(contenido))
+            rel = f"{_ruta_rel}/{entrada}" if _ruta_rel else entrada
+            bloque = f"```{lenguaje}\n{contenido}\n```"
+            if len(contenido) >= DEDUP_MIN_BYTES:
+                huella = hashlib.blake2b(bloque.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+                original = _vistos.setdefault(huella, rel)
+                if original != rel:
+                    perfil.contar("omitidos:duplicado")
+                    yield f"**{entrada}**\n(mismo contenido que `{original}`)"
+                    continue
+            yield f"**{entrada}**\n{bloque}"
 
-    for entrada in entradas:
-        ruta_completa = os.path.join(ruta_raiz, entrada)
-        if os.path.isdir(ruta_completa) and entrada not in CARPETAS_EXCLUIDAS:
-            lineas.append(generar_reporte_intercalado(ruta_completa, nivel + 1))
+    # Las carpetas ignoradas ya no están en la lista: no se entra en ellas
+    for item in entradas:
+        if _es_carpeta(item):
+            hijo_rel = f"{_ruta_rel}/{item.name}" if _ruta_rel else item.name
+            if cambios is not None and hijo_rel not in cambios[1]:
+                continue
+            yield from iterar_reporte_intercalado(item.path, nivel + 1, trabajo, hijo_rel, pila, cambios, _vistos,
+                                                  perfil, lector)
 
-    return "\n".join(lineas)
+def generar_reporte_intercalado(ruta_raiz, nivel=1, trabajo=None):
+    return "\n".join(iterar_reporte_intercalado(ruta_raiz, nivel, trabajo))
+
+# =========================
+# Empaquetado por presupuesto de tokens
+# =========================
+def estimar_tokens(texto):
+    # Aproximación barata: ~4 caracteres por token
+    return (len(texto) + 3) // 4
 
-def analizar_sqlite(db_path):
+TOKENIZADORES = {"aprox": estimar_tokens}
+if tiktoken is not None:
+    def _tokens_tiktoken(texto, _enc=[]):
+        if not _enc:
+            _enc.append(tiktoken.get_encoding("cl100k_base"))
+        return len(_enc[0].encode(texto, disallowed_special=()))
+    TOKENIZADORES["tiktoken"] = _tokens_tiktoken
+
+# (ruta, ruta relativa, mtime_ns, tamaño, tokenizador) -> tokens del bloque del archivo.
+# El tokenizador es la propia función (no su __name__: dos lambdas se llamarían
+# igual) y la ruta relativa cuenta porque va en la cabecera del bloque.
+_cache_tokens = {}
+_CACHE_TOKENS_MAX = 50000
+
+def _archivos_permitidos(ruta_raiz):
+    for dirpath, dirnames, filenames in FILTRO.recorrer(ruta_raiz):
+        for nombre in filenames:
+            if FILTRO.extension_permitida(nombre):
+                ruta = os.path.join(dirpath, nombre)
+                try:
+                    st = os.stat(ruta)
+                except OSError:
+                    continue
+                yield ruta, st
+
+def _rutas_relativas(ruta_raiz):
+    # Todos los archivos no filtrados, relativos a la raíz y con '/'
+    for dirpath, _, filenames in FILTRO.recorrer(ruta_raiz):
+        rel = os.path.relpath(dirpath, ruta_raiz).replace(os.sep, "/")
+        prefijo = "" if rel == "." else rel + "/"
+        for nombre in filenames:
+            yield prefijo + nombre
+
+def puntuar_archivo(ruta, st, ahora):
+    """Prioridad barata (solo stat): entrada > reciente > pequeño."""
+    puntos = 0.0
+    if os.path.basename(ruta) in NOMBRES_ENTRADA:
+        puntos += 100.0
+    edad_dias = max(0.0, (ahora - st.st_mtime) / 86400.0)
+    puntos += 50.0 / (1.0 + edad_dias)
+    puntos -= 10.0 * math.log10(1 + st.st_size)
+    return puntos
+
+def _bloque_archivo(ruta, ruta_raiz):
+    extension = os.path.splitext(ruta)[1].lower()
+    lenguaje = LANG_MAP.get(extension, "")
+    try:
+        with open(ruta, "r", encoding="utf-8", errors="ignore") as f:
+            contenido = f.read()
+    except Exception as e:
+        contenido = f"Error al leer el archivo: {e}"
+    relativa = os.path.relpath(ruta, ruta_raiz)
+    return f"**{relativa}**\n```{lenguaje}\n{contenido}\n```"
+
+def _nota_omitidos(omitidos, listados):
+    # Lista de omitidos con solo los `listados` primeros y un resumen del resto
+    lineas = [f"- {r}" for r in omitidos[:listados]]
+    if listados < len(omitidos):
+        lineas.append(f"- ... y {len(omitidos) - listados} archivos omitidos más")
+    return "Archivos omitidos por presupuesto de tokens:\n" + "\n".join(lineas)
+
+def _ajustar_nota_omitidos(omitidos, disponibles, tokenizador):
+    """La nota de omitidos más larga que cabe en `disponibles` tokens ("" si no cabe ninguna)."""
+    nota = _nota_omitidos(omitidos, len(omitidos))
+    if tokenizador(nota) <= disponibles:
+        return nota
+    # Búsqueda binaria de cuántas rutas se pueden listar antes del resumen
+    bajo, alto = -1, len(omitidos) - 1
+    while bajo < alto:
+        medio = (bajo + alto + 1) // 2
+        if tokenizador(_nota_omitidos(omitidos, medio)) <= disponibles:
+            bajo = medio
+        else:
+            alto = medio - 1
+    return _nota_omitidos(omitidos, bajo) if bajo >= 0 else ""
+
+def _recortar_a_tokens(texto, max_tokens, tokenizador):
+    """Primeras líneas de `texto` que caben en `max_tokens`, con una marca de recorte."""
+    if tokenizador(texto) <= max_tokens:
+        return texto
+    lineas = texto.split("\n")
+
+    def recorte(n):
+        return "\n".join(lineas[:n]) + f"\n[... recortado por presupuesto de tokens: {len(lineas) - n} líneas omitidas ...]\n"
+
+    bajo, alto = -1, len(lineas) - 1
+    while bajo < alto:
+        medio = (bajo + alto + 1) // 2
+        if tokenizador(recorte(medio)) <= max_tokens:
+            bajo = medio
+        else:
+            alto = medio - 1
+    return recorte(bajo) if bajo >= 0 else ""
+
+def _secciones_en_presupuesto(disponibles, tokenizador, *secciones):
+    """
+    Recorta, por orden, las secciones fijas (árbol, cambios, BD) que no caben
+    en `disponibles` tokens; las primeras tienen preferencia.
+    """
+    ajustadas = []
+    for seccion in secciones:
+        seccion = _recortar_a_tokens(seccion, max(0, disponibles), tokenizador) if seccion else seccion
+        disponibles -= tokenizador(seccion) if seccion else 0
+        ajustadas.append(seccion)
+    return ajustadas
+
+def empaquetar_por_tokens(ruta_raiz, max_tokens, tokenizador=estimar_tokens, trabajo=None, solo=None, perfil=NULO):
+    """
+    Rellena `max_tokens` con los archivos de mayor prioridad (voraz).
+    Devuelve (markdown, incluidos, omitidos) con rutas relativas.
+    `solo` limita los candidatos a ese conjunto de rutas relativas ('/').
+    La lista de omitidos también cuenta: si no cabe entera se resume.
+    """
+    ahora = time.time()
+    archivos = _archivos_permitidos(ruta_raiz)
+    if solo is not None:
+        archivos = (
+            (ruta, st) for ruta, st in archivos
+            if os.path.relpath(ruta, ruta_raiz).replace(os.sep, "/") in solo
+        )
+    with perfil.fase("listado"):
+        candidatos = sorted(
+            archivos,
+            key=lambda rs: (-puntuar_archivo(rs[0], rs[1], ahora), rs[0]),
+        )
+    if trabajo is not None:
+        trabajo.total = len(candidatos)
+    if len(_cache_tokens) > _CACHE_TOKENS_MAX:
+        _cache_tokens.clear()
+
+    # Cada bloque va seguido de un salto de línea, y se reserva sitio para
+    # resumir los omitidos ("... y N archivos omitidos más") aunque lo sean todos
+    separador = tokenizador("\n")
+    reserva = tokenizador(_nota_omitidos(["-"] * len(candidatos), 0)) + separador if candidatos else 0
+    restantes = max_tokens - reserva
+    bloques, incluidos, omitidos = [], [], []
+    for ruta, st in candidatos:
+        relativa = os.path.relpath(ruta, ruta_raiz)
+        clave = (ruta, relativa, st.st_mtime_ns, st.st_size, tokenizador)
+        bloque = None
+        tokens = _cache_tokens.get(clave)
+        if tokens is None:
+            perfil.contar("cache_tokens_fallos")
+            with perfil.fase("lectura"):
+                bloque = _bloque_archivo(ruta, ruta_raiz)
+            with perfil.fase("tokenizado"):
+                tokens = tokenizador(bloque)
+            _cache_tokens[clave] = tokens
+        else:
+            perfil.contar("cache_tokens_aciertos")
+        if tokens + separador > restantes:
+            perfil.contar("omitidos:presupuesto")
+            omitidos.append(relativa)
+            if trabajo is not None:
+                trabajo.avanzar()
+            continue
+        if bloque is None:
+            with perfil.fase("lectura"):
+                bloque = _bloque_archivo(ruta, ruta_raiz)
+        perfil.contar("archivos_leidos")
+        perfil.contar("bytes_leidos", st.st_size)
+        if trabajo is not None:
+            trabajo.avanzar(bytes_leidos=st.st_size)
+        bloques.append(bloque)
+        incluidos.append(relativa)
+        restantes -= tokens + separador
+
+    partes = bloques
+    if omitidos:
+        nota = _ajustar_nota_omitidos(omitidos, restantes + reserva - separador, tokenizador)
+        if nota:
+            partes = bloques + [nota]
+    return "\n".join(partes), incluidos, omitidos
+
+# Caché del esquema SQLite: ruta -> (firma del archivo, informe)
+SQLITE_CACHE_MAX = 32
+_cache_esquema_sqlite = {}
+_cache_sqlite_lock = threading.Lock()
+
+def _firma_sqlite(db_path):
+    # El WAL puede contener cambios sin que el archivo principal cambie de mtime
+    firma = []
+    for ruta in (db_path, db_path + "-wal"):
+        try:
+            st = os.stat(ruta)
+            firma.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            firma.append(None)
+    return tuple(firma)
+
+# immutable=1 se salta los bloqueos, pero si otro proceso escribe mientras se
+# lee SQLite puede devolver datos incoherentes o un error de corrupción: solo
+# con SQLITE_INMUTABLE=1 (bases que nadie modifica mientras corre la app)
+SQLITE_INMUTABLE = os.environ.get("SQLITE_INMUTABLE") == "1"
+
+def _conectar_sqlite_lectura(db_path, inmutable=SQLITE_INMUTABLE):
+    uri = "file:" + pathname2url(os.path.abspath(db_path)) + "?mode=ro"
+    if inmutable and not os.path.exists(db_path + "-wal") and not os.path.exists(db_path + "-journal"):
+        uri += "&immutable=1"
+    return sqlite3.connect(uri, uri=True)
+
+def analizar_sqlite(db_path, perfil=NULO):
+    clave = os.path.abspath(db_path)
+    firma = _firma_sqlite(clave)
+    with _cache_sqlite_lock:
+        guardado = _cache_esquema_sqlite.get(clave)
+    if guardado and guardado[0] == firma:
+        perfil.contar("cache_esquema_aciertos")
+        return guardado[1]
+    perfil.contar("cache_esquema_fallos")
     detalles = [f"SQLite: {db_path}"]
     try:
-        conn = sqlite3.connect(db_path)
-        cur = conn.cursor()
-        cur.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tablas = [t[0] for t in cur.fetchall()]
-        for t in tablas:
-            detalles.append(f"    Tabla: {t}")
-            cur.execute(f"PRAGMA table_info({t});")
-            for col in cur.fetchall():
-                detalles.append(f"        Columna: {col[1]} ({col[2]})")
-        conn.close()
+        conn = _conectar_sqlite_lectura(db_path)
+        try:
+            cur = conn.cursor()
+            # Columnas, índices y claves foráneas de todas las tablas: una consulta cada uno, sin PRAGMA por tabla
+            columnas = cur.execute(
+                "SELECT m.name, c.name, c.type FROM sqlite_master AS m"
+                " JOIN pragma_table_info(m.name) AS c"
+                " WHERE m.type = 'table' ORDER BY m.rowid, c.cid;"
+            ).fetchall()
+            tablas = [t[0] for t in cur.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY rowid;")]
+            indices = cur.execute(
+                "SELECT m.name, i.name, i.\"unique\", c.name FROM sqlite_master AS m"
+                " JOIN pragma_index_list(m.name) AS i"
+                " JOIN pragma_index_info(i.name) AS c"
+                " WHERE m.type = 'table' ORDER BY m.rowid, i.seq, c.seqno;"
+            ).fetchall()
+            foraneas = cur.execute(
+                "SELECT m.name, f.\"from\", f.\"table\", f.\"to\" FROM sqlite_master AS m"
+                " JOIN pragma_foreign_key_list(m.name) AS f"
+                " WHERE m.type = 'table' ORDER BY m.rowid, f.id, f.seq;"
+            ).fetchall()
+            # Estimación de filas de ANALYZE (sqlite_stat1), si existe; nunca COUNT(*)
+            filas = {}
+            if cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1';").fetchone():
+                for tabla, stat in cur.execute("SELECT tbl, stat FROM sqlite_stat1;"):
+                    if stat and tabla not in filas:
+                        filas[tabla] = stat.split()[0]
+        finally:
+            conn.close()
     except Exception:
         return None
-    return "\n".join(detalles)
 
-def analizar_mysql(servidor, usuario, contrasena, bd):
+    cols_por_tabla, idx_por_tabla, fk_por_tabla = {}, {}, {}
+    for tabla, columna, tipo in columnas:
+        cols_por_tabla.setdefault(tabla, []).append(f"        Columna: {columna} ({tipo})")
+    for tabla, indice, unico, columna in indices:
+        idx_por_tabla.setdefault(tabla, {}).setdefault((indice, unico), []).append(columna or "<expr>")
+    for tabla, origen, destino, columna_destino in foraneas:
+        fk_por_tabla.setdefault(tabla, []).append(
+            f"        Clave foránea: {origen} -> {destino}({columna_destino or '?'})"
+        )
+    for t in tablas:
+        detalles.append(f"    Tabla: {t}")
+        detalles.extend(cols_por_tabla.get(t, []))
+        for (indice, unico), cols in idx_por_tabla.get(t, {}).items():
+            marca = " [único]" if unico else ""
+            detalles.append(f"        Índice: {indice} ({', '.join(cols)}){marca}")
+        detalles.extend(fk_por_tabla.get(t, []))
+        if t in filas:
+            detalles.append(f"        Filas (estimación): {filas[t]}")
+    informe = "\n".join(detalles)
+
+    with _cache_sqlite_lock:
+        if clave not in _cache_esquema_sqlite and len(_cache_esquema_sqlite) >= SQLITE_CACHE_MAX:
+            _cache_esquema_sqlite.pop(next(iter(_cache_esquema_sqlite)))
+        _cache_esquema_sqlite[clave] = (firma, informe)
+    return informe
+
+# Pool de conexiones MySQL y caché del esquema (se comparten entre peticiones)
+MYSQL_POOL_MAX = 4  # conexiones libres que se conservan por servidor/usuario/bd
+MYSQL_ESQUEMA_TTL = 60  # segundos que se reutiliza un esquema ya leído
+
+class PoolMySQL:
+    def __init__(self, maximo=MYSQL_POOL_MAX):
+        self.maximo = maximo
+        self._libres = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def conexion(self, servidor, usuario, contrasena, bd):
+        clave = (servidor, usuario, contrasena, bd)
+        conn = None
+        with self._lock:
+            libres = self._libres.get(clave)
+            if libres:
+                conn = libres.pop()
+        if conn is not None:
+            try:
+                conn.ping(reconnect=True)
+            except Exception:
+                conn = None
+        if conn is None:
+            conn = pymysql.connect(host=servidor, user=usuario, password=contrasena, database=bd,
+                                   connect_timeout=10)
+        try:
+            yield conn
+        except Exception:
+            conn.close()
+            raise
+        with self._lock:
+            libres = self._libres.setdefault(clave, [])
+            if len(libres) < self.maximo:
+                libres.append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+
+_pool_mysql = PoolMySQL()
+_cache_esquema_mysql = {}  # (servidor, usuario, hash de la contraseña, bd) -> (caduca, informe)
+_cache_esquema_lock = threading.Lock()
+
+def analizar_mysql(servidor, usuario, contrasena, bd, usar_cache=True, perfil=NULO):
     if pymysql is None:
         return None
+    # Con la contraseña en la clave, unas credenciales erróneas nunca reciben el esquema guardado
+    huella = hashlib.sha256((contrasena or "").encode("utf-8")).hexdigest()
+    clave = (servidor, usuario, huella, bd)
+    if usar_cache:
+        with _cache_esquema_lock:
+            guardado = _cache_esquema_mysql.get(clave)
+        if guardado and guardado[0] > time.monotonic():
+            perfil.contar("cache_esquema_aciertos")
+            return guardado[1]
+        perfil.contar("cache_esquema_fallos")
     detalles = [f"MySQL en {servidor} - {bd}"]
     try:
-        conn = pymysql.connect(host=servidor, user=usuario, password=contrasena, database=bd)
-        cur = conn.cursor()
-        cur.execute("SHOW TABLES;")
-        tablas = [t[0] for t in cur.fetchall()]
-        for t in tablas:
-            detalles.append(f"    Tabla: {t}")
-            cur.execute(f"SHOW COLUMNS FROM `{t}`;")
-            for col in cur.fetchall():
-                detalles.append(f"        Columna: {col[0]} ({col[1]})")
-        conn.close()
-        return "\n".join(detalles)
+        with _pool_mysql.conexion(servidor, usuario, contrasena, bd) as conn:
+            with conn.cursor() as cur:
+                # Una sola consulta para todas las columnas, en vez de SHOW COLUMNS por tabla
+                cur.execute(
+                    "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE FROM information_schema.COLUMNS"
+                    " WHERE TABLE_SCHEMA = %s ORDER BY TABLE_NAME, ORDINAL_POSITION",
+                    (bd,),
+                )
+                filas = cur.fetchall()
+        tabla_actual = None
+        for tabla, columna, tipo in filas:
+            if tabla != tabla_actual:
+                detalles.append(f"    Tabla: {tabla}")
+                tabla_actual = tabla
+            detalles.append(f"        Columna: {columna} ({tipo})")
+        informe = "\n".join(detalles)
     except Exception:
         return None
+    with _cache_esquema_lock:
+        _cache_esquema_mysql[clave] = (time.monotonic() + MYSQL_ESQUEMA_TTL, informe)
+    return informe
+
+def _seccion_bd(db_mode, sqlite_path, mysql_cfg, perfil=NULO):
+    informe_bd = ""
+    if db_mode == "sqlite":
+        if sqlite_path and os.path.isfile(sqlite_path):
+            with perfil.fase("bd:sqlite", ruta=sqlite_path):
+                rep = analizar_sqlite(sqlite_path, perfil)
+            if rep:
+                informe_bd = rep
+    else:
+        if mysql_cfg and all(mysql_cfg.get(k) for k in ("server", "user", "password", "database")):
+            with perfil.fase("bd:mysql", servidor=mysql_cfg["server"], bd=mysql_cfg["database"]):
+                rep = analizar_mysql(mysql_cfg["server"], mysql_cfg["user"], mysql_cfg["password"], mysql_cfg["database"],
+                                     perfil=perfil)
+            if rep:
+                informe_bd = rep
+    if informe_bd:
+        return "\\n===== Informe de base de datos =====\\n" + informe_bd
+    return ""
 
-def generar_prompt_backend(contexto, objetivo, restricciones, formato, carpeta_proyecto, db_mode, sqlite_path, mysql_cfg):
+def iterar_prompt_backend(contexto, objetivo, restricciones, formato, carpeta_proyecto, db_mode, sqlite_path, mysql_cfg,
+                          max_tokens=None, tokenizador=estimar_tokens, trabajo=None, seccion_bd=None, base=None,
+                          perfil=NULO, lector=None):
+    """
+    Genera el prompt por trozos (cabecera, árbol, cada sección del código,
+    informe de BD). Unidos dan exactamente el texto de generar_prompt_backend.
+    `seccion_bd` permite pasar el informe de BD ya calculado (lotes).
+    Con `base` (ref de git o manifiesto del CLI) el código solo incluye los
+    archivos añadidos o modificados y se listan los eliminados.
+    `perfil` (perfil.py) recoge los tiempos por fase y los contadores.
+    `lector` sustituye al disco (PrecargaProyecto del motor asíncrono).
+    """
     prompt = ""
 
     if contexto:
@@ -192,39 +642,734 @@ def generar_prompt_backend(contexto, objetivo, restricciones, formato, carpeta_p
     if formato:
         prompt += f"Formato de salida: {formato}\n\n"
 
+    # Con presupuesto de tokens el informe de BD se calcula antes para descontarlo;
+    # sin él, se deja para el final y el código empieza a salir cuanto antes
+    if seccion_bd is None and max_tokens:
+        if trabajo is not None:
+            trabajo.fase = "base de datos"
+        seccion_bd = _seccion_bd(db_mode, sqlite_path, mysql_cfg, perfil)
+
     if carpeta_proyecto and os.path.isdir(carpeta_proyecto):
-        arbol = construir_mapa_directorios(carpeta_proyecto)
-        prompt += "\\n===== Estructura del proyecto =====\\n"
-        prompt += "```\\n" + arbol + "\\n```\\n\\n"
+        # El total para la barra de progreso sale del mismo listado que el árbol
+        recuento = {}
+        arbol = construir_mapa_directorios(carpeta_proyecto, perfil, lector, recuento)
+        seccion_arbol = "\\n===== Estructura del proyecto =====\\n"
+        seccion_arbol += "```\\n" + arbol + "\\n```\\n\\n"
 
-        intercalado = generar_reporte_intercalado(carpeta_proyecto)
-        prompt += "\\n===== Reporte de código (Intercalado) =====\\n" + intercalado + "\\n\\n"
+        cambios = None
+        seccion_cambios = ""
+        if base:
+            try:
+                with perfil.fase("cambios", base=base):
+                    # Desde la web solo refs de git o manifiestos dentro del propio proyecto
+                    cambios = calcular_cambios(carpeta_proyecto, _rutas_relativas(carpeta_proyecto), base,
+                                               manifiestos_externos=False)
+                seccion_cambios = "\n===== Cambios =====\n" + "\n".join(cambios.resumen()) + "\n\n"
+            except (OSError, ValueError) as e:
+                # En el prompt solo el motivo en una línea; la salida completa de git va al log
+                motivo = next((l for l in str(e).splitlines() if l.strip()), type(e).__name__)
+                _log.warning("No se pudieron calcular los cambios de %s respecto a %r: %s",
+                             carpeta_proyecto, base, getattr(e, "detalle", e))
+                seccion_cambios = f"\n(No se pudieron calcular los cambios respecto a {base}: {motivo}; se incluye todo el código)\n\n"
+
+        cabecera_codigo = "\\n===== Reporte de código (Intercalado) =====\\n"
+        if max_tokens:
+            # Si las secciones fijas ya superan el presupuesto se recortan (árbol > cambios > BD)
+            seccion_arbol, seccion_cambios, seccion_bd = _secciones_en_presupuesto(
+                max_tokens - tokenizador(prompt + cabecera_codigo + "\\n\\n"), tokenizador,
+                seccion_arbol, seccion_cambios, seccion_bd,
+            )
+        prompt += seccion_arbol + seccion_cambios
+
+        if trabajo is not None:
+            trabajo.fase = "código"
+        if max_tokens:
+            fijos = tokenizador(prompt + cabecera_codigo + "\\n\\n" + seccion_bd)
+            intercalado, _, _ = empaquetar_por_tokens(
+                carpeta_proyecto, max(0, max_tokens - fijos), tokenizador, trabajo,
+                cambios.cambiados if cambios is not None else None, perfil,
+            )
+            yield prompt + cabecera_codigo + intercalado + "\\n\\n"
+        else:
+            if trabajo is not None:
+                trabajo.total = len(cambios.cambiados) if cambios is not None else recuento.get("archivos", 0)
+            yield prompt + cabecera_codigo
+            secciones = iterar_reporte_intercalado(carpeta_proyecto, trabajo=trabajo, cambios=cambios,
+                                                   perfil=perfil, lector=lector)
+            for i, seccion in enumerate(secciones):
+                yield seccion if i == 0 else "\n" + seccion
+            yield "\\n\\n"
     else:
         prompt += "\\n(No se ha seleccionado carpeta de proyecto para analizar código)\\n\\n"
+        if max_tokens:
+            seccion_bd, = _secciones_en_presupuesto(max_tokens - tokenizador(prompt), tokenizador, seccion_bd)
+        yield prompt
 
-    informe_bd = ""
-    if db_mode == "sqlite":
-        if sqlite_path and os.path.isfile(sqlite_path):
-            rep = analizar_sqlite(sqlite_path)
-            if rep:
-                informe_bd = rep
+    if seccion_bd is None:
+        if trabajo is not None:
+            trabajo.fase = "base de datos"
+        seccion_bd = _seccion_bd(db_mode, sqlite_path, mysql_cfg, perfil)
+    if seccion_bd:
+        yield seccion_bd
+
+def generar_prompt_backend(contexto, objetivo, restricciones, formato, carpeta_proyecto, db_mode, sqlite_path, mysql_cfg,
+                           max_tokens=None, tokenizador=estimar_tokens, trabajo=None, seccion_bd=None, base=None,
+                           perfil=NULO, lector=None):
+    texto = "".join(iterar_prompt_backend(
+        contexto, objetivo, restricciones, formato, carpeta_proyecto, db_mode, sqlite_path, mysql_cfg,
+        max_tokens, tokenizador, trabajo, seccion_bd, base, perfil, lector,
+    ))
+    if perfil is not NULO:
+        perfil.contar("bytes_producidos", len(texto.encode("utf-8", "surrogatepass")))
+    return texto
+
+def _opciones_tokens(data):
+    try:
+        max_tokens = int(data.get("max_tokens") or 0) or None
+    except (TypeError, ValueError):
+        max_tokens = None
+    tokenizador = TOKENIZADORES.get(data.get("tokenizador", "aprox"), estimar_tokens)
+    return max_tokens, tokenizador
+
+def _parametros_prompt(data):
+    max_tokens, tokenizador = _opciones_tokens(data)
+    return {
+        "contexto": data.get("contexto", "").strip(),
+        "objetivo": data.get("objetivo", "").strip(),
+        "restricciones": data.get("restricciones", "").strip(),
+        "formato": data.get("formato", "").strip(),
+        "db_mode": data.get("db_mode", "sqlite"),
+        "sqlite_path": data.get("sqlite_path", "").strip(),
+        "mysql_cfg": data.get("mysql", {}),
+        "max_tokens": max_tokens,
+        "tokenizador": tokenizador,
+        "base": (data.get("base") or "").strip() or None,
+    }
+
+def _generar_con_parametros(parametros, carpeta_proyecto, trabajo=None, perfil=NULO):
+    return generar_prompt_backend(
+        parametros["contexto"], parametros["objetivo"], parametros["restricciones"], parametros["formato"],
+        carpeta_proyecto, parametros["db_mode"], parametros["sqlite_path"], parametros["mysql_cfg"],
+        parametros["max_tokens"], parametros["tokenizador"], trabajo, parametros.get("seccion_bd"),
+        parametros.get("base"), perfil,
+    )
+
+# =========================
+# Motor asíncrono (asgi.py)
+# =========================
+HILOS_IO = 32  # hilos compartidos por todas las generaciones para disco y BD
+OPERACIONES_SIMULTANEAS = 16  # carpetas cargándose a la vez por generación
+TANDA_BYTES = 256 * 1024  # trozos formateados por cada salto al hilo del recorrido...
+TANDA_SEGUNDOS = 0.02  # ...o lo que se haya formateado en este tiempo
+
+_pool_io = ThreadPoolExecutor(max_workers=HILOS_IO, thread_name_prefix="io")
+
+class PrecargaProyecto(LectorDisco):
+    """
+    Listados y contenidos de un proyecto cargados con asyncio mientras se
+    genera el prompt: cada carpeta se lista en `_pool_io`, sus archivos se
+    leen en otra tarea y sus subcarpetas se cargan en paralelo. El recorrido
+    síncrono (en su propio hilo) solo espera por lo que necesita: el árbol
+    sale en cuanto están los listados y cada archivo en cuanto se ha leído.
+    """
+
+    _FALTA = object()
+
+    def __init__(self, perfil=NULO):
+        super().__init__(perfil)
+        self.listados = {}  # ruta de carpeta -> (entradas, pila) o excepción
+        self.contenidos = {}  # ruta de archivo -> texto o excepción
+        self._hay_datos = threading.Condition()
+        self._terminada = False
+
+    def _guardar(self, datos, clave, valor):
+        with self._hay_datos:
+            datos[clave] = valor
+            self._hay_datos.notify_all()
+
+    def _esperar(self, datos, clave):
+        # Bloquea el hilo del recorrido, nunca el bucle de eventos. Si la carga
+        # acabó (o se canceló) sin ese dato se devuelve _FALTA y se va al disco
+        with self._hay_datos:
+            while clave not in datos and not self._terminada:
+                self._hay_datos.wait()
+            valor = datos.get(clave, self._FALTA)
+        if isinstance(valor, Exception):
+            raise valor
+        return valor
+
+    def listar(self, ruta_abs, ruta_rel, pila):
+        valor = self._esperar(self.listados, ruta_abs)
+        if valor is self._FALTA:
+            return LectorDisco.listar(self, ruta_abs, ruta_rel, pila)
+        return valor
+
+    def leer(self, ruta):
+        valor = self._esperar(self.contenidos, ruta)
+        if valor is self._FALTA:
+            return LectorDisco.leer(self, ruta)
+        return valor
+
+    def _listar_carpeta(self, ruta_abs, ruta_rel, pila):
+        # En un hilo: el listado se publica antes de leer nada para que el
+        # árbol no espere a los contenidos. Los errores se relanzan al consumir
+        try:
+            listado = LectorDisco.listar(self, ruta_abs, ruta_rel, pila)
+        except Exception as e:
+            self._guardar(self.listados, ruta_abs, e)
+            return [], []
+        self._guardar(self.listados, ruta_abs, listado)
+        entradas, pila_hijos = listado
+        archivos, subcarpetas = [], []
+        for entrada in entradas:
+            if _es_fichero(entrada) and FILTRO.extension_permitida(entrada.name):
+                archivos.append(entrada.path)
+            elif _es_carpeta(entrada):
+                hijo_rel = f"{ruta_rel}/{entrada.name}" if ruta_rel else entrada.name
+                subcarpetas.append((entrada.path, hijo_rel, pila_hijos))
+        return archivos, subcarpetas
+
+    def _leer_archivos(self, rutas):
+        # Una tarea por carpeta (no por archivo) para no pagar un futuro por
+        # cada archivo pequeño; cada contenido se publica en cuanto se lee
+        for ruta in rutas:
+            try:
+                valor = LectorDisco.leer(self, ruta)
+            except Exception as e:
+                valor = e
+            self._guardar(self.contenidos, ruta, valor)
+
+    async def cargar(self, ruta_raiz, simultaneas=OPERACIONES_SIMULTANEAS):
+        loop = asyncio.get_running_loop()
+        semaforo = asyncio.Semaphore(simultaneas)
+
+        async def en_pool(funcion, *args):
+            async with semaforo:
+                return await loop.run_in_executor(_pool_io, funcion, *args)
+
+        async def carpeta(ruta_abs, ruta_rel, pila):
+            archivos, subcarpetas = await en_pool(self._listar_carpeta, ruta_abs, ruta_rel, pila)
+            tareas = [carpeta(*hija) for hija in subcarpetas]
+            if archivos:
+                tareas.insert(0, en_pool(self._leer_archivos, archivos))
+            await asyncio.gather(*tareas)
+
+        try:
+            await carpeta(ruta_raiz, "", ())
+        finally:
+            with self._hay_datos:
+                self._terminada = True
+                self._hay_datos.notify_all()
+
+def _tanda_de_trozos(trozos):
+    # En el hilo del recorrido: varios trozos por salto para no pagar un
+    # cambio de hilo por archivo; lista vacía cuando se acaba el generador
+    tanda, tamano, inicio = [], 0, time.perf_counter()
+    for trozo in trozos:
+        tanda.append(trozo)
+        tamano += len(trozo)
+        if tamano >= TANDA_BYTES or time.perf_counter() - inicio >= TANDA_SEGUNDOS:
+            break
+    return tanda
+
+async def iterar_prompt_backend_async(contexto, objetivo, restricciones, formato, carpeta_proyecto, db_mode,
+                                      sqlite_path, mysql_cfg, max_tokens=None, tokenizador=estimar_tokens,
+                                      seccion_bd=None, base=None, perfil=NULO):
+    """
+    Versión asyncio de iterar_prompt_backend (mismos trozos). El informe de BD
+    (SQLite o MySQL) se pide en un hilo y las carpetas se listan y leen en
+    paralelo mientras ya salen la cabecera y el árbol; cada archivo sale en
+    cuanto se ha leído. El formateo y las huellas de deduplicación corren en
+    un hilo aparte (asyncio.to_thread), así el bucle de eventos nunca espera
+    ni a la E/S ni a la CPU. Con presupuesto de tokens o línea base el
+    generador síncrono lee del disco por su cuenta.
+    """
+    loop = asyncio.get_running_loop()
+    bd = None
+    if seccion_bd is None:
+        bd = loop.run_in_executor(_pool_io, _seccion_bd, db_mode, sqlite_path, mysql_cfg, perfil)
+        if max_tokens:
+            # El presupuesto descuenta el informe: hace falta antes de empezar
+            seccion_bd, bd = await bd, None
+    lector = carga = None
+    if carpeta_proyecto and os.path.isdir(carpeta_proyecto) and not max_tokens and not base:
+        lector = PrecargaProyecto(perfil)
+        carga = asyncio.ensure_future(lector.cargar(carpeta_proyecto))
+    # Sin presupuesto el informe va al final: se emite aquí cuando llegue
+    trozos = iterar_prompt_backend(
+        contexto, objetivo, restricciones, formato, carpeta_proyecto, db_mode, sqlite_path, mysql_cfg,
+        max_tokens, tokenizador, None, "" if bd is not None else seccion_bd, base, perfil, lector,
+    )
+    try:
+        while True:
+            tanda = await asyncio.to_thread(_tanda_de_trozos, trozos)
+            if not tanda:
+                break
+            for trozo in tanda:
+                yield trozo
+        if carga is not None:
+            await carga
+        if bd is not None:
+            seccion_bd = await bd
+            if seccion_bd:
+                yield seccion_bd
+    finally:
+        # Cliente desconectado: se deja de cargar (el hilo del recorrido, si
+        # espera algún dato, pasa a leerlo del disco y termina su trozo)
+        if carga is not None:
+            carga.cancel()
+        if bd is not None:
+            bd.cancel()
+
+async def generar_prompt_backend_async(*args, perfil=NULO, **kwargs):
+    trozos = [t async for t in iterar_prompt_backend_async(*args, perfil=perfil, **kwargs)]
+    texto = "".join(trozos)
+    if perfil is not NULO:
+        perfil.contar("bytes_producidos", len(texto.encode("utf-8", "surrogatepass")))
+    return texto
+
+def _argumentos_async(parametros, carpeta_proyecto):
+    return (
+        parametros["contexto"], parametros["objetivo"], parametros["restricciones"], parametros["formato"],
+        carpeta_proyecto, parametros["db_mode"], parametros["sqlite_path"], parametros["mysql_cfg"],
+        parametros["max_tokens"], parametros["tokenizador"], parametros.get("seccion_bd"), parametros.get("base"),
+    )
+
+# =========================
+# Generación por lotes (multiproceso)
+# =========================
+MAX_PROCESOS_LOTE = max(1, min(8, os.cpu_count() or 1))
+# "spawn": un fork del servidor copiaría sus hilos y locks (Flask, trabajos en curso)
+CONTEXTO_PROCESOS = multiprocessing.get_context("spawn")
+
+def _trabajo_prompt_lote(tarea):
+    # Se ejecuta en un proceso hijo: genera y escribe un prompt, devuelve su tiempo y su perfil
+    entrada, ruta, destino, parametros = tarea
+    inicio = time.perf_counter()
+    perfil = Perfil()
+    try:
+        texto_prompt = _generar_con_parametros(parametros, ruta, perfil=perfil)
+        with perfil.fase("escritura"), open(destino, "w", encoding="utf-8") as f:
+            f.write(texto_prompt)
+        error = None
+    except Exception as e:
+        error = str(e)
+    return entrada, error, time.perf_counter() - inicio, perfil.a_dict()
+
+def generar_prompts_lote(carpeta_proyecto, out_dir, parametros, max_procesos=MAX_PROCESOS_LOTE, trabajo=None,
+                         perfil=NULO):
+    """
+    Genera un prompt por cada subcarpeta 'jocarsa-*' repartiendo los proyectos
+    en un pool de procesos. Devuelve (guardados, errores, tiempos por proyecto).
+    Los perfiles de los procesos hijos se suman a `perfil`.
+    """
+    tareas = []
+    for entrada in sorted(os.listdir(carpeta_proyecto)):
+        ruta = os.path.join(carpeta_proyecto, entrada)
+        if os.path.isdir(ruta) and entrada.startswith("jocarsa-"):
+            tareas.append((entrada, ruta, os.path.join(out_dir, entrada + ".txt"), parametros))
+
+    # La BD es la misma para todo el lote: se introspecciona una sola vez aquí
+    if tareas and parametros.get("seccion_bd") is None:
+        if trabajo is not None:
+            trabajo.fase = "base de datos"
+        parametros = dict(parametros, seccion_bd=_seccion_bd(
+            parametros["db_mode"], parametros["sqlite_path"], parametros["mysql_cfg"], perfil))
+        tareas = [(entrada, ruta, destino, parametros) for entrada, ruta, destino, _ in tareas]
+    if trabajo is not None:
+        trabajo.fase = "proyectos"
+        trabajo.total = len(tareas)
+    procesos = max(1, min(max_procesos, len(tareas)))
+    if procesos == 1:
+        resultados = map(_trabajo_prompt_lote, tareas)
+        pool = None
     else:
-        if mysql_cfg and all(mysql_cfg.get(k) for k in ("server", "user", "password", "database")):
-            rep = analizar_mysql(mysql_cfg["server"], mysql_cfg["user"], mysql_cfg["password"], mysql_cfg["database"])
-            if rep:
-                informe_bd = rep
+        pool = ProcessPoolExecutor(max_workers=procesos, mp_context=CONTEXTO_PROCESOS)
+        resultados = (fut.result() for fut in as_completed([pool.submit(_trabajo_prompt_lote, t) for t in tareas]))
 
-    if informe_bd:
-        prompt += "\\n===== Informe de base de datos =====\\n" + informe_bd
+    guardados = 0
+    errores = []
+    tiempos = {}
+    try:
+        for entrada, error, segundos, perfil_hijo in resultados:
+            tiempos[entrada] = round(segundos, 3)
+            perfil.sumar(perfil_hijo)
+            if error:
+                errores.append(f"{entrada}: {error}")
+            else:
+                guardados += 1
+            if trabajo is not None:
+                trabajo.avanzar()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return guardados, errores, tiempos
+
+def _guardar_prompts(data, carpeta_proyecto, trabajo=None):
+    out_dir = os.path.join(os.getcwd(), "prompts")
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        max_procesos = max(1, min(int(data.get("procesos") or MAX_PROCESOS_LOTE), MAX_PROCESOS_LOTE))
+    except (TypeError, ValueError):
+        max_procesos = MAX_PROCESOS_LOTE
+    inicio = time.perf_counter()
+    with perfilado("save_prompts") as perfil:
+        guardados, errores, tiempos = generar_prompts_lote(
+            carpeta_proyecto, out_dir, _parametros_prompt(data), max_procesos, trabajo, perfil
+        )
+    return {"guardados": guardados, "errores": errores,
+            "tiempos": tiempos, "segundos": round(time.perf_counter() - inicio, 3)}
+
+# =========================
+# Trabajos en segundo plano
+# =========================
+MAX_TRABAJOS_SIMULTANEOS = 4
+TTL_TRABAJOS = 600  # segundos que se conserva un trabajo terminado
+
+class TrabajoCancelado(Exception):
+    pass
+
+class Trabajo:
+    """Generación lanzada en segundo plano; el navegador consulta su progreso."""
+
+    def __init__(self, tipo):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.estado = "pendiente"  # pendiente | en_curso | completado | error | cancelado
+        self.fase = ""
+        self.archivos = 0
+        self.bytes = 0
+        self.total = 0
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self.terminado = None
+        self._cancelar = threading.Event()
+
+    def avanzar(self, archivos=1, bytes_leidos=0):
+        # Punto de control: se llama por cada archivo/proyecto procesado
+        self.archivos += archivos
+        self.bytes += bytes_leidos
+        if self._cancelar.is_set():
+            raise TrabajoCancelado()
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    def a_dict(self):
+        porcentaje = None
+        if self.estado == "completado":
+            porcentaje = 100.0
+        elif self.total:
+            porcentaje = round(min(100.0, 100.0 * self.archivos / self.total), 1)
+        datos = {
+            "ok": True, "id": self.id, "tipo": self.tipo, "estado": self.estado, "fase": self.fase,
+            "progreso": {"archivos": self.archivos, "total": self.total, "bytes": self.bytes, "porcentaje": porcentaje},
+            "segundos": round((self.terminado or time.time()) - self.creado, 3),
+        }
+        if self.error:
+            datos["error"] = self.error
+        if self.estado == "completado":
+            datos["resultado"] = self.resultado
+        return datos
+
+_trabajos = {}
+_trabajos_lock = threading.Lock()
+_pool_trabajos = ThreadPoolExecutor(max_workers=MAX_TRABAJOS_SIMULTANEOS, thread_name_prefix="trabajo")
+
+def _ejecutar_trabajo(trabajo, funcion):
+    METRICAS.sumar("lgy_trabajos", -1, estado="pendiente", tipo=trabajo.tipo)
+    if trabajo._cancelar.is_set():
+        trabajo.estado = "cancelado"
+    else:
+        trabajo.estado = "en_curso"
+        METRICAS.sumar("lgy_trabajos", 1, estado="en_curso", tipo=trabajo.tipo)
+        METRICAS.guardar()
+        try:
+            trabajo.resultado = funcion(trabajo)
+            trabajo.estado = "completado"
+        except TrabajoCancelado:
+            trabajo.estado = "cancelado"
+        except Exception as e:
+            trabajo.error = str(e)
+            trabajo.estado = "error"
+        METRICAS.sumar("lgy_trabajos", -1, estado="en_curso", tipo=trabajo.tipo)
+    trabajo.terminado = time.time()
+    METRICAS.guardar()
+
+def lanzar_trabajo(tipo, funcion):
+    """Registra un trabajo y lo ejecuta en el pool; `funcion(trabajo)` devuelve el resultado."""
+    ahora = time.time()
+    trabajo = Trabajo(tipo)
+    with _trabajos_lock:
+        for tid in [t.id for t in _trabajos.values() if t.terminado and ahora - t.terminado > TTL_TRABAJOS]:
+            del _trabajos[tid]
+        _trabajos[trabajo.id] = trabajo
+    METRICAS.sumar("lgy_trabajos", 1, estado="pendiente", tipo=tipo)
+    METRICAS.guardar()
+    _pool_trabajos.submit(_ejecutar_trabajo, trabajo, funcion)
+    return trabajo
+
+def obtener_trabajo(trabajo_id):
+    with _trabajos_lock:
+        return _trabajos.get(trabajo_id)
+
+# =========================
+# Métricas (perfil por fases de cada generación)
+# =========================
+METRICAS_RECIENTES = 50  # perfiles individuales que se conservan
+
+_metricas_total = Perfil()  # suma de todas las generaciones desde el arranque
+_metricas_recientes = deque(maxlen=METRICAS_RECIENTES)
+
+def registrar_perfil(tipo, perfil):
+    datos = perfil.a_dict()
+    _metricas_total.sumar(datos)
+    _metricas_total.contar(f"generaciones:{tipo}")
+    _metricas_recientes.append({"tipo": tipo, "fecha": datetime.now().isoformat(timespec="seconds"), **datos})
+    METRICAS.sumar_perfil(tipo, datos)
+    METRICAS.guardar()
+
+@contextmanager
+def perfilado(tipo):
+    """Perfil para una generación; al terminar (bien o con error) se registra en las métricas."""
+    perfil = Perfil()
+    try:
+        yield perfil
+    finally:
+        registrar_perfil(tipo, perfil)
+
+def _iterar_perfilado(tipo, perfil, trozos):
+    # Versión para generadores: registra cuando el streaming termina o se corta
+    try:
+        for trozo in trozos:
+            perfil.contar("bytes_producidos", len(trozo.encode("utf-8", "surrogatepass")))
+            yield trozo
+    finally:
+        registrar_perfil(tipo, perfil)
+
+# =========================
+# Métricas Prometheus (/metrics)
+# =========================
+# Con varios procesos (gunicorn -w N...) cada uno vuelca sus métricas en un
+# archivo de esta carpeta y /metrics suma los de todos. Debe vaciarse al
+# desplegar. Sin ella, cada proceso solo expone las suyas.
+METRICAS_DIR = os.environ.get("METRICAS_DIR") or None
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+METRICAS_DEF = {
+    "lgy_peticion_segundos": ("histogram", "Latencia de las peticiones por endpoint."),
+    "lgy_peticiones_total": ("counter", "Peticiones atendidas por endpoint y código HTTP."),
+    "lgy_peticiones_en_curso": ("gauge", "Peticiones que se están atendiendo ahora."),
+    "lgy_trabajos": ("gauge", "Trabajos en segundo plano pendientes o en curso."),
+    "lgy_generaciones_total": ("counter", "Generaciones terminadas por tipo."),
+    "lgy_bytes_producidos_total": ("counter", "Bytes (UTF-8) de prompts y reportes generados."),
+    "lgy_archivos_leidos_total": ("counter", "Archivos de código leídos."),
+    "lgy_bytes_leidos_total": ("counter", "Bytes de código leídos."),
+    "lgy_carpetas_visitadas_total": ("counter", "Carpetas listadas."),
+    "lgy_archivos_omitidos_total": ("counter", "Archivos no volcados, por motivo."),
+    "lgy_cache_consultas_total": ("counter", "Consultas a cada caché por resultado (acierto/fallo)."),
+    "lgy_fase_segundos_total": ("counter", "Segundos acumulados en cada fase (listado, lectura, bd:sqlite...)."),
+    "lgy_fase_veces_total": ("counter", "Veces que se ha ejecutado cada fase."),
+    "lgy_eventos_total": ("counter", "Otros contadores del perfil (errores de lectura...)."),
+}
+_CONTADORES_PERFIL = {
+    "archivos_leidos": "lgy_archivos_leidos_total",
+    "bytes_leidos": "lgy_bytes_leidos_total",
+    "carpetas_visitadas": "lgy_carpetas_visitadas_total",
+    "bytes_producidos": "lgy_bytes_producidos_total",
+}
+_RE_CACHE = re.compile(r"cache_(\w+)_(aciertos|fallos)$")
+
+class MetricasProceso:
+    """
+    Contadores, gauges e histogramas de este proceso. Actualizarlos solo toca
+    un diccionario en memoria; guardar() escribe la instantánea del proceso
+    (una vez por petición) si hay METRICAS_DIR.
+    """
+
+    def __init__(self, carpeta=None):
+        self.carpeta = carpeta
+        self._lock = threading.Lock()
+        self.valores = {}  # (nombre, etiquetas) -> valor
+        self.histogramas = {}  # (nombre, etiquetas) -> [cuentas por bucket..., +Inf, suma]
+
+    @staticmethod
+    def _clave(nombre, etiquetas):
+        return nombre, tuple(sorted(etiquetas.items()))
 
-    return prompt
+    def sumar(self, nombre, valor=1, **etiquetas):
+        clave = self._clave(nombre, etiquetas)
+        with self._lock:
+            self.valores[clave] = self.valores.get(clave, 0) + valor
+
+    def observar(self, nombre, valor, **etiquetas):
+        clave = self._clave(nombre, etiquetas)
+        with self._lock:
+            h = self.histogramas.get(clave)
+            if h is None:
+                h = self.histogramas[clave] = [0] * (len(BUCKETS_LATENCIA) + 1) + [0.0]
+            h[bisect.bisect_left(BUCKETS_LATENCIA, valor)] += 1
+            h[-1] += valor
+
+    def sumar_perfil(self, tipo, datos):
+        self.sumar("lgy_generaciones_total", tipo=tipo)
+        for nombre, valor in datos["contadores"].items():
+            m = _RE_CACHE.match(nombre)
+            if nombre in _CONTADORES_PERFIL:
+                self.sumar(_CONTADORES_PERFIL[nombre], valor, tipo=tipo)
+            elif nombre.startswith("omitidos:"):
+                self.sumar("lgy_archivos_omitidos_total", valor, motivo=nombre.split(":", 1)[1])
+            elif m:
+                self.sumar("lgy_cache_consultas_total", valor, cache=m.group(1),
+                           resultado="acierto" if m.group(2) == "aciertos" else "fallo")
+            else:
+                self.sumar("lgy_eventos_total", valor, nombre=nombre)
+        for fase, v in datos["fases"].items():
+            self.sumar("lgy_fase_segundos_total", v["segundos"], fase=fase)
+            self.sumar("lgy_fase_veces_total", v["veces"], fase=fase)
+
+    def instantanea(self):
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "valores": [[n, dict(e), v] for (n, e), v in self.valores.items()],
+                "histogramas": [[n, dict(e), list(h)] for (n, e), h in self.histogramas.items()],
+            }
+
+    def guardar(self):
+        if not self.carpeta:
+            return
+        try:
+            os.makedirs(self.carpeta, exist_ok=True)
+            destino = os.path.join(self.carpeta, f"{os.getpid()}.json")
+            with open(destino + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self.instantanea(), f)
+            os.replace(destino + ".tmp", destino)
+        except OSError:
+            pass  # las métricas nunca deben tumbar una petición
+
+    def _instantaneas(self):
+        propias = self.instantanea()
+        yield propias
+        if not self.carpeta or not os.path.isdir(self.carpeta):
+            return
+        for nombre in os.listdir(self.carpeta):
+            if not nombre.endswith(".json") or nombre == f"{propias['pid']}.json":
+                continue
+            try:
+                with open(os.path.join(self.carpeta, nombre), "r", encoding="utf-8") as f:
+                    yield json.load(f)
+            except (OSError, ValueError):
+                continue
+
+    def exponer(self):
+        """Texto en formato de exposición de Prometheus con la suma de todos los procesos."""
+        valores, histogramas = {}, {}
+        for datos in self._instantaneas():
+            vivo = datos["pid"] == os.getpid() or _proceso_vivo(datos["pid"])
+            for nombre, etiquetas, valor in datos["valores"]:
+                # Los gauges de un proceso que ya no existe no cuentan; los contadores sí
+                if METRICAS_DEF.get(nombre, ("counter",))[0] == "gauge" and not vivo:
+                    continue
+                clave = self._clave(nombre, etiquetas)
+                valores[clave] = valores.get(clave, 0) + valor
+            for nombre, etiquetas, h in datos["histogramas"]:
+                clave = self._clave(nombre, etiquetas)
+                acumulado = histogramas.setdefault(clave, [0] * len(h))
+                for i, v in enumerate(h):
+                    acumulado[i] += v
+
+        lineas = []
+        for nombre, (tipo, ayuda) in METRICAS_DEF.items():
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            if tipo == "histogram":
+                for (n, etiquetas), h in sorted(histogramas.items()):
+                    if n != nombre:
+                        continue
+                    acumulado = 0
+                    for limite, cuenta in zip(BUCKETS_LATENCIA + ("+Inf",), h[:-1]):
+                        acumulado += cuenta
+                        le = limite if limite == "+Inf" else repr(float(limite))
+                        lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas + (('le', le),))} {acumulado}")
+                    lineas.append(f"{nombre}_sum{_etiquetas(etiquetas)} {h[-1]}")
+                    lineas.append(f"{nombre}_count{_etiquetas(etiquetas)} {acumulado}")
+            else:
+                for (n, etiquetas), valor in sorted(valores.items()):
+                    if n == nombre:
+                        lineas.append(f"{nombre}{_etiquetas(etiquetas)} {valor}")
+        return "\n".join(lineas) + "\n"
+
+def _escapar_etiqueta(valor):
+    return str(valor).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _etiquetas(pares):
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar_etiqueta(v)}"' for k, v in pares) + "}"
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # existe, aunque sea de otro usuario
+    return True
+
+METRICAS = MetricasProceso(METRICAS_DIR)
+
+def _codigo_respuesta(respuesta):
+    # Flask: Response o (cuerpo, código); asgi.py: el código (int)
+    if isinstance(respuesta, int):
+        return respuesta
+    if isinstance(respuesta, tuple):
+        return respuesta[1]
+    return getattr(respuesta, "status_code", 200)
+
+@contextmanager
+def _medir(endpoint, resultado):
+    METRICAS.sumar("lgy_peticiones_en_curso", 1, endpoint=endpoint)
+    METRICAS.guardar()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        codigo = _codigo_respuesta(resultado[0]) if resultado else 500
+        METRICAS.observar("lgy_peticion_segundos", time.perf_counter() - inicio, endpoint=endpoint)
+        METRICAS.sumar("lgy_peticiones_total", endpoint=endpoint, codigo=str(codigo))
+        METRICAS.sumar("lgy_peticiones_en_curso", -1, endpoint=endpoint)
+        METRICAS.guardar()
+
+def medir_peticion(endpoint):
+    """Decorador de rutas (Flask o ASGI): latencia, código HTTP y peticiones en curso."""
+    def decorador(vista):
+        if asyncio.iscoroutinefunction(vista):
+            @functools.wraps(vista)
+            async def envoltura_async(*args, **kwargs):
+                resultado = []
+                with _medir(endpoint, resultado):
+                    resultado.append(await vista(*args, **kwargs))
+                return resultado[0]
+            return envoltura_async
+
+        @functools.wraps(vista)
+        def envoltura(*args, **kwargs):
+            resultado = []
+            with _medir(endpoint, resultado):
+                resultado.append(vista(*args, **kwargs))
+            return resultado[0]
+        return envoltura
+    return decorador
 
 # =========================
 # Rutas
 # =========================
 @app.route("/")
 def index():
-    return render_template("index.html")
+    # La opción tiktoken solo se ofrece si está instalado
+    return render_template("index.html", tokenizadores=TOKENIZADORES)
 
 @app.route("/api/config", methods=["GET", "POST"])
 def api_config():
@@ -249,13 +1394,15 @@ def api_list_dir():
     return jsonify({"ok": True, "path": path, "dirs": dirs})
 
 @app.route("/api/test_db", methods=["POST"])
+@medir_peticion("test_db")
 def api_test_db():
     data = request.json or {}
     mode = data.get("mode", "sqlite")
     if mode == "sqlite":
         sqlite_path = data.get("sqlite_path", "")
         if sqlite_path and os.path.isfile(sqlite_path):
-            rep = analizar_sqlite(sqlite_path)
+            with perfilado("test_db") as perfil, perfil.fase("bd:sqlite", ruta=sqlite_path):
+                rep = analizar_sqlite(sqlite_path, perfil)
             if rep:
                 return jsonify({"ok": True, "report": rep})
         return jsonify({"ok": False, "error": "No se pudo leer la base de datos SQLite."}), 400
@@ -263,26 +1410,88 @@ def api_test_db():
         mysql_cfg = data.get("mysql", {})
         if not all(mysql_cfg.get(k) for k in ("server", "user", "password", "database")):
             return jsonify({"ok": False, "error": "Completa todos los campos de conexión."}), 400
-        rep = analizar_mysql(mysql_cfg["server"], mysql_cfg["user"], mysql_cfg["password"], mysql_cfg["database"])
+        # Probar conexión siempre consulta el servidor, sin usar la caché del esquema
+        with perfilado("test_db") as perfil, perfil.fase("bd:mysql", servidor=mysql_cfg["server"], bd=mysql_cfg["database"]):
+            rep = analizar_mysql(mysql_cfg["server"], mysql_cfg["user"], mysql_cfg["password"], mysql_cfg["database"],
+                                 usar_cache=False)
         if rep:
             return jsonify({"ok": True, "report": rep})
         return jsonify({"ok": False, "error": "No se pudo conectar o leer la base de datos MySQL."}), 400
 
 @app.route("/api/generate", methods=["POST"])
+@medir_peticion("generate")
 def api_generate():
     data = request.json or {}
-    contexto = data.get("contexto", "").strip()
-    objetivo = data.get("objetivo", "").strip()
-    restricciones = data.get("restricciones", "").strip()
-    formato = data.get("formato", "").strip()
     carpeta_proyecto = data.get("carpeta_proyecto", "").strip()
-    db_mode = data.get("db_mode", "sqlite")
-    sqlite_path = data.get("sqlite_path", "").strip()
-    mysql_cfg = data.get("mysql", {})
-
-    result = generar_prompt_backend(contexto, objetivo, restricciones, formato, carpeta_proyecto, db_mode, sqlite_path, mysql_cfg)
+    with perfilado("generate") as perfil:
+        result = _generar_con_parametros(_parametros_prompt(data), carpeta_proyecto, perfil=perfil)
     return jsonify({"ok": True, "markdown": result})
 
+# Streaming (Server-Sent Events): el prompt sale por secciones según se genera
+SSE_TROZO_MAX = 32 * 1024
+SSE_INTERVALO = 0.1  # segundos máximos que se retiene una sección antes de enviarla
+
+def _evento_sse(datos, evento=None):
+    cabecera = f"event: {evento}\n" if evento else ""
+    return f"{cabecera}data: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+class AgrupadorSSE:
+    """Agrupa secciones completas en eventos (nunca corta un bloque de código)."""
+
+    def __init__(self):
+        self.buffer = []
+        self.tamano = 0
+        self.ultimo = 0.0
+
+    def anadir(self, trozo):
+        # Devuelve un evento si toca enviar lo acumulado; si no, None
+        self.buffer.append(trozo)
+        self.tamano += len(trozo)
+        ahora = time.monotonic()
+        if self.tamano >= SSE_TROZO_MAX or ahora - self.ultimo >= SSE_INTERVALO:
+            self.ultimo = ahora
+            return self.vaciar()
+        return None
+
+    def vaciar(self):
+        if not self.buffer:
+            return None
+        evento = _evento_sse({"markdown": "".join(self.buffer)})
+        self.buffer, self.tamano = [], 0
+        return evento
+
+def iterar_eventos_sse(trozos):
+    agrupador = AgrupadorSSE()
+    try:
+        for trozo in trozos:
+            evento = agrupador.anadir(trozo)
+            if evento:
+                yield evento
+        evento = agrupador.vaciar()
+        if evento:
+            yield evento
+        yield _evento_sse({"ok": True}, "fin")
+    except Exception as e:
+        yield _evento_sse({"ok": False, "error": str(e)}, "error")
+
+@app.route("/api/generate/stream", methods=["POST"])
+def api_generate_stream():
+    data = request.json or {}
+    carpeta_proyecto = data.get("carpeta_proyecto", "").strip()
+    p = _parametros_prompt(data)
+    perfil = Perfil()
+    trozos = iterar_prompt_backend(
+        p["contexto"], p["objetivo"], p["restricciones"], p["formato"],
+        carpeta_proyecto, p["db_mode"], p["sqlite_path"], p["mysql_cfg"],
+        p["max_tokens"], p["tokenizador"], base=p["base"], perfil=perfil,
+    )
+    trozos = _iterar_perfilado("generate_stream", perfil, trozos)
+    return Response(
+        stream_with_context(iterar_eventos_sse(trozos)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.route("/api/save_report", methods=["POST"])
 def api_save_report():
     data = request.json or {}
@@ -303,37 +1512,61 @@ def api_save_report():
         return jsonify({"ok": False, "error": str(e)}), 500
 
 @app.route("/api/save_prompts", methods=["POST"])
+@medir_peticion("save_prompts")
 def api_save_prompts():
     data = request.json or {}
     carpeta_proyecto = data.get("carpeta_proyecto", "").strip()
-    contexto = data.get("contexto", "").strip()
-    objetivo = data.get("objetivo", "").strip()
-    restricciones = data.get("restricciones", "").strip()
-    formato = data.get("formato", "").strip()
-    db_mode = data.get("db_mode", "sqlite")
-    sqlite_path = data.get("sqlite_path", "").strip()
-    mysql_cfg = data.get("mysql", {})
-
     if not carpeta_proyecto or not os.path.isdir(carpeta_proyecto):
         return jsonify({"ok": False, "error": "Selecciona la carpeta contenedora de proyectos."}), 400
 
-    out_dir = os.path.join(os.getcwd(), "prompts")
-    os.makedirs(out_dir, exist_ok=True)
-    guardados = 0
-    errores = []
-    for entrada in os.listdir(carpeta_proyecto):
-        ruta = os.path.join(carpeta_proyecto, entrada)
-        if os.path.isdir(ruta) and entrada.startswith("jocarsa-"):
-            texto_prompt = generar_prompt_backend(contexto, objetivo, restricciones, formato, ruta, db_mode, sqlite_path, mysql_cfg)
-            destino = os.path.join(out_dir, entrada + ".txt")
-            try:
-                with open(destino, "w", encoding="utf-8") as f:
-                    f.write(texto_prompt)
-                guardados += 1
-            except Exception as e:
-                errores.append(f"{entrada}: {e}")
+    resultado = _guardar_prompts(data, carpeta_proyecto)
+    return jsonify({"ok": True, **resultado})
+
+# Trabajos en segundo plano: devuelven un id al instante y se consultan por sondeo
+@app.route("/api/jobs", methods=["POST"])
+def api_jobs_crear():
+    data = request.json or {}
+    tipo = data.get("tipo", "generate")
+    carpeta_proyecto = data.get("carpeta_proyecto", "").strip()
+    if tipo == "generate":
+        parametros = _parametros_prompt(data)
+
+        def generar(t):
+            with perfilado("generate") as perfil:
+                return {"markdown": _generar_con_parametros(parametros, carpeta_proyecto, t, perfil)}
+        trabajo = lanzar_trabajo(tipo, generar)
+    elif tipo == "save_prompts":
+        if not carpeta_proyecto or not os.path.isdir(carpeta_proyecto):
+            return jsonify({"ok": False, "error": "Selecciona la carpeta contenedora de proyectos."}), 400
+        trabajo = lanzar_trabajo(tipo, lambda t: _guardar_prompts(data, carpeta_proyecto, t))
+    else:
+        return jsonify({"ok": False, "error": f"Tipo de trabajo desconocido: {tipo}"}), 400
+    return jsonify({"ok": True, "id": trabajo.id}), 202
+
+@app.route("/api/jobs/<trabajo_id>")
+def api_jobs_estado(trabajo_id):
+    trabajo = obtener_trabajo(trabajo_id)
+    if trabajo is None:
+        return jsonify({"ok": False, "error": "Trabajo no encontrado."}), 404
+    return jsonify(trabajo.a_dict())
+
+@app.route("/api/jobs/<trabajo_id>/cancel", methods=["POST"])
+def api_jobs_cancelar(trabajo_id):
+    trabajo = obtener_trabajo(trabajo_id)
+    if trabajo is None:
+        return jsonify({"ok": False, "error": "Trabajo no encontrado."}), 404
+    trabajo.cancelar()
+    return jsonify(trabajo.a_dict())
+
+@app.route("/api/metrics")
+def api_metrics():
+    # Totales por fase y contadores desde el arranque, más las últimas generaciones
+    return jsonify({"ok": True, "acumulado": _metricas_total.a_dict(), "recientes": list(_metricas_recientes)})
 
-    return jsonify({"ok": True, "guardados": guardados, "errores": errores})
+@app.route("/metrics")
+def metrics():
+    # Formato de texto de Prometheus (sumando todos los procesos si hay METRICAS_DIR)
+    return Response(METRICAS.exponer(), mimetype="text/plain; version=0.0.4; charset=utf-8")
 
 # Descargar archivos guardados
 @app.route("/download/<path:filename>")
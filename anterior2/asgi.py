@@ -0,0 +1,122 @@
+"""
+Punto de entrada ASGI de la app web para servidores asíncronos
+(uvicorn, hypercorn...):
+
+    uvicorn asgi:aplicacion --workers 2
+
+/api/generate y /api/generate/stream usan el motor asíncrono de app.py: el
+listado, la lectura de archivos y la introspección de la BD se solapan en un
+pool fijo de hilos, así que un solo proceso atiende decenas de generaciones
+a la vez sin agotar los workers. El resto de rutas se sirven con la app Flask
+de siempre a través de asgiref (si está instalado).
+"""
+import json
+
+import app as backend
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except Exception:
+    WsgiToAsgi = None
+
+_flask = WsgiToAsgi(backend.app) if WsgiToAsgi is not None else None
+
+
+async def _leer_json(receive):
+    cuerpo = b""
+    while True:
+        mensaje = await receive()
+        cuerpo += mensaje.get("body", b"")
+        if not mensaje.get("more_body"):
+            break
+    try:
+        return json.loads(cuerpo or b"{}") or {}
+    except ValueError:
+        return {}
+
+
+async def _empezar(send, codigo, tipo, cabeceras=()):
+    await send({
+        "type": "http.response.start",
+        "status": codigo,
+        "headers": [(b"content-type", tipo.encode("latin-1"))] + [(k.encode(), v.encode()) for k, v in cabeceras],
+    })
+
+
+async def _responder_json(send, datos, codigo=200):
+    await _empezar(send, codigo, "application/json")
+    await send({"type": "http.response.body", "body": json.dumps(datos, ensure_ascii=False).encode("utf-8")})
+    return codigo
+
+
+@backend.medir_peticion("generate")
+async def api_generate(scope, receive, send):
+    data = await _leer_json(receive)
+    carpeta_proyecto = data.get("carpeta_proyecto", "").strip()
+    argumentos = backend._argumentos_async(backend._parametros_prompt(data), carpeta_proyecto)
+    with backend.perfilado("generate") as perfil:
+        markdown = await backend.generar_prompt_backend_async(*argumentos, perfil=perfil)
+    return await _responder_json(send, {"ok": True, "markdown": markdown})
+
+
+async def api_generate_stream(scope, receive, send):
+    # Mismos eventos que la ruta Flask (ver iterar_eventos_sse)
+    data = await _leer_json(receive)
+    carpeta_proyecto = data.get("carpeta_proyecto", "").strip()
+    argumentos = backend._argumentos_async(backend._parametros_prompt(data), carpeta_proyecto)
+    await _empezar(send, 200, "text/event-stream", [("cache-control", "no-cache"), ("x-accel-buffering", "no")])
+
+    async def enviar(evento):
+        await send({"type": "http.response.body", "body": evento.encode("utf-8"), "more_body": True})
+
+    perfil = backend.Perfil()
+    agrupador = backend.AgrupadorSSE()
+    try:
+        async for trozo in backend.iterar_prompt_backend_async(*argumentos, perfil=perfil):
+            perfil.contar("bytes_producidos", len(trozo.encode("utf-8", "surrogatepass")))
+            evento = agrupador.anadir(trozo)
+            if evento:
+                await enviar(evento)
+        evento = agrupador.vaciar()
+        if evento:
+            await enviar(evento)
+        await enviar(backend._evento_sse({"ok": True}, "fin"))
+    except Exception as e:
+        await enviar(backend._evento_sse({"ok": False, "error": str(e)}, "error"))
+    finally:
+        backend.registrar_perfil("generate_stream", perfil)
+    await send({"type": "http.response.body", "body": b""})
+
+
+RUTAS = {
+    ("POST", "/api/generate"): api_generate,
+    ("POST", "/api/generate/stream"): api_generate_stream,
+}
+
+
+async def _ciclo_de_vida(receive, send):
+    while True:
+        mensaje = await receive()
+        if mensaje["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif mensaje["type"] == "lifespan.shutdown":
+            backend._pool_io.shutdown(wait=False, cancel_futures=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def aplicacion(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _ciclo_de_vida(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+    vista = RUTAS.get((scope["method"], scope["path"]))
+    if vista is not None:
+        await vista(scope, receive, send)
+    elif _flask is not None:
+        await _flask(scope, receive, send)
+    else:
+        await _responder_json(send, {
+            "ok": False, "error": "Ruta no disponible en modo ASGI sin asgiref (pip install asgiref).",
+        }, 404)
@@ -29,6 +29,9 @@ const mysql_db = document.getElementById('mysql_db');
 const exts = document.getElementById('exts');
 const excs = document.getElementById('excs');
 const chkBienvenida = document.getElementById('chk_bienvenida');
+const maxTokens = document.getElementById('max_tokens');
+const tokenizador = document.getElementById('tokenizador');
+const base = document.getElementById('base');
 
 const mdRaw = document.getElementById('md-raw');
 const mdView = document.getElementById('md-view');
@@ -115,10 +118,13 @@ document.getElementById('btn-testdb').addEventListener('click', async () => {
   }
 });
 
-document.getElementById('btn-generate').addEventListener('click', async () => {
-  const payload = {
+function promptPayload() {
+  return {
     contexto: ctx.value, objetivo: obj.value, restricciones: res.value, formato: fmt.value,
     carpeta_proyecto: proyecto.value.trim(),
+    max_tokens: parseInt(maxTokens.value, 10) || 0,
+    tokenizador: tokenizador.value,
+    base: base.value.trim(),
     db_mode: dbSqlite.checked ? 'sqlite' : 'mysql',
     sqlite_path: sqlitefile.value.trim(),
     mysql: {
@@ -128,16 +134,120 @@ document.getElementById('btn-generate').addEventListener('click', async () => {
       database: mysql_db.value.trim(),
     }
   };
-  const r = await fetch('/api/generate', { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify(payload)});
+}
+
+// Background jobs: submit, poll progress, allow cancel
+const jobBox = document.getElementById('job-progress');
+const jobBar = document.getElementById('job-progress-bar');
+const jobText = document.getElementById('job-progress-text');
+const btnCancelJob = document.getElementById('btn-cancel-job');
+let currentJob = null;
+
+function showJob(j) {
+  jobBox.classList.remove('d-none');
+  const p = j.progreso || {};
+  const pct = p.porcentaje == null ? 100 : p.porcentaje;
+  jobBar.style.width = pct + '%';
+  jobBar.classList.toggle('progress-bar-animated', p.porcentaje == null);
+  jobBar.textContent = p.porcentaje == null ? '' : `${p.porcentaje}%`;
+  const kb = Math.round((p.bytes || 0) / 1024);
+  jobText.textContent = `${j.fase || j.estado}: ${p.archivos || 0}/${p.total || '?'} · ${kb} KB · ${j.segundos}s`;
+}
+
+async function runJob(tipo, payload) {
+  if (currentJob) { toast('Ya hay un trabajo en curso', 'warning'); return null; }
+  const r = await fetch('/api/jobs', { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({...payload, tipo})});
   const j = await r.json();
-  if (j.ok) {
-    mdRaw.textContent = j.markdown;
-    mdView.innerHTML = marked.parse(j.markdown);
-    mdView.querySelectorAll('pre code').forEach(el => hljs.highlightElement(el));
-    toast('Prompt generado', 'success');
+  if (!j.ok) { toast(j.error || 'No se pudo lanzar el trabajo', 'danger'); return null; }
+  currentJob = j.id;
+  showJob({estado: 'pendiente', progreso: {}, segundos: 0});
+  try {
+    while (true) {
+      await new Promise(done => setTimeout(done, 500));
+      const e = await (await fetch(`/api/jobs/${j.id}`)).json();
+      if (!e.ok) { toast(e.error || 'Trabajo perdido', 'danger'); return null; }
+      showJob(e);
+      if (['completado', 'error', 'cancelado'].includes(e.estado)) return e;
+    }
+  } finally {
+    currentJob = null;
+    jobBox.classList.add('d-none');
   }
+}
+
+btnCancelJob.addEventListener('click', async () => {
+  if (streamAbort) streamAbort.abort();
+  if (currentJob) await fetch(`/api/jobs/${currentJob}/cancel`, { method: 'POST' });
 });
 
+// Streaming generation: each SSE event carries complete Markdown sections,
+// so they can be appended and highlighted one by one as they arrive.
+let streamAbort = null;
+
+function appendChunk(markdown) {
+  mdRaw.appendChild(document.createTextNode(markdown));
+  const part = document.createElement('div');
+  part.innerHTML = marked.parse(markdown);
+  part.querySelectorAll('pre code').forEach(el => hljs.highlightElement(el));
+  mdView.appendChild(part);
+}
+
+function handleSseEvent(raw, state) {
+  let event = 'message';
+  let data = '';
+  raw.split('\n').forEach(line => {
+    if (line.startsWith('event: ')) event = line.slice(7);
+    else if (line.startsWith('data: ')) data += line.slice(6);
+  });
+  if (!data) return;
+  const payload = JSON.parse(data);
+  if (event === 'fin') state.done = true;
+  else if (event === 'error') state.error = payload.error;
+  else {
+    appendChunk(payload.markdown);
+    state.bytes += payload.markdown.length;
+    showJob({fase: 'recibiendo', estado: 'en_curso', progreso: {bytes: state.bytes}, segundos: ((performance.now() - state.t0) / 1000).toFixed(1)});
+  }
+}
+
+async function generateStreaming(payload) {
+  if (currentJob || streamAbort) { toast('Ya hay un trabajo en curso', 'warning'); return; }
+  streamAbort = new AbortController();
+  mdRaw.textContent = '';
+  mdView.innerHTML = '';
+  const state = {done: false, error: null, bytes: 0, t0: performance.now()};
+  showJob({estado: 'pendiente', progreso: {}, segundos: 0});
+  try {
+    const r = await fetch('/api/generate/stream', {
+      method: 'POST', headers: {'Content-Type': 'application/json'},
+      body: JSON.stringify(payload), signal: streamAbort.signal,
+    });
+    const reader = r.body.getReader();
+    const decoder = new TextDecoder();
+    let pending = '';
+    while (true) {
+      const {value, done} = await reader.read();
+      if (done) break;
+      pending += decoder.decode(value, {stream: true});
+      let sep;
+      while ((sep = pending.indexOf('\n\n')) !== -1) {
+        handleSseEvent(pending.slice(0, sep), state);
+        pending = pending.slice(sep + 2);
+      }
+    }
+    if (state.error) toast(state.error, 'danger');
+    else if (state.done) toast('Prompt generado', 'success');
+  } catch (err) {
+    if (err.name === 'AbortError') toast('Generación cancelada', 'secondary');
+    else toast('Error al generar', 'danger');
+  } finally {
+    streamAbort = null;
+    jobBox.classList.add('d-none');
+  }
+}
+
+document.getElementById('btn-generate').addEventListener('click', () => generateStreaming(promptPayload()));
+
 document.getElementById('btn-save').addEventListener('click', async () => {
   const r = await fetch('/api/save_report', { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({markdown: mdRaw.textContent, carpeta_proyecto: proyecto.value.trim()})});
   const j = await r.json();
@@ -153,22 +263,16 @@ document.getElementById('btn-save').addEventListener('click', async () => {
 });
 
 document.getElementById('btn-jocarsa').addEventListener('click', async () => {
-  const payload = {
-    contexto: ctx.value, objetivo: obj.value, restricciones: res.value, formato: fmt.value,
-    carpeta_proyecto: proyecto.value.trim(),
-    db_mode: dbSqlite.checked ? 'sqlite' : 'mysql',
-    sqlite_path: sqlitefile.value.trim(),
-    mysql: {
-      server: mysql_server.value.trim(),
-      user: mysql_user.value.trim(),
-      password: mysql_pass.value.trim(),
-      database: mysql_db.value.trim(),
-    }
-  };
-  const r = await fetch('/api/save_prompts', { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify(payload)});
-  const j = await r.json();
-  if (j.ok) toast(`Prompts guardados: ${j.guardados}`, 'success');
-  else toast(j.error || 'No se guardaron prompts', 'danger');
+  const e = await runJob('save_prompts', promptPayload());
+  if (!e) return;
+  if (e.estado === 'completado') {
+    const j = e.resultado;
+    toast(`Prompts guardados: ${j.guardados} (${j.segundos}s)`, j.errores.length ? 'warning' : 'success');
+  } else if (e.estado === 'cancelado') {
+    toast('Guardado de prompts cancelado', 'secondary');
+  } else {
+    toast(e.error || 'No se guardaron prompts', 'danger');
+  }
 });
 
 // Directory picker modal
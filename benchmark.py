@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Banco de pruebas de rendimiento del generador de reportes.
+
+Crea un árbol de código sintético con la forma indicada (profundidad,
+ramificación, número de archivos, distribución de tamaños y proporción de
+carpetas excluidas) y mide, cada una en un proceso hijo aislado:
+
+- construir_mapa_directorios
+- generar_reporte_intercalado
+- generar_reporte
+- POST /api/generate de la app Flask (anterior2/app.py)
+
+Para cada medición guarda el tiempo real, el pico de memoria (RSS) y las
+llamadas al sistema de lectura/escritura, y vuelca todo en JSON para poder
+comparar versiones.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+RAIZ_REPO = os.path.dirname(os.path.abspath(__file__))
+CARPETA_APP = os.path.join(RAIZ_REPO, "anterior2")
+
+OBJETIVOS = ("mapa", "intercalado", "reporte", "flask")
+
+# Extensiones y carpetas que se reparten por el árbol sintético
+EXTENSIONES_SINTETICAS = (".py", ".js", ".html", ".css", ".php", ".json", ".md", ".sql", ".png", ".txt")
+CARPETAS_EXCLUIDAS_SINTETICAS = ("node_modules", "vendor", "__pycache__", ".venv", ".git")
+
+
+# =========================
+# Generador de repositorios sintéticos
+# =========================
+def _tamano_aleatorio(rnd: random.Random, medio: int, distribucion: str) -> int:
+    if distribucion == "fijo":
+        return medio
+    if distribucion == "uniforme":
+        return rnd.randint(0, 2 * medio)
+    # lognormal: muchos archivos pequeños y unos pocos muy grandes, como en un repo real.
+    # La media de lognormvariate(0, 1) es e^(1/2) ≈ 1.6487
+    return int(rnd.lognormvariate(0, 1.0) * medio / 1.6487)
+
+
+def _contenido(rnd: random.Random, tamano: int, extension: str) -> bytes:
+    if extension == ".png":
+        return rnd.randbytes(tamano) if hasattr(rnd, "randbytes") else os.urandom(tamano)
+    linea = f"valor_{rnd.randint(0, 9999)} = calcular({rnd.randint(0, 99)})  # comentario\n".encode()
+    repeticiones = tamano // len(linea) + 1
+    return (linea * repeticiones)[:tamano]
+
+
+def generar_repo_sintetico(
+    destino: str,
+    profundidad: int = 3,
+    ramas: int = 4,
+    archivos: int = 2000,
+    tam_medio: int = 4096,
+    distribucion: str = "lognormal",
+    ratio_excluidas: float = 0.1,
+    semilla: int = 1234,
+) -> Dict[str, int]:
+    """
+    Crea en `destino` un árbol con `ramas` subcarpetas por nivel hasta
+    `profundidad` y reparte `archivos` entre todas sus carpetas. Una fracción
+    `ratio_excluidas` de los archivos va a carpetas que el reporte excluye
+    (node_modules, vendor...). Devuelve un resumen de lo creado.
+    """
+    rnd = random.Random(semilla)
+    carpetas = [""]
+    nivel = [""]
+    for _ in range(profundidad):
+        siguiente = []
+        for padre in nivel:
+            for i in range(ramas):
+                siguiente.append(os.path.join(padre, f"mod{i}"))
+        carpetas.extend(siguiente)
+        nivel = siguiente
+    excluidas = [
+        os.path.join(rnd.choice(carpetas), rnd.choice(CARPETAS_EXCLUIDAS_SINTETICAS), "pkg")
+        for _ in range(max(1, len(carpetas) // 10))
+    ]
+
+    total_bytes = 0
+    n_excluidos = 0
+    for i in range(archivos):
+        excluido = rnd.random() < ratio_excluidas
+        carpeta = rnd.choice(excluidas if excluido else carpetas)
+        extension = rnd.choice(EXTENSIONES_SINTETICAS)
+        ruta = os.path.join(destino, carpeta, f"archivo{i}{extension}")
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        datos = _contenido(rnd, _tamano_aleatorio(rnd, tam_medio, distribucion), extension)
+        with open(ruta, "wb") as f:
+            f.write(datos)
+        total_bytes += len(datos)
+        n_excluidos += excluido
+    return {"carpetas": len(carpetas), "archivos": archivos, "excluidos": n_excluidos, "bytes": total_bytes}
+
+
+# =========================
+# Medición (proceso hijo)
+# =========================
+def _llamadas_sistema() -> Dict[str, int]:
+    """Contadores de /proc/self/io (solo Linux): llamadas read/write y bytes."""
+    try:
+        with open("/proc/self/io", "r", encoding="ascii") as f:
+            campos = dict(linea.split(": ") for linea in f.read().splitlines())
+    except OSError:
+        return {}
+    return {clave: int(campos[clave]) for clave in ("syscr", "syscw", "rchar", "wchar") if clave in campos}
+
+
+def _ejecutar_objetivo(objetivo: str, ruta: str) -> int:
+    """Ejecuta una vez el objetivo y devuelve el tamaño de la salida."""
+    if objetivo == "flask":
+        sys.path.insert(0, CARPETA_APP)
+        import app as app_flask
+        cliente = app_flask.app.test_client()
+        respuesta = cliente.post("/api/generate", json={"carpeta_proyecto": ruta, "db_mode": "sqlite"})
+        if respuesta.status_code != 200:
+            raise RuntimeError(f"/api/generate respondió {respuesta.status_code}")
+        return len(respuesta.get_data())
+
+    sys.path.insert(0, RAIZ_REPO)
+    import lightgoldenrodyellow as lg
+    if objetivo == "mapa":
+        return len(lg.construir_mapa_directorios(ruta))
+    if objetivo == "intercalado":
+        return len(lg.generar_reporte_intercalado(ruta))
+    if objetivo == "reporte":
+        return len(lg.generar_reporte(ruta))
+    raise ValueError(f"objetivo desconocido: {objetivo}")
+
+
+def medir_en_hijo(objetivo: str, ruta: str) -> None:
+    """Punto de entrada del proceso hijo: mide y escribe el resultado en stdout."""
+    antes = _llamadas_sistema()
+    inicio = time.perf_counter()
+    tamano = _ejecutar_objetivo(objetivo, ruta)
+    segundos = time.perf_counter() - inicio
+    despues = _llamadas_sistema()
+    resultado = {"segundos": segundos, "bytes_salida": tamano}
+    resultado.update({k: despues[k] - antes.get(k, 0) for k in despues})
+    print(json.dumps(resultado))
+
+
+# =========================
+# Orquestación
+# =========================
+def medir(objetivo: str, ruta: str, cwd: str) -> Dict[str, object]:
+    """Lanza un hijo para `objetivo` y añade su pico de memoria (wait4)."""
+    # stderr a un temporal: así basta con leer stdout hasta el final antes de wait4
+    with tempfile.TemporaryFile() as errores:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--_hijo", objetivo, ruta],
+            stdout=subprocess.PIPE, stderr=errores, cwd=cwd,
+        )
+        salida = proc.stdout.read()
+        proc.stdout.close()
+        # wait4 (y no proc.wait) para obtener el uso de recursos de este hijo en concreto
+        _, estado, uso = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(estado)
+        errores.seek(0)
+        error = errores.read()
+    if proc.returncode != 0:
+        ultima = error.decode("utf-8", "replace").strip().splitlines()[-1:] or ["sin salida"]
+        return {"objetivo": objetivo, "error": ultima[0]}
+    resultado = json.loads(salida)
+    # ru_maxrss está en KiB en Linux y en bytes en macOS
+    factor = 1 if sys.platform == "darwin" else 1024
+    resultado.update({
+        "objetivo": objetivo,
+        "rss_max_bytes": uso.ru_maxrss * factor,
+        "cambios_contexto": uso.ru_nvcsw + uso.ru_nivcsw,
+        "bloques_leidos": uso.ru_inblock,
+        "bloques_escritos": uso.ru_oublock,
+    })
+    return resultado
+
+
+def _version() -> Optional[str]:
+    try:
+        res = subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=RAIZ_REPO,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return res.stdout.decode().strip() or None
+
+
+def resumir(resultados: List[Dict[str, object]]) -> Dict[str, Dict[str, float]]:
+    resumen = {}
+    for objetivo in {r["objetivo"] for r in resultados if "error" not in r}:
+        propios = [r for r in resultados if r["objetivo"] == objetivo and "error" not in r]
+        tiempos = [r["segundos"] for r in propios]
+        resumen[objetivo] = {
+            "segundos_min": min(tiempos),
+            "segundos_mediana": statistics.median(tiempos),
+            "rss_max_bytes": max(r["rss_max_bytes"] for r in propios),
+        }
+    return resumen
+
+
+def _tamano_bytes(valor: str) -> int:
+    """Convierte '500', '64K' o '10M' en bytes."""
+    multiplicadores = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    texto = valor.strip().upper().rstrip("B")
+    factor = multiplicadores.get(texto[-1:], 1)
+    if factor != 1:
+        texto = texto[:-1]
+    try:
+        return int(texto) * factor
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"tamaño no válido: {valor}")
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--_hijo":
+        medir_en_hijo(sys.argv[2], sys.argv[3])
+        return
+
+    parser = argparse.ArgumentParser(description="Mide el rendimiento del generador sobre un repositorio sintético.")
+    parser.add_argument("--repo", help="Medir sobre esta carpeta en lugar de generar una sintética")
+    parser.add_argument("--profundidad", type=int, default=3, help="Niveles de carpetas (por defecto 3)")
+    parser.add_argument("--ramas", type=int, default=4, help="Subcarpetas por carpeta (por defecto 4)")
+    parser.add_argument("--archivos", type=int, default=2000, help="Número de archivos (por defecto 2000)")
+    parser.add_argument("--tam-medio", type=_tamano_bytes, default=4096, help="Tamaño medio de archivo (admite K, M)")
+    parser.add_argument(
+        "--distribucion", choices=("lognormal", "uniforme", "fijo"), default="lognormal",
+        help="Distribución de tamaños (por defecto lognormal)"
+    )
+    parser.add_argument(
+        "--ratio-excluidas", type=float, default=0.1,
+        help="Fracción de archivos dentro de carpetas excluidas (por defecto 0.1)"
+    )
+    parser.add_argument("--semilla", type=int, default=1234)
+    parser.add_argument("--repeticiones", type=int, default=3, help="Mediciones por objetivo (por defecto 3)")
+    parser.add_argument(
+        "--objetivos", nargs="+", choices=OBJETIVOS, default=list(OBJETIVOS),
+        help="Qué medir (por defecto todo)"
+    )
+    parser.add_argument("--salida", default="benchmark.json", help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    temporal = tempfile.mkdtemp(prefix="lgy-bench-")
+    try:
+        forma = None
+        ruta = os.path.abspath(args.repo) if args.repo else os.path.join(temporal, "repo")
+        if not args.repo:
+            forma = {
+                "profundidad": args.profundidad, "ramas": args.ramas, "archivos": args.archivos,
+                "tam_medio": args.tam_medio, "distribucion": args.distribucion,
+                "ratio_excluidas": args.ratio_excluidas, "semilla": args.semilla,
+            }
+            print(f"[..] Generando repositorio sintético en {ruta}")
+            forma["creado"] = generar_repo_sintetico(
+                ruta, args.profundidad, args.ramas, args.archivos, args.tam_medio,
+                args.distribucion, args.ratio_excluidas, args.semilla,
+            )
+        # Los hijos se ejecutan en una carpeta vacía para no tocar el config.json del usuario
+        cwd = os.path.join(temporal, "cwd")
+        os.makedirs(cwd, exist_ok=True)
+
+        resultados = []
+        for objetivo in args.objetivos:
+            for i in range(args.repeticiones):
+                r = medir(objetivo, ruta, cwd)
+                r["repeticion"] = i
+                resultados.append(r)
+                if "error" in r:
+                    print(f"[ERROR] {objetivo}: {r['error']}", file=sys.stderr)
+                    break
+                print(f"[OK] {objetivo} #{i}: {r['segundos']:.3f} s, RSS {r['rss_max_bytes'] / 2**20:.1f} MiB")
+
+        informe = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "version": _version(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "repo": args.repo,
+            "forma": forma,
+            "resultados": resultados,
+            "resumen": resumir(resultados),
+        }
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(informe, f, indent=2, ensure_ascii=False)
+        print(f"[OK] Resultados guardados en {os.path.abspath(args.salida)}")
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
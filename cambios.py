@@ -0,0 +1,214 @@
+"""
+Cambios de un proyecto respecto a una línea base, para los reportes
+incrementales del CLI y de la app Flask.
+
+La línea base puede ser una referencia de git (`HEAD`, `main`, un hash...)
+o un manifiesto JSON escrito por una ejecución anterior (`--manifest`).
+"""
+import hashlib
+import json
+import os
+import subprocess
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+VERSION_MANIFIESTO = 1
+
+
+@dataclass
+class Cambios:
+    """Rutas relativas (con '/') añadidas, modificadas y eliminadas."""
+    base: str
+    nuevos: List[str] = field(default_factory=list)
+    modificados: List[str] = field(default_factory=list)
+    eliminados: List[str] = field(default_factory=list)
+
+    @property
+    def cambiados(self) -> Set[str]:
+        return set(self.nuevos) | set(self.modificados)
+
+    def carpetas_con_cambios(self) -> Set[str]:
+        """Carpetas (relativas, "" = raíz) que contienen algún archivo cambiado."""
+        carpetas = {""}
+        for ruta in self.cambiados:
+            while "/" in ruta:
+                ruta = ruta.rsplit("/", 1)[0]
+                if ruta in carpetas:
+                    break
+                carpetas.add(ruta)
+        return carpetas
+
+    def resumen(self) -> List[str]:
+        """Líneas Markdown con el recuento y la lista de eliminados."""
+        lineas = [
+            f"Línea base: `{self.base}`",
+            "",
+            f"- Añadidos: {len(self.nuevos)}",
+            f"- Modificados: {len(self.modificados)}",
+            f"- Eliminados: {len(self.eliminados)}",
+        ]
+        if self.eliminados:
+            lineas += ["", "Archivos eliminados:", ""]
+            lineas += [f"- {ruta}" for ruta in self.eliminados]
+        return lineas
+
+
+def _sha1_archivo(ruta: str) -> str:
+    h = hashlib.sha1()
+    with open(ruta, "rb") as f:
+        for trozo in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(trozo)
+    return h.hexdigest()
+
+
+def _huella(ruta_raiz: str, ruta_rel: str, anterior: Optional[list]) -> Optional[list]:
+    """[tamaño, mtime_ns, sha1]; el hash se reutiliza si tamaño y mtime no cambian."""
+    ruta = os.path.join(ruta_raiz, *ruta_rel.split("/"))
+    try:
+        st = os.stat(ruta)
+        if anterior and anterior[0] == st.st_size and anterior[1] == st.st_mtime_ns:
+            return list(anterior)
+        return [st.st_size, st.st_mtime_ns, _sha1_archivo(ruta)]
+    except OSError:
+        return None
+
+
+def cargar_manifiesto(ruta: str) -> Dict[str, list]:
+    with open(ruta, "r", encoding="utf-8") as f:
+        datos = json.load(f)
+    if datos.get("version") != VERSION_MANIFIESTO:
+        raise ValueError(f"manifiesto no compatible: {ruta}")
+    return datos["archivos"]
+
+
+def escribir_manifiesto(ruta_raiz: str, rutas_rel: Iterable[str], destino: str) -> None:
+    """
+    Guarda la huella de cada archivo del reporte. Si `destino` ya existe se
+    aprovechan sus hashes, así que solo se leen los archivos que han cambiado.
+    """
+    try:
+        anterior = cargar_manifiesto(destino)
+    except (OSError, ValueError, KeyError):
+        anterior = {}
+    archivos = {}
+    for ruta_rel in rutas_rel:
+        huella = _huella(ruta_raiz, ruta_rel, anterior.get(ruta_rel))
+        if huella is not None:
+            archivos[ruta_rel] = huella
+    datos = {
+        "version": VERSION_MANIFIESTO,
+        "raiz": os.path.abspath(ruta_raiz),
+        "generado": datetime.now().isoformat(timespec="seconds"),
+        "archivos": archivos,
+    }
+    temporal = destino + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False, sort_keys=True)
+    os.replace(temporal, destino)
+
+
+def cambios_desde_manifiesto(ruta_raiz: str, rutas_rel: Iterable[str], manifiesto: str) -> Cambios:
+    """Compara los archivos actuales con un manifiesto anterior (sin releer los que no cambian)."""
+    base = cargar_manifiesto(manifiesto)
+    cambios = Cambios(base=manifiesto)
+    actuales = set()
+    for ruta_rel in rutas_rel:
+        actuales.add(ruta_rel)
+        previa = base.get(ruta_rel)
+        if previa is None:
+            cambios.nuevos.append(ruta_rel)
+            continue
+        huella = _huella(ruta_raiz, ruta_rel, previa)
+        if huella is not None and huella[0] == previa[0] and huella[2] == previa[2]:
+            continue
+        cambios.modificados.append(ruta_rel)
+    cambios.eliminados = sorted(r for r in base if r not in actuales)
+    return cambios
+
+
+class ErrorGit(ValueError):
+    """Fallo de git: el mensaje es una sola línea; `detalle` es su salida de error completa."""
+
+    def __init__(self, mensaje: str, detalle: str = ""):
+        super().__init__(mensaje)
+        self.detalle = detalle or mensaje
+
+
+def _git(ruta_raiz: str, *args: str) -> List[str]:
+    res = subprocess.run(
+        ["git", "-c", "core.quotepath=off", *args], cwd=ruta_raiz,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    if res.returncode != 0:
+        detalle = res.stderr.decode("utf-8", "replace").strip()
+        primera = next((l.strip() for l in detalle.splitlines() if l.strip()), "")
+        raise ErrorGit(primera or f"git {args[0]} falló", detalle)
+    return [r for r in res.stdout.decode("utf-8", "surrogateescape").split("\0") if r]
+
+
+def resolver_ref(ruta_raiz: str, ref: str) -> str:
+    """
+    Hash del commit al que apunta `ref`. Una ref que empieza por '-' se
+    rechaza: git la tomaría como opción (p. ej. '--output=...').
+    """
+    if not ref or ref.startswith("-"):
+        raise ValueError(f"referencia de git no válida: {ref!r}")
+    try:
+        salida = _git(ruta_raiz, "rev-parse", "--verify", "--quiet", "--end-of-options", ref + "^{commit}")
+    except ErrorGit as e:
+        raise ErrorGit(f"referencia de git no válida: {ref!r} ({e})", e.detalle) from e
+    if not salida:
+        raise ValueError(f"referencia de git no válida: {ref!r}")
+    return salida[0].strip()
+
+
+def cambios_desde_git(ruta_raiz: str, rutas_rel: Iterable[str], ref: str) -> Cambios:
+    """
+    Cambios del árbol de trabajo respecto a `ref` con tres llamadas a git en
+    total (rev-parse + diff + archivos sin seguimiento), nunca una por archivo.
+    """
+    commit = resolver_ref(ruta_raiz, ref)
+    # --relative limita el diff a la carpeta y da rutas relativas a ella
+    salida = _git(
+        ruta_raiz, "diff", "--name-status", "--no-renames", "--relative", "-z", "--end-of-options", commit, "--"
+    )
+    estados = dict(zip(salida[1::2], (e[0] for e in salida[0::2])))
+    for ruta in _git(ruta_raiz, "ls-files", "--others", "--exclude-standard", "-z"):
+        estados.setdefault(ruta, "A")
+    cambios = Cambios(base=ref)
+    actuales = set(rutas_rel)
+    for ruta in sorted(estados):
+        estado = estados[ruta]
+        if estado == "D":
+            cambios.eliminados.append(ruta)
+        elif ruta in actuales:
+            (cambios.nuevos if estado == "A" else cambios.modificados).append(ruta)
+    return cambios
+
+
+def _manifiesto_en_proyecto(ruta_raiz: str, base: str) -> Optional[str]:
+    """Ruta del manifiesto `base` (relativa al proyecto) si existe y está dentro de él."""
+    raiz = os.path.realpath(ruta_raiz)
+    ruta = os.path.realpath(os.path.join(raiz, base))
+    if ruta != raiz and os.path.commonpath([raiz, ruta]) == raiz and os.path.isfile(ruta):
+        return ruta
+    return None
+
+
+def calcular_cambios(
+    ruta_raiz: str, rutas_rel: Iterable[str], base: str, manifiestos_externos: bool = True
+) -> Cambios:
+    """
+    `base` es la ruta de un manifiesto si existe como archivo; si no, una referencia de git.
+    Con `manifiestos_externos=False` (peticiones web) solo se aceptan manifiestos
+    dentro de `ruta_raiz`; cualquier otro valor se trata como referencia.
+    """
+    if manifiestos_externos:
+        if os.path.isfile(base):
+            return cambios_desde_manifiesto(ruta_raiz, rutas_rel, base)
+    else:
+        manifiesto = _manifiesto_en_proyecto(ruta_raiz, base)
+        if manifiesto is not None:
+            return cambios_desde_manifiesto(ruta_raiz, rutas_rel, manifiesto)
+    return cambios_desde_git(ruta_raiz, rutas_rel, base)
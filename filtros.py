@@ -0,0 +1,239 @@
+"""
+Motor de filtrado de rutas compartido por el CLI, la app Flask y la app Tk.
+
+Los patrones siguen la sintaxis de .gitignore (incluidos los .gitignore
+anidados). Cada origen de patrones se compila en una única expresión regular
+y las carpetas ignoradas se podan antes de descender en ellas.
+"""
+import os
+import re
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+NOMBRE_GITIGNORE = ".gitignore"
+_CARACTERES_PATRON = set("*?[/!\\")
+_TODO_DENTRO = "/.*"  # traducción de un '/**' final
+
+
+def _traducir_glob(patron: str) -> str:
+    """Traduce un glob de .gitignore (sin barras al principio ni al final) a regex."""
+    partes = []
+    i, n = 0, len(patron)
+    while i < n:
+        c = patron[i]
+        if c == "*":
+            if patron.startswith("**", i) and (i == 0 or patron[i - 1] == "/"):
+                if i + 2 == n:
+                    # 'dir/**': todo lo que hay dentro
+                    partes.append(_TODO_DENTRO[1:])
+                    i += 2
+                    continue
+                if patron[i + 2] == "/":
+                    # '**/': cero o más carpetas
+                    partes.append("(?:.*/)?")
+                    i += 3
+                    continue
+            while i + 1 < n and patron[i + 1] == "*":
+                i += 1
+            partes.append("[^/]*")
+        elif c == "?":
+            partes.append("[^/]")
+        elif c == "[":
+            j = i + 1
+            if j < n and patron[j] in "!^":
+                j += 1
+            if j < n and patron[j] == "]":
+                j += 1
+            while j < n and patron[j] != "]":
+                j += 1
+            if j >= n:
+                partes.append(re.escape(c))
+            else:
+                clase = patron[i + 1:j].replace("\\", "\\\\")
+                if clase[0] in "!^":
+                    clase = "^/" + clase[1:]
+                partes.append(f"[{clase}]")
+                i = j
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            partes.append(re.escape(patron[i]))
+        else:
+            partes.append(re.escape(c))
+        i += 1
+    return "".join(partes)
+
+
+def compilar_linea(linea: str) -> Optional[Tuple[str, bool, bool]]:
+    """
+    Convierte una línea de .gitignore en (regex, negado, solo_carpetas).
+    Devuelve None para líneas vacías y comentarios.
+    """
+    linea = linea.rstrip("\r\n")
+    while linea.endswith(" ") and not linea.endswith("\\ "):
+        linea = linea[:-1]
+    if not linea or linea.startswith("#"):
+        return None
+    negado = linea.startswith("!")
+    if negado:
+        linea = linea[1:]
+    solo_carpetas = linea.endswith("/")
+    linea = linea.rstrip("/")
+    if not linea:
+        return None
+    # Con una barra al principio o en medio el patrón es relativo a su carpeta;
+    # sin ella coincide con el nombre a cualquier profundidad
+    anclado = "/" in linea
+    regex = _traducir_glob(linea.lstrip("/"))
+    if not anclado:
+        regex = "(?:.*/)?" + regex
+    return regex, negado, solo_carpetas
+
+
+def _regla_carpeta(regla: Tuple[str, bool, bool]) -> Tuple[str, bool, bool]:
+    """Hace que un 'dir/**' final coincida también con la propia carpeta."""
+    regex, negado, solo_carpetas = regla
+    if regex.endswith(_TODO_DENTRO):
+        regex = regex[:-len(_TODO_DENTRO)] + "(?:/.*)?"
+    return regex, negado, solo_carpetas
+
+
+class ReglasIgnorar:
+    """Patrones de un mismo origen compilados en una sola expresión regular."""
+
+    def __init__(self, lineas: Iterable[str], base: str = ""):
+        self.base = base  # carpeta del .gitignore relativa a la raíz ("" = raíz)
+        reglas = [r for r in map(compilar_linea, lineas) if r]
+        self._re_archivos, self._negados_archivos = self._compilar([r for r in reglas if not r[2]])
+        if not any(r[1] for r in reglas):
+            # 'dir/**' ignora todo lo de dentro, así que la carpeta se poda sin
+            # entrar en ella. Con patrones negados no: '!dir/x' debe poder
+            # reincluir un archivo de su interior
+            reglas = [_regla_carpeta(r) for r in reglas]
+        self._re_carpetas, self._negados_carpetas = self._compilar(reglas)
+
+    @staticmethod
+    def _compilar(reglas):
+        if not reglas:
+            return None, ()
+        # Gana el último patrón que coincide: se prueban en orden inverso y el
+        # grupo que captura indica cuál fue
+        reglas = reglas[::-1]
+        regex = "|".join(f"({r[0]})" for r in reglas)
+        return re.compile(regex, re.S), tuple(r[1] for r in reglas)
+
+    def __bool__(self) -> bool:
+        return self._re_carpetas is not None
+
+    def coincide(self, ruta_rel: str, es_dir: bool) -> Optional[bool]:
+        """True = ignorar, False = incluir (patrón negado), None = sin opinión."""
+        if es_dir:
+            regex, negados = self._re_carpetas, self._negados_carpetas
+        else:
+            regex, negados = self._re_archivos, self._negados_archivos
+        if regex is None:
+            return None
+        if self.base:
+            if not ruta_rel.startswith(self.base + "/"):
+                return None
+            ruta_rel = ruta_rel[len(self.base) + 1:]
+        m = regex.fullmatch(ruta_rel)
+        if m is None:
+            return None
+        return not negados[m.lastindex - 1]
+
+
+Pila = Tuple[ReglasIgnorar, ...]
+
+
+def es_patron(texto: str) -> bool:
+    return any(c in _CARACTERES_PATRON for c in texto)
+
+
+class FiltroRutas:
+    """
+    Decide qué carpetas y archivos entran en el reporte.
+
+    - `excluidas`: nombres de carpeta (como CARPETAS_EXCLUIDAS) o patrones
+      .gitignore (`dist/**`, `*.min.js`...). Tienen prioridad sobre los .gitignore.
+    - `gitignore`: aplica los .gitignore de la raíz y de cada subcarpeta.
+    """
+
+    def __init__(
+        self,
+        extensiones: Iterable[str],
+        excluidas: Iterable[str] = (),
+        gitignore: bool = True,
+    ):
+        self.extensiones = tuple(e.lower() for e in extensiones)
+        self.gitignore = gitignore
+        # Un nombre suelto conserva el significado de siempre: carpeta con ese nombre
+        lineas = [p if es_patron(p) else p + "/" for p in (x.strip() for x in excluidas) if p]
+        self._configuradas = ReglasIgnorar(lineas)
+
+    def extension_permitida(self, nombre: str) -> bool:
+        return nombre.lower().endswith(self.extensiones)
+
+    def ignorado(self, ruta_rel: str, es_dir: bool, pila: Pila = ()) -> bool:
+        decision = self._configuradas.coincide(ruta_rel, es_dir)
+        if decision is not None:
+            return decision
+        # El .gitignore más profundo manda sobre los de las carpetas superiores
+        for reglas in reversed(pila):
+            decision = reglas.coincide(ruta_rel, es_dir)
+            if decision is not None:
+                return decision
+        return False
+
+    def entrar(self, ruta_abs: str, ruta_rel: str, pila: Pila, nombres: Optional[Sequence[str]] = None) -> Pila:
+        """Pila de reglas para los hijos de una carpeta (añade su .gitignore si lo hay)."""
+        if not self.gitignore or (nombres is not None and NOMBRE_GITIGNORE not in nombres):
+            return pila
+        try:
+            with open(os.path.join(ruta_abs, NOMBRE_GITIGNORE), "r", encoding="utf-8", errors="replace") as f:
+                reglas = ReglasIgnorar(f.read().splitlines(), ruta_rel)
+        except OSError:
+            return pila
+        return pila + (reglas,) if reglas else pila
+
+    def listar(self, ruta_abs: str, ruta_rel: str = "", pila: Pila = ()) -> Tuple[List[os.DirEntry], Pila]:
+        """
+        Lista una carpeta ordenada por nombre y sin las entradas ignoradas.
+        Devuelve las entradas y la pila de reglas para sus hijos. Lanza OSError.
+        """
+        with os.scandir(ruta_abs) as it:
+            entradas = sorted(it, key=lambda e: e.name)
+        pila = self.entrar(ruta_abs, ruta_rel, pila, [e.name for e in entradas])
+        prefijo = ruta_rel + "/" if ruta_rel else ""
+        visibles = []
+        for entrada in entradas:
+            try:
+                es_dir = entrada.is_dir()
+            except OSError:
+                es_dir = False
+            if not self.ignorado(prefijo + entrada.name, es_dir, pila):
+                visibles.append(entrada)
+        return visibles, pila
+
+    def recorrer(self, ruta_raiz: str) -> Iterator[Tuple[str, List[str], List[str]]]:
+        """
+        Equivalente a os.walk (de arriba abajo, ordenado) que poda las carpetas
+        ignoradas antes de entrar en ellas. Igual que en os.walk, se puede
+        modificar la lista de carpetas para no descender en algunas.
+        """
+        pendientes = [(ruta_raiz, "", ())]
+        while pendientes:
+            ruta_abs, ruta_rel, pila = pendientes.pop()
+            try:
+                entradas, pila_hijos = self.listar(ruta_abs, ruta_rel, pila)
+            except OSError:
+                continue
+            carpetas, archivos = [], []
+            for entrada in entradas:
+                try:
+                    es_dir = entrada.is_dir()
+                except OSError:
+                    es_dir = False
+                (carpetas if es_dir else archivos).append(entrada.name)
+            yield ruta_abs, carpetas, archivos
+            prefijo = ruta_rel + "/" if ruta_rel else ""
+            for nombre in reversed(carpetas):
+                pendientes.append((os.path.join(ruta_abs, nombre), prefijo + nombre, pila_hijos))
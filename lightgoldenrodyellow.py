@@ -2,7 +2,24 @@
 import os
 import sys
 import argparse
+import codecs
+import functools
+import hashlib
+import io
+import mmap
+import sqlite3
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from cambios import calcular_cambios, escribir_manifiesto
+from filtros import FiltroRutas
+from perfil import NULO, Perfil
 
 # =========================
 # Configuración mínima
@@ -23,108 +40,1040 @@ LANG_MAP = {
     ".xml": "xml", ".md": "markdown",
 }
 
+# Detección de binarios / minificados / generados (solo se mira el inicio del archivo)
+MUESTRA_BYTES = 8192
+SUFIJOS_MINIFICADOS = (".min.js", ".min.css", ".bundle.js")
+MARCAS_GENERADO = (
+    b"@generated", b"do not edit", b"code generated", b"auto-generated",
+    b"autogenerated", b"automatically generated", b"-- mysql dump",
+    b"-- postgresql database dump", b"-- dump completed",
+)
+LINEAS_CABECERA = 5
+LINEA_MINIFICADA = 1000  # longitud de línea a partir de la cual se sospecha minificado
+
+# Deduplicación: por debajo de este tamaño la referencia ocuparía casi lo mismo que el archivo
+DEDUP_MIN_BYTES = 64
+
+# Copia directa (mmap + copy_file_range/sendfile) de archivos grandes al escribir en disco
+DIRECTO_DESDE = 1024 * 1024
+TROZO_DIRECTO = 1024 * 1024
+
+# =========================
+# Modelo en memoria del árbol
+# =========================
+@dataclass
+class Nodo:
+    """Entrada del árbol del proyecto (carpeta o archivo) ya clasificada."""
+    nombre: str
+    ruta: str
+    es_dir: bool = False
+    es_archivo: bool = False
+    hijos: List["Nodo"] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+def _es_dir(entrada: os.DirEntry) -> bool:
+    try:
+        return entrada.is_dir()
+    except OSError:
+        return False
+
+
+def _es_archivo(entrada: os.DirEntry) -> bool:
+    try:
+        return entrada.is_file()
+    except OSError:
+        return False
+
+
+def crear_filtro(excluir: Iterable[str] = (), gitignore: bool = True) -> FiltroRutas:
+    """Filtro con las carpetas excluidas por defecto más los patrones extra."""
+    return FiltroRutas(EXTENSIONES_PERMITIDAS, [*sorted(CARPETAS_EXCLUIDAS), *excluir], gitignore)
+
+
+def escanear_arbol(
+    ruta_raiz: str, filtro: Optional[FiltroRutas] = None, perfil: Perfil = NULO
+) -> Nodo:
+    """
+    Recorre la carpeta una sola vez con os.scandir, reutilizando el tipo que
+    trae cada DirEntry, y devuelve el árbol ordenado sin lo que descarta el
+    filtro (carpetas excluidas, patrones y .gitignore), sin entrar en las
+    carpetas ignoradas.
+    """
+    filtro = filtro or crear_filtro()
+    raiz = Nodo(nombre=os.path.basename(ruta_raiz) or ruta_raiz, ruta=ruta_raiz, es_dir=True)
+    pendientes = [(raiz, "", ())]
+    while pendientes:
+        nodo, ruta_rel, pila = pendientes.pop()
+        perfil.contar("carpetas_visitadas")
+        try:
+            with os.scandir(nodo.ruta) as it:
+                entradas = sorted(it, key=lambda e: e.name)
+        except Exception as e:
+            nodo.error = str(e)
+            perfil.contar("carpetas_con_error")
+            continue
+        pila = filtro.entrar(nodo.ruta, ruta_rel, pila, [e.name for e in entradas])
+        prefijo = ruta_rel + "/" if ruta_rel else ""
+        for entrada in entradas:
+            es_dir = _es_dir(entrada)
+            if filtro.ignorado(prefijo + entrada.name, es_dir, pila):
+                perfil.contar("omitidos:ignorado")
+                continue
+            hijo = Nodo(
+                nombre=entrada.name,
+                ruta=entrada.path,
+                es_dir=es_dir,
+                es_archivo=not es_dir and _es_archivo(entrada),
+            )
+            nodo.hijos.append(hijo)
+            if es_dir:
+                pendientes.append((hijo, prefijo + entrada.name, pila))
+    return raiz
+
+
+# =========================
+# Fuente git: lista de archivos desde .git/index
+# =========================
+_ENTRADA_INDICE = struct.Struct(">24xI32xH")  # de los 62 bytes fijos solo interesan mode y flags
+_MODO_GITLINK = 0o160000  # submódulo: su contenido no está en este índice
+_MODO_DIRECTORIO = 0o040000  # entrada de directorio de un índice disperso (sparse)
+
+
+def encontrar_repositorio_git(ruta: str) -> Tuple[str, str]:
+    """
+    Busca hacia arriba la raíz del repositorio que contiene `ruta`.
+    Devuelve (raíz del árbol de trabajo, carpeta git); admite `.git` como
+    archivo 'gitdir: ...' (worktrees y submódulos).
+    """
+    actual = os.path.abspath(ruta)
+    while True:
+        candidato = os.path.join(actual, ".git")
+        if os.path.isdir(candidato):
+            return actual, candidato
+        if os.path.isfile(candidato):
+            with open(candidato, "r", encoding="utf-8") as f:
+                linea = f.readline().strip()
+            if linea.startswith("gitdir:"):
+                return actual, os.path.normpath(os.path.join(actual, linea[len("gitdir:"):].strip()))
+        padre = os.path.dirname(actual)
+        if padre == actual:
+            raise ValueError(f"no es un repositorio git: {ruta}")
+        actual = padre
+
+
+def leer_indice_git(carpeta_git: str) -> List[str]:
+    """
+    Lee directamente .git/index (versiones 2, 3 y 4) y devuelve las rutas
+    versionadas, relativas a la raíz del repositorio y con '/' como separador.
+    Omite submódulos, entradas skip-worktree y directorios de índices dispersos.
+    """
+    with open(os.path.join(carpeta_git, "index"), "rb") as f:
+        datos = f.read()
+    if datos[:4] != b"DIRC":
+        raise ValueError("índice de git no válido")
+    version, total = struct.unpack_from(">II", datos, 4)
+    if version not in (2, 3, 4):
+        raise ValueError(f"versión de índice de git no soportada: {version}")
+
+    rutas: List[str] = []
+    anterior = b""
+    pos = 12
+    for _ in range(total):
+        modo, flags = _ENTRADA_INDICE.unpack_from(datos, pos)
+        inicio = pos
+        pos += _ENTRADA_INDICE.size
+        omitir = False
+        if version >= 3 and flags & 0x4000:
+            (flags2,) = struct.unpack_from(">H", datos, pos)
+            pos += 2
+            omitir = bool(flags2 & 0x4000)  # skip-worktree: no está en disco
+        if version == 4:
+            # Ruta comprimida: bytes a quitar de la anterior (varint) + sufijo
+            c = datos[pos]
+            pos += 1
+            quitar = c & 0x7F
+            while c & 0x80:
+                c = datos[pos]
+                pos += 1
+                quitar = ((quitar + 1) << 7) | (c & 0x7F)
+            fin = datos.index(b"\0", pos)
+            nombre = anterior[:len(anterior) - quitar] + datos[pos:fin]
+            pos = fin + 1
+        else:
+            fin = datos.index(b"\0", pos)
+            nombre = datos[pos:fin]
+            # Cada entrada ocupa un múltiplo de 8 bytes (relleno con NUL)
+            pos = inicio + ((fin - inicio + 8) & ~7)
+        anterior = nombre
+        tipo = modo & 0o170000
+        if omitir or tipo in (_MODO_GITLINK, _MODO_DIRECTORIO):
+            continue
+        ruta = nombre.decode("utf-8", "surrogateescape")
+        # En un conflicto la misma ruta aparece en varias etapas seguidas
+        if not rutas or rutas[-1] != ruta:
+            rutas.append(ruta)
+    return rutas
+
+
+def arbol_desde_git(ruta_raiz: str, filtro: Optional[FiltroRutas] = None) -> Nodo:
+    """
+    Construye el mismo árbol que escanear_arbol a partir de los archivos
+    versionados en el índice de git, sin recorrer el sistema de archivos.
+    Lo no versionado (salida de compilación, dependencias...) no aparece.
+    """
+    filtro = filtro or crear_filtro(gitignore=False)
+    raiz_repo, carpeta_git = encontrar_repositorio_git(ruta_raiz)
+    prefijo = os.path.relpath(os.path.abspath(ruta_raiz), raiz_repo).replace(os.sep, "/")
+    prefijo = "" if prefijo == "." else prefijo + "/"
+
+    raiz = Nodo(nombre=os.path.basename(ruta_raiz) or ruta_raiz, ruta=ruta_raiz, es_dir=True)
+    carpetas = {"": raiz}  # ruta relativa -> nodo; None = carpeta descartada por el filtro
+
+    def carpeta(ruta_rel: str) -> Optional[Nodo]:
+        if ruta_rel in carpetas:
+            return carpetas[ruta_rel]
+        padre_rel, _, nombre = ruta_rel.rpartition("/")
+        padre = carpeta(padre_rel)
+        nodo = None
+        if padre is not None and not filtro.ignorado(ruta_rel, True):
+            nodo = Nodo(nombre=nombre, ruta=padre.ruta + os.sep + nombre, es_dir=True)
+            padre.hijos.append(nodo)
+        carpetas[ruta_rel] = nodo
+        return nodo
+
+    # El índice está ordenado por ruta: los archivos de una carpeta van seguidos
+    ultima_rel, ultima = "", raiz
+    for ruta_repo in leer_indice_git(carpeta_git):
+        if not ruta_repo.startswith(prefijo):
+            continue
+        ruta_rel = ruta_repo[len(prefijo):]
+        carpeta_rel, _, nombre = ruta_rel.rpartition("/")
+        if carpeta_rel != ultima_rel:
+            ultima_rel, ultima = carpeta_rel, carpeta(carpeta_rel)
+        if ultima is not None and not filtro.ignorado(ruta_rel, False):
+            ultima.hijos.append(Nodo(nombre=nombre, ruta=ultima.ruta + os.sep + nombre, es_archivo=True))
+    # Mismo orden que os.scandir ordenado por nombre
+    for nodo in carpetas.values():
+        if nodo is not None:
+            nodo.hijos.sort(key=lambda n: n.nombre)
+    return raiz
+
+
+# =========================
+# Modo incremental (cambios respecto a una línea base)
+# =========================
+def rutas_relativas(arbol: Nodo, prefijo: str = "") -> Iterator[str]:
+    """Rutas de todos los archivos del árbol, relativas a la raíz y con '/'."""
+    for hijo in arbol.hijos:
+        ruta = prefijo + hijo.nombre
+        if hijo.es_dir:
+            yield from rutas_relativas(hijo, ruta + "/")
+        elif hijo.es_archivo:
+            yield ruta
+
+
+def podar_arbol(arbol: Nodo, conservar: Iterable[str], prefijo: str = "") -> Nodo:
+    """
+    Copia del árbol con solo los archivos de `conservar` (rutas relativas) y
+    las carpetas que los contienen; la raíz se mantiene siempre.
+    """
+    conservar = conservar if isinstance(conservar, (set, frozenset)) else set(conservar)
+    copia = Nodo(nombre=arbol.nombre, ruta=arbol.ruta, es_dir=True, error=arbol.error)
+    for hijo in arbol.hijos:
+        ruta = prefijo + hijo.nombre
+        if hijo.es_dir:
+            sub = podar_arbol(hijo, conservar, ruta + "/")
+            if sub.hijos:
+                copia.hijos.append(sub)
+        elif ruta in conservar:
+            copia.hijos.append(hijo)
+    return copia
+
+
+# =========================
+# Lectura de archivos
+# =========================
+@dataclass
+class OpcionesReporte:
+    """Ajustes de generación del reporte (no afectan a la configuración global)."""
+    jobs: int = 1  # hilos de lectura; 1 = lectura secuencial en el hilo principal
+    cache_dir: Optional[str] = None  # carpeta de la caché incremental; None = sin caché
+    max_file_bytes: Optional[int] = None  # límite por archivo (cabeza + cola); None = sin límite
+    max_total_bytes: Optional[int] = None  # límite de contenido en todo el reporte; None = sin límite
+    detectar: bool = True  # resumir binarios, minificados y generados en lugar de volcarlos
+    excluir: Tuple[str, ...] = ()  # patrones .gitignore extra (p. ej. 'dist/**', '*.min.js')
+    gitignore: bool = True  # respetar los .gitignore del proyecto (también los anidados)
+    fuente: str = "fs"  # "fs" = recorrer carpetas; "git" = archivos versionados según .git/index
+    base: Optional[str] = None  # línea base (ref de git o manifiesto): solo se vuelca lo cambiado
+    deduplicar: bool = True  # volcar una sola vez los archivos con el mismo contenido
+    perfil: Perfil = NULO  # tiempos por fase y contadores (--profile); NULO = sin medir
+
+    def filtro(self) -> FiltroRutas:
+        return crear_filtro(self.excluir, self.gitignore)
+
+    def escanear(self, ruta_raiz: str) -> Nodo:
+        """Árbol del proyecto según la fuente elegida."""
+        with self.perfil.fase("listado", fuente=self.fuente):
+            if self.fuente == "git":
+                # Los archivos versionados ya excluyen lo ignorado por git
+                return arbol_desde_git(ruta_raiz, crear_filtro(self.excluir, gitignore=False))
+            return escanear_arbol(ruta_raiz, self.filtro(), self.perfil)
+
+    def limite_por_archivo(self) -> Optional[int]:
+        """Bytes máximos a leer de un archivo: nunca más que el presupuesto total."""
+        limites = [l for l in (self.max_file_bytes, self.max_total_bytes) if l is not None]
+        return min(limites) if limites else None
+
+
+class Presupuesto:
+    """
+    Presupuesto total de bytes de contenido. Se consume en el orden del
+    reporte; una vez agotado, los lectores dejan de abrir archivos.
+    """
+
+    def __init__(self, total: int):
+        self.restante = total
+        self.agotado = False
+        # Tamaños de los archivos con huella ya leídos: agotado el presupuesto,
+        # solo se abren los de esos tamaños, que pueden ser duplicados
+        self.tamanos_con_huella: Set[int] = set()
+
+    def puede_ser_duplicado(self, ruta: str) -> bool:
+        try:
+            return os.path.getsize(ruta) in self.tamanos_con_huella
+        except OSError:
+            return False
+
+    def consumir(self, n: int) -> bool:
+        if self.agotado or n > self.restante:
+            self.agotado = True
+            return False
+        self.restante -= n
+        return True
+
+
+class CacheReporte:
+    """
+    Caché persistente (SQLite) de bloques de código ya renderizados.
+    Cada bloque se indexa por ruta y solo se reutiliza si mtime_ns, tamaño
+    e inodo del archivo siguen siendo los mismos.
+    """
+    NOMBRE_ARCHIVO = "lightgoldenrodyellow-cache.sqlite3"
+    ESQUEMA = 2  # versión de la tabla; si no coincide se recrea
+    LOTE = 256
+
+    def __init__(self, carpeta: str, firma: str = "v1"):
+        os.makedirs(carpeta, exist_ok=True)
+        self.ruta = os.path.join(carpeta, self.NOMBRE_ARCHIVO)
+        # La firma resume las opciones que cambian el bloque generado
+        self.firma = firma
+        self._lock = threading.Lock()
+        self._pendientes = []
+        self._conn = sqlite3.connect(self.ruta, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != self.ESQUEMA:
+            self._conn.execute("DROP TABLE IF EXISTS bloques")
+            self._conn.execute(f"PRAGMA user_version = {self.ESQUEMA}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS bloques ("
+            " ruta TEXT PRIMARY KEY, mtime_ns INTEGER, tamano INTEGER,"
+            " inodo INTEGER, firma TEXT, leidos INTEGER, bloque TEXT)"
+        )
+        self._conn.commit()
+
+    def obtener(self, ruta: str, st: os.stat_result) -> Optional[Tuple[str, int]]:
+        """Devuelve (bloque, bytes de contenido) si el archivo no ha cambiado."""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT bloque, leidos FROM bloques WHERE ruta = ? AND mtime_ns = ?"
+                " AND tamano = ? AND inodo = ? AND firma = ?",
+                (os.path.abspath(ruta), st.st_mtime_ns, st.st_size, st.st_ino, self.firma),
+            ).fetchone()
+        return (fila[0], fila[1]) if fila else None
+
+    def guardar(self, ruta: str, st: os.stat_result, bloque: str, leidos: int) -> None:
+        with self._lock:
+            self._pendientes.append((
+                os.path.abspath(ruta), st.st_mtime_ns, st.st_size, st.st_ino,
+                self.firma, leidos, bloque,
+            ))
+            if len(self._pendientes) >= self.LOTE:
+                self._volcar()
+
+    def _volcar(self) -> None:
+        if self._pendientes:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO bloques VALUES (?, ?, ?, ?, ?, ?, ?)", self._pendientes
+            )
+            self._conn.commit()
+            self._pendientes = []
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._volcar()
+            self._conn.close()
+
+
+def _es_permitido(nodo: Nodo) -> bool:
+    return nodo.es_archivo and nodo.nombre.lower().endswith(EXTENSIONES_PERMITIDAS)
+
+
+def _archivos_en_orden(arbol: Nodo) -> Iterator[Nodo]:
+    """Archivos permitidos en el mismo orden en que aparecen en el reporte intercalado."""
+    if arbol.error is not None:
+        return
+    for hijo in arbol.hijos:
+        if _es_permitido(hijo):
+            yield hijo
+    for hijo in arbol.hijos:
+        if hijo.es_dir:
+            yield from _archivos_en_orden(hijo)
+
+
+def _leer_archivo(ruta: str) -> str:
+    try:
+        with open(ruta, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read()
+    except Exception as e:
+        return f"Error al leer el archivo: {e}"
+
+
+def _renderizar_bloque(ruta: str, contenido: str) -> str:
+    lang = LANG_MAP.get(os.path.splitext(ruta)[1].lower(), "")
+    return f"```{lang}\n{contenido}\n```"
+
+
+# Bytes que aparecen en texto normal (ASCII imprimible, tabuladores, saltos y UTF-8)
+_BYTES_TEXTO = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)))
+
+
+class ArchivoDescartado(Exception):
+    """El archivo no se vuelca: es binario, minificado o generado."""
+
+    def __init__(self, motivo: str, tamano: int):
+        super().__init__(motivo)
+        self.motivo = motivo
+        self.tamano = tamano
+
+
+def clasificar_muestra(muestra: bytes) -> Optional[str]:
+    """
+    Clasifica el inicio de un archivo: 'binario', 'minificado', 'generado'
+    o None si parece código fuente normal.
+    """
+    if not muestra:
+        return None
+    if b"\x00" in muestra:
+        return "binario"
+    if len(muestra.translate(None, _BYTES_TEXTO)) > len(muestra) * 0.3:
+        return "binario"
+    # Las marcas de código generado van en la cabecera: solo las primeras líneas
+    cabecera = b"\n".join(muestra[:2048].split(b"\n", LINEAS_CABECERA)[:LINEAS_CABECERA]).lower()
+    if any(marca in cabecera for marca in MARCAS_GENERADO):
+        return "generado"
+    lineas = muestra.split(b"\n")
+    if max(map(len, lineas)) >= LINEA_MINIFICADA and len(muestra) / len(lineas) >= LINEA_MINIFICADA / 5:
+        return "minificado"
+    return None
+
+
+def _decodificar(datos: bytes) -> str:
+    """Mismo resultado que leer en modo texto (utf-8, errors='ignore', saltos universales)."""
+    texto = datos.decode("utf-8", errors="ignore")
+    if "\r" in texto:
+        texto = texto.replace("\r\n", "\n").replace("\r", "\n")
+    return texto
+
+
+def _leer_contenido(
+    ruta: str, max_bytes: Optional[int] = None, detectar: bool = False, perfil: Perfil = NULO
+) -> Tuple[str, int]:
+    """
+    Lee el archivo y devuelve (texto, bytes leídos). Si supera `max_bytes`
+    solo se leen la cabeza y la cola, con una marca de truncado en medio.
+    Con `detectar`, primero se clasifica una muestra del inicio y, si no es
+    código normal, se lanza ArchivoDescartado sin leer el resto.
+    Sin límite ni detección se lee en modo texto y la cuenta es de caracteres.
+    """
+    if max_bytes is None and not detectar:
+        # En modo texto la lectura y la decodificación van juntas
+        with perfil.fase("lectura"), open(ruta, "r", encoding="utf-8", errors="ignore") as f:
+            contenido = f.read()
+        return contenido, len(contenido)
+
+    cola = None  # solo si se trunca: entonces `datos` es la cabeza
+    with perfil.fase("lectura"), open(ruta, "rb") as f:
+        tamano = os.fstat(f.fileno()).st_size
+        muestra = b""
+        if detectar:
+            muestra = f.read(MUESTRA_BYTES)
+            motivo = clasificar_muestra(muestra)
+            if motivo:
+                raise ArchivoDescartado(motivo, tamano)
+        if max_bytes is None:
+            resto = f.read()
+            datos = muestra + resto if muestra else resto
+        elif tamano <= max_bytes:
+            # Se pide lo que mide el archivo, no el límite: read(n) reserva n bytes
+            datos = (muestra + f.read(max(0, tamano - len(muestra))))[:max_bytes]
+        else:
+            n_cola = max_bytes // 2
+            n_cabeza = max_bytes - n_cola
+            datos = muestra[:n_cabeza]
+            if len(datos) < n_cabeza:
+                datos += f.read(n_cabeza - len(datos))
+            cola = b""
+            if n_cola:
+                f.seek(-n_cola, os.SEEK_END)
+                cola = f.read(n_cola)
+    with perfil.fase("decodificacion"):
+        if cola is None:
+            return _decodificar(datos), len(datos)
+        omitidos = tamano - len(datos) - len(cola)
+        marca = f"\n[... truncado: {omitidos} bytes omitidos de {tamano} (límite {max_bytes}) ...]\n"
+        return _decodificar(datos) + marca + _decodificar(cola), len(datos) + len(cola)
+
+
+def _leer_bloque(
+    ruta: str,
+    cache: Optional[CacheReporte] = None,
+    max_bytes: Optional[int] = None,
+    presupuesto: Optional[Presupuesto] = None,
+    detectar: bool = False,
+    directo_desde: Optional[int] = None,
+    con_huella: bool = False,
+    perfil: Perfil = NULO,
+) -> Tuple[Any, int]:
+    """
+    Bloque de código Markdown de un archivo y bytes de contenido que aporta.
+    Si no ha cambiado sale de la caché; si el presupuesto total ya está
+    agotado, no se abre el archivo y se devuelve (None, 0), salvo que con
+    `con_huella` pueda ser un duplicado (para referenciarlo). Los binarios,
+    minificados y generados se sustituyen por una línea de resumen.
+    Con `directo_desde`, los archivos de ese tamaño o más que no necesitan
+    transformación se devuelven como BloqueDirecto (no se leen ni se cachean).
+    """
+    if presupuesto is not None and presupuesto.agotado:
+        if not (con_huella and presupuesto.puede_ser_duplicado(ruta)):
+            return None, 0
+    if detectar and os.path.basename(ruta).lower().endswith(SUFIJOS_MINIFICADOS):
+        # Ni siquiera hace falta abrirlo
+        perfil.contar("omitidos:minificado")
+        return "(omitido: archivo minificado)", 0
+    st = None
+    if cache is not None:
+        try:
+            with perfil.fase("stat"):
+                st = os.stat(ruta)
+        except OSError:
+            st = None
+        else:
+            guardado = cache.obtener(ruta, st)
+            if guardado is not None:
+                perfil.contar("cache_aciertos")
+                return guardado
+            perfil.contar("cache_fallos")
+    if directo_desde is not None:
+        try:
+            with perfil.fase("comprobacion_directa"):
+                directo = _bloque_directo(ruta, directo_desde, max_bytes, detectar, con_huella)
+        except (OSError, ValueError):
+            directo = None
+        if directo is not None:
+            perfil.contar("archivos_directos")
+            perfil.contar("bytes_leidos", directo.tamano)
+            return directo, directo.tamano
+    try:
+        contenido, leidos = _leer_contenido(ruta, max_bytes, detectar, perfil)
+    except ArchivoDescartado as d:
+        perfil.contar(f"omitidos:{d.motivo}")
+        bloque, leidos = f"(omitido: archivo {d.motivo}, {d.tamano} bytes)", 0
+    except Exception as e:
+        # Los errores de lectura no se guardan en la caché
+        perfil.contar("errores_lectura")
+        return _renderizar_bloque(ruta, f"Error al leer el archivo: {e}"), 0
+    else:
+        perfil.contar("archivos_leidos")
+        perfil.contar("bytes_leidos", leidos)
+        with perfil.fase("renderizado"):
+            bloque = _renderizar_bloque(ruta, contenido)
+    if st is not None:
+        cache.guardar(ruta, st, bloque, leidos)
+    return bloque, leidos
+
+
+def huella_bloque(bloque: str) -> bytes:
+    """Hash (BLAKE2b de 128 bits) del bloque tal y como se vuelca en el reporte."""
+    return hashlib.blake2b(bloque.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def _copiar_fd(origen: int, destino: int, n: int) -> int:
+    """
+    Copia `n` bytes de `origen` (desde su inicio) a la posición actual de
+    `destino` sin pasar por Python: copy_file_range, si no sendfile y, como
+    último recurso, write desde un mmap. Devuelve los bytes copiados.
+    """
+    copiados = 0
+    metodos = [m for m in ("copy_file_range", "sendfile") if hasattr(os, m)]
+    while copiados < n:
+        pendiente = min(n - copiados, 1 << 30)
+        enviados = None
+        while metodos and enviados is None:
+            try:
+                if metodos[0] == "copy_file_range":
+                    enviados = os.copy_file_range(origen, destino, pendiente, copiados)
+                else:
+                    enviados = os.sendfile(destino, origen, copiados, pendiente)
+            except OSError:
+                # No soportado entre estos dos archivos: probar el siguiente método
+                metodos.pop(0)
+        if enviados is None:
+            with mmap.mmap(origen, 0, access=mmap.ACCESS_READ) as mm:
+                vista = memoryview(mm)[copiados:n]
+                try:
+                    while vista:
+                        escritos = os.write(destino, vista[:TROZO_DIRECTO])
+                        copiados += escritos
+                        vista = vista[escritos:]
+                finally:
+                    vista.release()
+            return copiados
+        if enviados == 0:
+            break  # el archivo ha encogido mientras tanto
+        copiados += enviados
+    return copiados
+
+
+class BloqueDirecto:
+    """
+    Bloque de un archivo grande cuyo contenido ya es el texto final (UTF-8
+    válido, sin '\\r'): al escribir en un archivo se copia tal cual desde el
+    disco, sin decodificarlo ni pasar por un str de Python.
+    """
+    __slots__ = ("ruta", "cabecera", "tamano", "huella")
+
+    CIERRE = "\n```"
+
+    def __init__(self, ruta: str, cabecera: str, tamano: int, huella: Optional[bytes] = None):
+        self.ruta = ruta
+        self.cabecera = cabecera
+        self.tamano = tamano
+        self.huella = huella
+
+    def texto(self) -> str:
+        """El bloque como str (para destinos que no son archivos)."""
+        with open(self.ruta, "rb") as f:
+            datos = f.read(self.tamano)
+        return self.cabecera + datos.decode("utf-8", errors="ignore") + self.CIERRE
+
+    def escribir(self, destino: TextIO) -> None:
+        destino.write(self.cabecera)
+        try:
+            fd = destino.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            destino.write(self.texto()[len(self.cabecera):])
+            return
+        destino.flush()
+        with open(self.ruta, "rb") as f:
+            copiados = _copiar_fd(f.fileno(), fd, self.tamano)
+        if copiados < self.tamano:
+            # Mantener el bloque bien cerrado aunque el archivo haya encogido
+            destino.write("\n[... archivo truncado durante la copia ...]")
+        destino.write(self.CIERRE)
+
+
+def _bloque_directo(
+    ruta: str, desde: int, max_bytes: Optional[int], detectar: bool, con_huella: bool
+) -> Optional[BloqueDirecto]:
+    """
+    Comprueba con un mmap si un archivo grande puede copiarse sin transformar:
+    no supera `max_bytes`, pasa la detección, no tiene '\\r' (que se
+    normalizaría) y es UTF-8 válido (no se perdería ningún byte). Solo decodifica
+    los trozos que no son ASCII, y calcula la huella en la misma pasada.
+    Devuelve None si hay que usar la lectura normal.
+    """
+    with open(ruta, "rb") as f:
+        tamano = os.fstat(f.fileno()).st_size
+        if tamano < desde or (max_bytes is not None and tamano > max_bytes):
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if detectar and clasificar_muestra(mm[:MUESTRA_BYTES]):
+                return None
+            if mm.find(b"\r") != -1:
+                return None
+            cabecera = _renderizar_bloque(ruta, "")[:-len(BloqueDirecto.CIERRE)]
+            h = None
+            if con_huella:
+                h = hashlib.blake2b(digest_size=16)
+                h.update(cabecera.encode("utf-8"))
+            decodificador = codecs.getincrementaldecoder("utf-8")()
+            try:
+                for inicio in range(0, tamano, TROZO_DIRECTO):
+                    trozo = mm[inicio:inicio + TROZO_DIRECTO]
+                    if not trozo.isascii() or decodificador.getstate()[0]:
+                        decodificador.decode(trozo)
+                    if h is not None:
+                        h.update(trozo)
+                decodificador.decode(b"", final=True)
+            except UnicodeDecodeError:
+                return None
+    if h is not None:
+        h.update(BloqueDirecto.CIERRE.encode("utf-8"))
+    return BloqueDirecto(ruta, cabecera, tamano, h.digest() if h is not None else None)
+
+
+def _leer_bloque_con_huella(
+    ruta: str, max_bytes: Optional[int] = None, deduplicar: bool = True, **kwargs: Any
+) -> Tuple[Any, int, Optional[bytes]]:
+    """
+    Como _leer_bloque, más la huella del bloque si es deduplicable: código
+    leído entero (sin truncar) y no diminuto. Los resúmenes de binarios, los
+    errores y los archivos recortados no se deduplican.
+    """
+    bloque, leidos = _leer_bloque(ruta, max_bytes=max_bytes, con_huella=deduplicar, **kwargs)
+    huella = None
+    if isinstance(bloque, BloqueDirecto):
+        huella = bloque.huella
+    elif (deduplicar and bloque is not None and leidos >= DEDUP_MIN_BYTES
+            and (max_bytes is None or leidos < max_bytes)):
+        huella = huella_bloque(bloque)
+    presupuesto = kwargs.get("presupuesto")
+    if huella is not None and presupuesto is not None:
+        try:
+            presupuesto.tamanos_con_huella.add(os.path.getsize(ruta))
+        except OSError:
+            pass
+    return bloque, leidos, huella
+
+
+def leer_en_orden(
+    rutas: Iterable[str], jobs: int = 1, leer: Callable[[str], Any] = _leer_archivo
+) -> Iterator[Any]:
+    """
+    Aplica `leer` a cada ruta con un pool acotado de hilos (precarga de unos
+    pocos archivos por hilo) y devuelve los resultados en el orden de entrada.
+    """
+    if jobs <= 1:
+        for ruta in rutas:
+            yield leer(ruta)
+        return
+
+    ventana = jobs * 4
+    pendientes = deque()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        try:
+            for ruta in rutas:
+                pendientes.append(pool.submit(leer, ruta))
+                if len(pendientes) >= ventana:
+                    yield pendientes.popleft().result()
+            while pendientes:
+                yield pendientes.popleft().result()
+        finally:
+            # Si el consumidor abandona el generador, no seguir leyendo
+            for futuro in pendientes:
+                futuro.cancel()
+
+
 # =========================
 # Utilidades
 # =========================
-def construir_mapa_directorios(ruta_raiz: str) -> str:
+def iterar_mapa_directorios(ruta_raiz: str, arbol: Nodo) -> Iterator[str]:
+    """Genera, línea a línea, el árbol estilo 'tree' a partir del modelo en memoria."""
+    yield os.path.abspath(ruta_raiz)
+
+    def interno(nodo: Nodo, prefijo: str = ""):
+        for i, hijo in enumerate(nodo.hijos):
+            ultimo = i == len(nodo.hijos) - 1
+            conector = "└── " if ultimo else "├── "
+            yield prefijo + conector + hijo.nombre
+            if hijo.es_dir:
+                extension = "    " if ultimo else "│   "
+                yield from interno(hijo, prefijo + extension)
+
+    yield from interno(arbol)
+
+
+def construir_mapa_directorios(ruta_raiz: str, arbol: Optional[Nodo] = None) -> str:
     """Devuelve un árbol de directorios estilo 'tree', excluyendo carpetas no deseadas."""
-    lineas = []
-    raiz_abs = os.path.abspath(ruta_raiz)
-    lineas.append(raiz_abs)
+    if arbol is None:
+        arbol = escanear_arbol(ruta_raiz)
+    return "\n".join(iterar_mapa_directorios(ruta_raiz, arbol))
 
-    def interno(dir_path: str, prefijo: str = ""):
-        try:
-            entradas = sorted(os.listdir(dir_path))
-        except Exception:
+
+def iterar_reporte_intercalado(
+    arbol: Nodo, nivel: int = 1, opciones: Optional[OpcionesReporte] = None, directo: bool = False
+) -> Iterator[Any]:
+    """
+    Genera, línea a línea, el código intercalado: encabezado de carpeta,
+    archivos permitidos del nivel y después cada subcarpeta.
+    Con `directo`, los archivos grandes llegan como BloqueDirecto en lugar de
+    str (solo para escribir_reporte, que sabe copiarlos).
+    """
+    opciones = opciones or OpcionesReporte()
+    max_bytes = opciones.limite_por_archivo()
+    cache = None
+    if opciones.cache_dir:
+        cache = CacheReporte(opciones.cache_dir, firma=f"v1:max={max_bytes}:detectar={opciones.detectar}")
+    presupuesto = None
+    if opciones.max_total_bytes is not None:
+        presupuesto = Presupuesto(opciones.max_total_bytes)
+    bloques = leer_en_orden(
+        (n.ruta for n in _archivos_en_orden(arbol)), opciones.jobs,
+        functools.partial(
+            _leer_bloque_con_huella, cache=cache, max_bytes=max_bytes,
+            presupuesto=presupuesto, detectar=opciones.detectar, deduplicar=opciones.deduplicar,
+            directo_desde=DIRECTO_DESDE if directo else None, perfil=opciones.perfil,
+        ),
+    )
+    # huella -> ruta relativa de la primera aparición de ese contenido
+    vistos = {} if opciones.deduplicar else None
+
+    def interno(nodo: Nodo, nivel: int, prefijo: str = ""):
+        encabezado = "#" * nivel
+        yield f"{encabezado} {nodo.nombre}"
+
+        if nodo.error is not None:
+            yield f"Error listando la carpeta: {nodo.error}"
             return
-        # Filtra carpetas excluidas
-        entradas_visibles = []
-        for e in entradas:
-            full = os.path.join(dir_path, e)
-            if os.path.isdir(full) and e in CARPETAS_EXCLUIDAS:
-                continue
-            entradas_visibles.append(e)
 
-        for i, entrada in enumerate(entradas_visibles):
-            ruta_completa = os.path.join(dir_path, entrada)
-            conector = "└── " if i == len(entradas_visibles) - 1 else "├── "
-            lineas.append(prefijo + conector + entrada)
-            if os.path.isdir(ruta_completa):
-                extension = "    " if i == len(entradas_visibles) - 1 else "│   "
-                interno(ruta_completa, prefijo + extension)
+        # Archivos de este nivel
+        for hijo in nodo.hijos:
+            if _es_permitido(hijo):
+                bloque, leidos, huella = next(bloques)
+                yield f"**{hijo.nombre}**"
+                if vistos is not None and huella is not None:
+                    original = vistos.get(huella)
+                    if original is not None:
+                        # Un duplicado no gasta presupuesto: solo se referencia
+                        opciones.perfil.contar("omitidos:duplicado")
+                        yield f"(mismo contenido que `{original}`)"
+                        continue
+                if presupuesto is not None and not presupuesto.consumir(leidos):
+                    opciones.perfil.contar("omitidos:presupuesto")
+                    yield "(omitido: presupuesto total agotado)"
+                    continue
+                if vistos is not None and huella is not None:
+                    vistos[huella] = prefijo + hijo.nombre
+                yield bloque
+
+        # Subcarpetas (las excluidas ya no están en el árbol)
+        for hijo in nodo.hijos:
+            if hijo.es_dir:
+                yield from interno(hijo, nivel + 1, prefijo + hijo.nombre + "/")
 
-    interno(ruta_raiz)
-    return "\n".join(lineas)
+    try:
+        yield from interno(arbol, nivel)
+    finally:
+        bloques.close()
+        if cache is not None:
+            cache.cerrar()
 
 
-def generar_reporte_intercalado(ruta_raiz: str, nivel: int = 1) -> str:
+def generar_reporte_intercalado(
+    ruta_raiz: str, nivel: int = 1, arbol: Optional[Nodo] = None,
+    opciones: Optional[OpcionesReporte] = None,
+) -> str:
     """
     Recorre la carpeta y, para cada archivo con extensión permitida,
     inserta su contenido en un bloque de código Markdown.
     """
-    encabezado = "#" * nivel
-    nombre_carpeta = os.path.basename(ruta_raiz) or ruta_raiz
-    lineas = [f"{encabezado} {nombre_carpeta}"]
+    if arbol is None:
+        arbol = (opciones or OpcionesReporte()).escanear(ruta_raiz)
+    return "\n".join(iterar_reporte_intercalado(arbol, nivel, opciones))
+
+
+def _unir_lineas(lineas: Iterable[str]) -> Iterator[str]:
+    """Equivalente en streaming a "\\n".join(lineas): no concatena cada línea."""
+    for i, linea in enumerate(lineas):
+        if i:
+            yield "\n"
+        yield linea
+
+
+def iterar_reporte(
+    ruta_origen: str, opciones: Optional[OpcionesReporte] = None, directo: bool = False,
+    arbol: Optional[Nodo] = None,
+) -> Iterator[Any]:
+    """
+    Genera el reporte completo por trozos, en el mismo orden y con el mismo
+    contenido que generar_reporte(), sin acumularlo en memoria. Los trozos
+    son str salvo, con `directo`, los BloqueDirecto de archivos grandes.
+    `arbol` reutiliza un árbol ya escaneado en lugar de volver a recorrer.
+    """
+    modelo = arbol if arbol is not None else (opciones or OpcionesReporte()).escanear(ruta_origen)
+    yield "# Reporte de proyecto\n\n"
+    yield "## Estructura del proyecto\n\n"
+    yield "```\n"
+    yield from _unir_lineas(iterar_mapa_directorios(ruta_origen, modelo))
+    yield "\n```\n\n"
+    codigo = modelo
+    if opciones is not None and opciones.base:
+        # Árbol completo arriba; en el código solo lo añadido o modificado
+        with opciones.perfil.fase("cambios", base=opciones.base):
+            cambios = calcular_cambios(ruta_origen, rutas_relativas(modelo), opciones.base)
+        yield "## Cambios\n\n"
+        yield from _unir_lineas(cambios.resumen())
+        yield "\n\n"
+        codigo = podar_arbol(modelo, cambios.cambiados)
+    yield "## Código (intercalado)\n\n"
+    yield from _unir_lineas(iterar_reporte_intercalado(codigo, opciones=opciones, directo=directo))
+
 
+def _admite_copia_directa(destino: TextIO) -> bool:
+    # En Windows el modo texto traduce '\n' y no hay sendfile: siempre por str
+    if not hasattr(os, "sendfile"):
+        return False
     try:
-        entradas = sorted(os.listdir(ruta_raiz))
-    except Exception as e:
-        lineas.append(f"Error listando la carpeta: {e}")
-        return "\n".join(lineas)
-
-    # Archivos de este nivel
-    for entrada in entradas:
-        ruta_completa = os.path.join(ruta_raiz, entrada)
-        if os.path.isfile(ruta_completa) and entrada.lower().endswith(EXTENSIONES_PERMITIDAS):
-            ext = os.path.splitext(entrada)[1].lower()
-            lang = LANG_MAP.get(ext, "")
-            lineas.append(f"**{entrada}**")
-            try:
-                with open(ruta_completa, "r", encoding="utf-8", errors="ignore") as f:
-                    contenido = f.read()
-            except Exception as e:
-                contenido = f"Error al leer el archivo: {e}"
-            lineas.append(f"```{lang}")
-            lineas.append(contenido)
-            lineas.append("```")
+        destino.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return False
+    return True
 
-    # Subcarpetas (excluyendo las no deseadas)
-    for entrada in entradas:
-        ruta_completa = os.path.join(ruta_raiz, entrada)
-        if os.path.isdir(ruta_completa) and entrada not in CARPETAS_EXCLUIDAS:
-            lineas.append(generar_reporte_intercalado(ruta_completa, nivel + 1))
 
-    return "\n".join(lineas)
+def escribir_reporte(
+    ruta_origen: str, destino: TextIO, opciones: Optional[OpcionesReporte] = None,
+    arbol: Optional[Nodo] = None,
+) -> None:
+    """
+    Vuelca el reporte en un archivo abierto a medida que se genera (memoria
+    constante). Si `destino` es un archivo real, los archivos grandes que no
+    necesitan transformación se copian del disco a la salida sin decodificar.
+    """
+    perfil = (opciones or OpcionesReporte()).perfil
+    # La escritura se intercala con la generación: se acumula y se anota una vez
+    escritura, trozos = 0.0, 0
+    for trozo in iterar_reporte(ruta_origen, opciones, _admite_copia_directa(destino), arbol):
+        t0 = time.perf_counter()
+        if isinstance(trozo, BloqueDirecto):
+            trozo.escribir(destino)
+        else:
+            destino.write(trozo)
+        escritura += time.perf_counter() - t0
+        trozos += 1
+    perfil.anotar("escritura", escritura, detalles={"trozos": trozos})
 
 
-def generar_reporte(ruta_origen: str) -> str:
+def generar_reporte(
+    ruta_origen: str, opciones: Optional[OpcionesReporte] = None, arbol: Optional[Nodo] = None
+) -> str:
     """
     Genera el contenido completo del reporte en Markdown:
     - Árbol de directorios
     - Código intercalado
     """
-    arbol = construir_mapa_directorios(ruta_origen)
-    intercalado = generar_reporte_intercalado(ruta_origen)
-
-    partes = []
-    partes.append("# Reporte de proyecto\n")
-    partes.append("## Estructura del proyecto\n")
-    partes.append("```\n" + arbol + "\n```\n")
-    partes.append("## Código (intercalado)\n")
-    partes.append(intercalado)
-    return "\n".join(partes)
+    return "".join(iterar_reporte(ruta_origen, opciones, arbol=arbol))
 
 
 # =========================
 # CLI
 # =========================
+def _eliminar_parcial(ruta: str) -> None:
+    """Borra un reporte a medio escribir para no dejar archivos truncados."""
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
+
+
+def _entero_positivo(valor: str) -> int:
+    n = int(valor)
+    if n < 1:
+        raise argparse.ArgumentTypeError("debe ser un entero mayor o igual que 1")
+    return n
+
+
+def _tamano_bytes(valor: str) -> int:
+    """Convierte '500', '64K', '10M' o '1G' en bytes."""
+    multiplicadores = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    texto = valor.strip().upper().rstrip("B")
+    factor = 1
+    if texto and texto[-1] in multiplicadores:
+        factor = multiplicadores[texto[-1]]
+        texto = texto[:-1]
+    try:
+        n = int(texto) * factor
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"tamaño no válido: {valor}")
+    if n < 1:
+        raise argparse.ArgumentTypeError("debe ser un tamaño mayor que 0")
+    return n
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Genera un reporte Markdown de una carpeta de código (árbol + contenidos)."
     )
     parser.add_argument("source_root", help="Carpeta origen a inspeccionar")
     parser.add_argument("dest_folder", help="Carpeta destino donde guardar el reporte")
+    parser.add_argument(
+        "--jobs", type=_entero_positivo, default=1, metavar="N",
+        help="Hilos para leer archivos en paralelo (por defecto 1: lectura secuencial)"
+    )
+    parser.add_argument(
+        "--cache-dir", metavar="DIR",
+        help="Activa la caché incremental (SQLite) en DIR: los archivos sin cambios no se vuelven a leer"
+    )
+    parser.add_argument(
+        "--max-file-bytes", type=_tamano_bytes, metavar="N",
+        help="Máximo de bytes por archivo; los mayores se recortan (cabeza + cola). Admite K, M, G"
+    )
+    parser.add_argument(
+        "--max-total-bytes", type=_tamano_bytes, metavar="N",
+        help="Máximo de bytes de contenido en todo el reporte; al agotarse solo se listan los archivos restantes"
+    )
+    parser.add_argument(
+        "--no-sniff", dest="detectar", action="store_false",
+        help="Vuelca también archivos binarios, minificados o generados (por defecto se resumen)"
+    )
+    parser.add_argument(
+        "--exclude", dest="excluir", action="append", default=[], metavar="PATRON",
+        help="Patrón estilo .gitignore a excluir (repetible), p. ej. 'dist/**' o '*.min.js'"
+    )
+    parser.add_argument(
+        "--no-gitignore", dest="gitignore", action="store_false",
+        help="No aplicar los .gitignore del proyecto (por defecto se respetan, también los anidados)"
+    )
+    parser.add_argument(
+        "--source", dest="fuente", choices=("fs", "git"), default="fs",
+        help="Origen de la lista de archivos: 'fs' recorre las carpetas; 'git' lee los versionados de .git/index"
+    )
+    parser.add_argument(
+        "--baseline", dest="base", metavar="REF|MANIFIESTO",
+        help="Solo vuelca los archivos añadidos o modificados respecto a una ref de git o a un manifiesto anterior"
+    )
+    parser.add_argument(
+        "--manifest", dest="manifiesto", metavar="ARCHIVO",
+        help="Guarda en ARCHIVO el manifiesto de esta ejecución, para usarlo después con --baseline"
+    )
+    parser.add_argument(
+        "--no-dedup", dest="deduplicar", action="store_false",
+        help="Vuelca todos los archivos aunque tengan el mismo contenido (por defecto se referencia el primero)"
+    )
+    parser.add_argument(
+        "--profile", dest="perfilar", action="store_true",
+        help="Al terminar, muestra en stderr el tiempo de cada fase y los contadores (carpetas, archivos, bytes, omitidos...)"
+    )
+    parser.add_argument(
+        "--profile-trace", dest="traza", metavar="ARCHIVO",
+        help="Guarda las fases en ARCHIVO en formato Chrome trace (chrome://tracing, Perfetto); implica --profile"
+    )
     args = parser.parse_args()
+    perfil = Perfil(trazar=bool(args.traza)) if args.perfilar or args.traza else NULO
+    opciones = OpcionesReporte(
+        jobs=args.jobs,
+        cache_dir=os.path.abspath(args.cache_dir) if args.cache_dir else None,
+        max_file_bytes=args.max_file_bytes,
+        max_total_bytes=args.max_total_bytes,
+        detectar=args.detectar,
+        excluir=tuple(args.excluir),
+        gitignore=args.gitignore,
+        fuente=args.fuente,
+        base=args.base,
+        deduplicar=args.deduplicar,
+        perfil=perfil,
+    )
 
     source_root = os.path.abspath(args.source_root)
     dest_folder = os.path.abspath(args.dest_folder)
@@ -141,17 +1090,28 @@ def main():
     out_path = os.path.join(dest_folder, out_name)
 
     try:
-        contenido = generar_reporte(source_root)
+        # Un solo recorrido: el manifiesto usa el mismo árbol que el reporte
+        arbol = opciones.escanear(source_root)
         with open(out_path, "w", encoding="utf-8") as f:
-            f.write(contenido)
+            escribir_reporte(source_root, f, opciones, arbol)
+        if args.manifiesto:
+            with perfil.fase("manifiesto"):
+                escribir_manifiesto(source_root, rutas_relativas(arbol), args.manifiesto)
     except KeyboardInterrupt:
+        _eliminar_parcial(out_path)
         print("\n[INTERRUPT] Proceso cancelado por el usuario.", file=sys.stderr)
         sys.exit(130)
     except Exception as e:
+        _eliminar_parcial(out_path)
         print(f"[ERROR] No se pudo generar o guardar el reporte: {e}", file=sys.stderr)
         sys.exit(2)
 
     print(f"[OK] Reporte generado: {out_path}")
+    if perfil is not NULO:
+        print("\n".join(perfil.resumen()), file=sys.stderr)
+        if args.traza:
+            perfil.escribir_traza(args.traza)
+            print(f"[OK] Traza guardada: {os.path.abspath(args.traza)}", file=sys.stderr)
 
 
 if __name__ == "__main__":
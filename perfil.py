@@ -0,0 +1,123 @@
+"""
+Instrumentación ligera por fases (listado, stat, lectura, decodificación,
+base de datos, renderizado...) compartida por el CLI y la app Flask.
+
+Un Perfil acumula el tiempo y las veces de cada fase y contadores libres
+(carpetas visitadas, archivos leídos, omitidos por motivo...). Opcionalmente
+guarda cada fase como evento para exportarlo en formato Chrome trace
+(chrome://tracing, Perfetto). Sin perfil se usa NULO, que no hace nada.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+MAX_EVENTOS = 200000  # tope de eventos de traza guardados en memoria
+
+
+class Perfil:
+    """Temporizadores y contadores por fase; se puede usar desde varios hilos."""
+
+    def __init__(self, trazar: bool = False):
+        self.trazar = trazar
+        self._inicio = time.perf_counter()
+        self._lock = threading.Lock()
+        self.fases: Dict[str, List[float]] = {}  # nombre -> [veces, segundos]
+        self.contadores: Dict[str, int] = {}
+        self.eventos: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def fase(self, nombre: str, **detalles: Any) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.anotar(nombre, time.perf_counter() - t0, t0, detalles)
+
+    def anotar(self, nombre: str, segundos: float, t0: Optional[float] = None,
+               detalles: Optional[Dict[str, Any]] = None) -> None:
+        """Registra una fase ya medida (útil cuando no encaja un `with`)."""
+        with self._lock:
+            acumulado = self.fases.setdefault(nombre, [0, 0.0])
+            acumulado[0] += 1
+            acumulado[1] += segundos
+            if self.trazar and len(self.eventos) < MAX_EVENTOS:
+                inicio = (t0 if t0 is not None else time.perf_counter() - segundos) - self._inicio
+                evento = {
+                    "name": nombre, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                    "ts": round(inicio * 1e6, 1), "dur": round(segundos * 1e6, 1),
+                }
+                if detalles:
+                    evento["args"] = detalles
+                self.eventos.append(evento)
+
+    def contar(self, nombre: str, n: int = 1) -> None:
+        with self._lock:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + n
+
+    def sumar(self, datos: Dict[str, Any]) -> None:
+        """Añade las fases y contadores de otro a_dict() (p. ej. de un proceso hijo)."""
+        with self._lock:
+            for nombre, v in datos["fases"].items():
+                acumulado = self.fases.setdefault(nombre, [0, 0.0])
+                acumulado[0] += v["veces"]
+                acumulado[1] += v["segundos"]
+            for nombre, valor in datos["contadores"].items():
+                self.contadores[nombre] = self.contadores.get(nombre, 0) + valor
+
+    def a_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "segundos_totales": time.perf_counter() - self._inicio,
+                "fases": {
+                    nombre: {"veces": int(v[0]), "segundos": v[1]} for nombre, v in self.fases.items()
+                },
+                "contadores": dict(self.contadores),
+            }
+
+    def resumen(self) -> List[str]:
+        """Líneas de texto con las fases (de más a menos tiempo) y los contadores."""
+        datos = self.a_dict()
+        lineas = [f"Tiempo total: {datos['segundos_totales']:.3f} s", "Fases:"]
+        fases = sorted(datos["fases"].items(), key=lambda kv: -kv[1]["segundos"])
+        ancho = max((len(n) for n, _ in fases), default=0)
+        for nombre, v in fases:
+            lineas.append(f"  {nombre:<{ancho}}  {v['segundos']:9.3f} s  ({v['veces']} veces)")
+        if datos["contadores"]:
+            lineas.append("Contadores:")
+            ancho = max(len(n) for n in datos["contadores"])
+            for nombre, valor in sorted(datos["contadores"].items()):
+                lineas.append(f"  {nombre:<{ancho}}  {valor}")
+        return lineas
+
+    def escribir_traza(self, ruta: str) -> None:
+        """Vuelca los eventos en formato Chrome trace-event JSON."""
+        with self._lock:
+            eventos = list(self.eventos)
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": eventos, "displayTimeUnit": "ms"}, f)
+
+
+class PerfilNulo(Perfil):
+    """Perfil que no mide nada: evita comprobar `if perfil` en cada punto."""
+
+    def __init__(self):
+        super().__init__(trazar=False)
+
+    @contextmanager
+    def fase(self, nombre: str, **detalles: Any) -> Iterator[None]:
+        yield
+
+    def anotar(self, nombre, segundos, t0=None, detalles=None) -> None:
+        pass
+
+    def contar(self, nombre: str, n: int = 1) -> None:
+        pass
+
+    def sumar(self, datos: Dict[str, Any]) -> None:
+        pass
+
+
+NULO = PerfilNulo()
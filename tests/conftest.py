@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos compartidos (filtros, cambios, lightgoldenrodyellow...) viven en la raíz
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,153 @@
+"""Línea base de cambios.py: manifiestos y referencias de git."""
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from cambios import ErrorGit, calcular_cambios, cambios_desde_manifiesto, escribir_manifiesto, resolver_ref
+
+hay_git = pytest.mark.skipif(shutil.which("git") is None, reason="git no está instalado")
+
+
+def _escribir(raiz, ruta, texto):
+    destino = raiz.joinpath(*ruta.split("/"))
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    destino.write_text(texto, encoding="utf-8")
+
+
+def _git(repo, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+        cwd=repo, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+# =========================
+# Manifiesto
+# =========================
+@pytest.fixture
+def proyecto(tmp_path):
+    raiz = tmp_path / "proyecto"
+    for ruta in ("a.py", "igual.py", "sub/b.py", "sub/borrado.py"):
+        _escribir(raiz, ruta, f"# {ruta}\n")
+    return raiz
+
+
+def test_manifiesto_ida_y_vuelta(proyecto, tmp_path):
+    manifiesto = str(tmp_path / "base.json")
+    rutas = ["a.py", "igual.py", "sub/b.py", "sub/borrado.py"]
+    escribir_manifiesto(str(proyecto), rutas, manifiesto)
+    with open(manifiesto, encoding="utf-8") as f:
+        assert sorted(json.load(f)["archivos"]) == rutas
+
+    sin_cambios = cambios_desde_manifiesto(str(proyecto), rutas, manifiesto)
+    assert (sin_cambios.nuevos, sin_cambios.modificados, sin_cambios.eliminados) == ([], [], [])
+
+    _escribir(proyecto, "a.py", "# otro contenido más largo\n")
+    _escribir(proyecto, "sub/nuevo.py", "# nuevo\n")
+    os.remove(proyecto / "sub" / "borrado.py")
+    actuales = ["a.py", "igual.py", "sub/b.py", "sub/nuevo.py"]
+    cambios = cambios_desde_manifiesto(str(proyecto), actuales, manifiesto)
+    assert cambios.nuevos == ["sub/nuevo.py"]
+    assert cambios.modificados == ["a.py"]
+    assert cambios.eliminados == ["sub/borrado.py"]
+    assert cambios.carpetas_con_cambios() == {"", "sub"}
+
+
+def test_manifiesto_mismo_tamano_y_otra_fecha(proyecto, tmp_path):
+    # Con tamaño igual y mtime distinto decide el hash: tocar sin cambiar no cuenta
+    manifiesto = str(tmp_path / "base.json")
+    escribir_manifiesto(str(proyecto), ["a.py", "igual.py"], manifiesto)
+    os.utime(proyecto / "igual.py", ns=(0, 10 ** 18))
+    _escribir(proyecto, "a.py", "# A.PY\n")
+    os.utime(proyecto / "a.py", ns=(0, 2 * 10 ** 18))
+    cambios = cambios_desde_manifiesto(str(proyecto), ["a.py", "igual.py"], manifiesto)
+    assert cambios.modificados == ["a.py"]
+
+
+def test_manifiesto_reescrito_reutiliza_hashes(proyecto, tmp_path):
+    manifiesto = str(tmp_path / "base.json")
+    escribir_manifiesto(str(proyecto), ["a.py"], manifiesto)
+    with open(manifiesto, encoding="utf-8") as f:
+        datos = json.load(f)
+    # Un hash falso solo se conserva si no se vuelve a leer el archivo
+    datos["archivos"]["a.py"][2] = "falso"
+    with open(manifiesto, "w", encoding="utf-8") as f:
+        json.dump(datos, f)
+    escribir_manifiesto(str(proyecto), ["a.py"], manifiesto)
+    with open(manifiesto, encoding="utf-8") as f:
+        assert json.load(f)["archivos"]["a.py"][2] == "falso"
+
+
+def test_manifiesto_no_compatible(tmp_path):
+    manifiesto = tmp_path / "base.json"
+    manifiesto.write_text(json.dumps({"version": 999, "archivos": {}}), encoding="utf-8")
+    with pytest.raises(ValueError):
+        cambios_desde_manifiesto(str(tmp_path), [], str(manifiesto))
+
+
+# =========================
+# Referencias de git
+# =========================
+@pytest.fixture
+def repo(tmp_path):
+    raiz = tmp_path / "repo"
+    raiz.mkdir()
+    _git(raiz, "init", "-q")
+    for ruta in ("a.py", "sub/b.py", "sub/borrado.py"):
+        _escribir(raiz, ruta, f"# {ruta}\n")
+    _git(raiz, "add", "-A")
+    _git(raiz, "commit", "-q", "-m", "base")
+    return raiz
+
+
+@hay_git
+def test_cambios_respecto_a_head(repo):
+    _escribir(repo, "a.py", "# cambiado\n")
+    _escribir(repo, "sub/nuevo.py", "# nuevo\n")
+    os.remove(repo / "sub" / "borrado.py")
+    cambios = calcular_cambios(str(repo), ["a.py", "sub/b.py", "sub/nuevo.py"], "HEAD")
+    assert cambios.nuevos == ["sub/nuevo.py"]
+    assert cambios.modificados == ["a.py"]
+    assert cambios.eliminados == ["sub/borrado.py"]
+
+
+@hay_git
+@pytest.mark.parametrize("ref", ["--output=salida.txt", "-p", "-", ""])
+def test_ref_que_empieza_por_guion(repo, ref):
+    with pytest.raises(ValueError):
+        resolver_ref(str(repo), ref)
+    with pytest.raises(ValueError):
+        calcular_cambios(str(repo), ["a.py"], ref, manifiestos_externos=False)
+    # git no llegó a tomarla como opción
+    assert not (repo / "salida.txt").exists()
+
+
+@hay_git
+def test_ref_inexistente(repo):
+    with pytest.raises(ErrorGit) as error:
+        resolver_ref(str(repo), "no-existe")
+    assert "\n" not in str(error.value)
+
+
+# =========================
+# Manifiestos desde la web
+# =========================
+@hay_git
+def test_manifiesto_externo_solo_si_se_permite(repo, tmp_path):
+    fuera = str(tmp_path / "fuera.json")
+    escribir_manifiesto(str(repo), ["a.py"], fuera)
+    assert calcular_cambios(str(repo), ["a.py"], fuera).base == fuera
+    # Desde la web una ruta fuera del proyecto se toma como ref de git (y no existe)
+    with pytest.raises(ValueError):
+        calcular_cambios(str(repo), ["a.py"], fuera, manifiestos_externos=False)
+    with pytest.raises(ValueError):
+        calcular_cambios(str(repo), ["a.py"], "../fuera.json", manifiestos_externos=False)
+
+
+def test_manifiesto_dentro_del_proyecto(proyecto):
+    escribir_manifiesto(str(proyecto), ["a.py"], str(proyecto / "base.json"))
+    cambios = calcular_cambios(str(proyecto), ["a.py", "igual.py"], "base.json", manifiestos_externos=False)
+    assert cambios.nuevos == ["igual.py"]
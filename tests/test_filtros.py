@@ -0,0 +1,156 @@
+"""Compilador de .gitignore de filtros.py: anclaje, '**', negación y reglas de carpeta."""
+import os
+
+from filtros import FiltroRutas, ReglasIgnorar, compilar_linea
+
+
+def _crear(raiz, rutas, gitignore=None):
+    for ruta in rutas:
+        destino = raiz.joinpath(*ruta.split("/"))
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        destino.write_text("x\n", encoding="utf-8")
+    for carpeta, lineas in (gitignore or {}).items():
+        destino = raiz.joinpath(*carpeta.split("/")) if carpeta else raiz
+        destino.mkdir(parents=True, exist_ok=True)
+        (destino / ".gitignore").write_text("\n".join(lineas) + "\n", encoding="utf-8")
+
+
+def _visibles(raiz, **opciones):
+    """Archivos (relativos, con '/') que deja pasar el filtro, sin los .gitignore."""
+    filtro = FiltroRutas((".py",), **opciones)
+    rutas = []
+    for dirpath, _, archivos in filtro.recorrer(str(raiz)):
+        rel = os.path.relpath(dirpath, raiz).replace(os.sep, "/")
+        prefijo = "" if rel == "." else rel + "/"
+        rutas += [prefijo + nombre for nombre in archivos if nombre != ".gitignore"]
+    return sorted(rutas)
+
+
+# =========================
+# Líneas sueltas
+# =========================
+def test_lineas_vacias_y_comentarios():
+    assert compilar_linea("") is None
+    assert compilar_linea("   ") is None
+    assert compilar_linea("# comentario") is None
+    assert compilar_linea("/") is None
+
+
+def test_espacios_finales_salvo_escapados():
+    reglas = ReglasIgnorar(["a.py   ", "b\\ "])
+    assert reglas.coincide("a.py", False) is True
+    assert reglas.coincide("b ", False) is True
+    assert reglas.coincide("b", False) is None
+
+
+# =========================
+# Anclaje
+# =========================
+def test_sin_barra_coincide_a_cualquier_profundidad():
+    reglas = ReglasIgnorar(["*.log"])
+    assert reglas.coincide("a.log", False) is True
+    assert reglas.coincide("x/y/a.log", False) is True
+    assert reglas.coincide("a.log.py", False) is None
+
+
+def test_barra_inicial_ancla_a_la_carpeta_del_gitignore():
+    reglas = ReglasIgnorar(["/build"])
+    assert reglas.coincide("build", True) is True
+    assert reglas.coincide("src/build", True) is None
+
+
+def test_barra_en_medio_tambien_ancla():
+    reglas = ReglasIgnorar(["doc/*.txt"])
+    assert reglas.coincide("doc/a.txt", False) is True
+    assert reglas.coincide("src/doc/a.txt", False) is None
+    # '*' no cruza carpetas
+    assert reglas.coincide("doc/sub/a.txt", False) is None
+
+
+def test_gitignore_anidado_ancla_a_su_carpeta(tmp_path):
+    _crear(tmp_path, ["x.py", "sub/x.py", "sub/otra/x.py"], {"sub": ["/x.py"]})
+    assert _visibles(tmp_path) == ["sub/otra/x.py", "x.py"]
+
+
+# =========================
+# '**'
+# =========================
+def test_doble_asterisco_inicial():
+    reglas = ReglasIgnorar(["**/tmp"])
+    assert reglas.coincide("tmp", True) is True
+    assert reglas.coincide("a/b/tmp", True) is True
+    assert reglas.coincide("a/tmpx", True) is None
+
+
+def test_doble_asterisco_en_medio_cero_o_mas_carpetas():
+    reglas = ReglasIgnorar(["a/**/b.py"])
+    assert reglas.coincide("a/b.py", False) is True
+    assert reglas.coincide("a/x/b.py", False) is True
+    assert reglas.coincide("a/x/y/b.py", False) is True
+    assert reglas.coincide("c/a/b.py", False) is None
+
+
+def test_doble_asterisco_final_ignora_todo_lo_de_dentro(tmp_path):
+    _crear(tmp_path, ["logs/a.py", "logs/sub/b.py", "logs.py", "src/logs/c.py"], {"": ["logs/**"]})
+    assert _visibles(tmp_path) == ["logs.py", "src/logs/c.py"]
+    # Sin negaciones la carpeta se poda entera, sin entrar en ella
+    reglas = ReglasIgnorar(["logs/**"])
+    assert reglas.coincide("logs", True) is True
+
+
+# =========================
+# Negación
+# =========================
+def test_negacion_reincluye_un_archivo():
+    reglas = ReglasIgnorar(["*.py", "!keep.py"])
+    assert reglas.coincide("a.py", False) is True
+    assert reglas.coincide("keep.py", False) is False
+    assert reglas.coincide("sub/keep.py", False) is False
+
+
+def test_gana_el_ultimo_patron_que_coincide():
+    reglas = ReglasIgnorar(["!keep.py", "*.py"])
+    assert reglas.coincide("keep.py", False) is True
+
+
+def test_negacion_dentro_de_carpeta_con_doble_asterisco(tmp_path):
+    _crear(tmp_path, ["logs/a.py", "logs/keep.py"], {"": ["logs/**", "!logs/keep.py"]})
+    assert _visibles(tmp_path) == ["logs/keep.py"]
+
+
+def test_negacion_no_reincluye_dentro_de_carpeta_ignorada(tmp_path):
+    # Igual que git: si la carpeta está ignorada no se entra, y '!' no la salva
+    _crear(tmp_path, ["logs/a.py", "logs/keep.py", "b.py"], {"": ["logs/", "!logs/keep.py"]})
+    assert _visibles(tmp_path) == ["b.py"]
+
+
+def test_gitignore_anidado_anula_al_superior(tmp_path):
+    _crear(tmp_path, ["a_gen.py", "sub/a_gen.py"], {"": ["*_gen.py"], "sub": ["!*_gen.py"]})
+    assert _visibles(tmp_path) == ["sub/a_gen.py"]
+
+
+# =========================
+# Reglas solo para carpetas
+# =========================
+def test_barra_final_solo_coincide_con_carpetas():
+    reglas = ReglasIgnorar(["build/"])
+    assert reglas.coincide("build", True) is True
+    assert reglas.coincide("src/build", True) is True
+    assert reglas.coincide("build", False) is None
+
+
+def test_barra_final_en_el_arbol(tmp_path):
+    _crear(tmp_path, ["build/a.py", "src/build/b.py", "otro/build", "c.py"], {"": ["build/"]})
+    filtro = FiltroRutas((".py",))
+    archivos = []
+    for dirpath, _, nombres in filtro.recorrer(str(tmp_path)):
+        rel = os.path.relpath(dirpath, tmp_path).replace(os.sep, "/")
+        archivos += [("" if rel == "." else rel + "/") + n for n in nombres if n != ".gitignore"]
+    # La carpeta se poda con su contenido; un archivo llamado 'build' se queda
+    assert sorted(archivos) == ["c.py", "otro/build"]
+
+
+def test_excluidas_configuradas_tienen_prioridad(tmp_path):
+    _crear(tmp_path, ["node_modules/a.py", "dist/b.py", "c.py"], {"": ["!dist/"]})
+    assert _visibles(tmp_path, excluidas=["node_modules", "dist/**"]) == ["c.py"]
+    assert _visibles(tmp_path, excluidas=["node_modules"], gitignore=False) == ["c.py", "dist/b.py"]
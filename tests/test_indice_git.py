@@ -0,0 +1,81 @@
+"""Lector de .git/index de lightgoldenrodyellow.py frente a índices escritos por git."""
+import shutil
+import struct
+import subprocess
+
+import pytest
+
+from lightgoldenrodyellow import arbol_desde_git, leer_indice_git, rutas_relativas
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git no está instalado")
+
+# Rutas con prefijos comunes largos para que la compresión de la versión 4 se note
+ARCHIVOS = [
+    "README.md",
+    "app.py",
+    "src/modulo/a.py",
+    "src/modulo/b.py",
+    "src/modulo/muy/profundo/c.py",
+    "src/otro.py",
+    "z/ñandú.py",
+]
+
+
+def _git(repo, *args):
+    subprocess.run(["git", *args], cwd=repo, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _version(repo):
+    with open(repo / ".git" / "index", "rb") as f:
+        return struct.unpack(">4sI", f.read(8))[1]
+
+
+@pytest.fixture
+def repo(tmp_path):
+    _git(tmp_path, "init", "-q")
+    for ruta in ARCHIVOS:
+        destino = tmp_path.joinpath(*ruta.split("/"))
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        destino.write_text(f"# {ruta}\n", encoding="utf-8")
+    _git(tmp_path, "add", "-A")
+    return tmp_path
+
+
+# Sin flags extendidos git escribe v2 aunque se pida v3: la v3 sale abajo, con skip-worktree
+@pytest.mark.parametrize("version", [2, 4])
+def test_lee_v2_y_v4(repo, version):
+    _git(repo, "update-index", "--index-version", str(version))
+    assert _version(repo) == version
+    assert leer_indice_git(str(repo / ".git")) == ARCHIVOS
+
+
+@pytest.mark.parametrize("version", [2, 4])
+def test_omite_entradas_skip_worktree(repo, version):
+    _git(repo, "update-index", "--index-version", str(version))
+    _git(repo, "update-index", "--skip-worktree", "src/modulo/b.py", "src/otro.py")
+    # skip-worktree usa los flags extendidos: git sube un índice v2 a v3
+    assert _version(repo) == max(version, 3)
+    esperado = [r for r in ARCHIVOS if r not in ("src/modulo/b.py", "src/otro.py")]
+    assert leer_indice_git(str(repo / ".git")) == esperado
+
+
+def test_v4_reconstruye_rutas_tras_una_omitida(repo):
+    # La ruta comprimida de una entrada depende de la anterior aunque esta se omita
+    _git(repo, "update-index", "--index-version", "4")
+    _git(repo, "update-index", "--skip-worktree", "src/modulo/a.py", "src/modulo/muy/profundo/c.py")
+    assert leer_indice_git(str(repo / ".git")) == [
+        "README.md", "app.py", "src/modulo/b.py", "src/otro.py", "z/ñandú.py",
+    ]
+
+
+def test_indice_no_valido(tmp_path):
+    (tmp_path / "index").write_bytes(b"NADA" + bytes(8))
+    with pytest.raises(ValueError):
+        leer_indice_git(str(tmp_path))
+
+
+def test_arbol_desde_git_de_una_subcarpeta(repo):
+    _git(repo, "update-index", "--index-version", "4")
+    _git(repo, "update-index", "--skip-worktree", "src/modulo/b.py")
+    arbol = arbol_desde_git(str(repo / "src"))
+    assert sorted(rutas_relativas(arbol)) == ["modulo/a.py", "modulo/muy/profundo/c.py", "otro.py"]